@@ -1,8 +1,10 @@
+import json
 import law
 import luigi
 import os
 import shutil
 import tempfile
+import time
 
 from RunKit.law_customizations import HTCondorWorkflow, copy_param
 from RunKit.sh_tools import sh_call
@@ -65,10 +67,13 @@ class ProdBenchmark(BenchmarkBase, HTCondorWorkflow, law.LocalWorkflow):
     cmd = f'python3 $ANALYSIS_PATH/RunKit/nanoProdWrapper.py customise={self.customise} maxEvents={self.maxEvents} sampleType={input_type} era={self.era} inputFiles=file:{self.input}/{input}.root writePSet=True createTar=False'
     sh_call([cmd], shell=True, env=self.cmssw_env(), cwd=job_home, verbose=1)
     cmd = '$ANALYSIS_PATH/RunKit/crabJob.sh'
+    start_time = time.time()
     sh_call([cmd], shell=True, env=self.cmssw_env(), cwd=job_home, verbose=1)
+    wall_time = time.time() - start_time
     cmssw_output = os.path.join(job_home, 'nano_0.root')
     root_output = self.local_path(f'{input}.root')
     os.makedirs(self.local_path(), exist_ok=True)
+    self.write_rate(input, input_type, wall_time)
     shutil.move(cmssw_output, root_output)
     doc_html_path = self.local_path(f'{input}.doc.html')
     size_html_path = self.local_path(f'{input}.size.html')
@@ -82,6 +87,31 @@ class ProdBenchmark(BenchmarkBase, HTCondorWorkflow, law.LocalWorkflow):
       shutil.rmtree(job_home)
     self.output().touch()
 
+  def processed_events(self, input):
+    n_events = self.maxEvents
+    try:
+      import uproot
+      with uproot.open(os.path.join(self.input, f'{input}.root')) as input_file:
+        n_input = input_file['Events'].num_entries
+      n_events = n_input if n_events < 0 else min(n_events, n_input)
+    except Exception as e:
+      print(f'WARNING: unable to count the events in {input}: {e}')
+    return n_events
+
+  def write_rate(self, input, input_type, wall_time):
+    # processing rate of the full job, used by split_planner.py to balance the job runtimes
+    n_events = self.processed_events(input)
+    rate = {
+      'input': input,
+      'sample_type': input_type,
+      'era': self.era,
+      'events': n_events,
+      'wall_time': wall_time,
+      'events_per_second': n_events / wall_time if n_events > 0 and wall_time > 0 else None,
+    }
+    with open(self.local_path(f'{input}.rate.json'), 'w') as f:
+      json.dump(rate, f, indent=2)
+
 class SkimBenchmark(BenchmarkBase, law.LocalWorkflow):
   skimCfg = luigi.Parameter()
   skimSetup = luigi.Parameter()
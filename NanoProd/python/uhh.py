@@ -1,12 +1,69 @@
 # coding: utf-8
 
+import os
+import sys
+import glob
+import json
 import shutil
 import threading
 
+import law
+import luigi
+
 from RunKit.crabLaw import ProdTask, update_kinit_thread, cond
 from RunKit.crabTask import Task as CrabTask
 from RunKit.crabTaskStatus import Status
 
+# the helper modules live in the top-level directory of the repository
+thisdir = os.path.dirname(os.path.abspath(__file__))
+base_dir = os.path.dirname(os.path.dirname(thisdir))
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+from event_sidecar import sidecar_path, write_sidecars
+from merge_outputs import MANIFEST_NAME, OutputMerger, load_finished_jobs
+from storage_backends import PosixBackend, StorageRouter
+
+
+def find_staged_output(task, work_area, job_id):
+    """Find the output of job *job_id* after the stage-out, i.e.
+    <localCrabOutput>/<campaign>/<crab_dir>/<timestamp>/<NNNN>/nano_<job_id>.root
+    on the mounted storage. If there are several, the newest one is returned.
+    """
+    local_output = getattr(task, 'localCrabOutput', '')
+    if not local_output:
+        return None
+    pattern = os.path.join(local_output, '*', os.path.basename(os.path.normpath(work_area)), '*',
+                           f'{int(job_id) // 1000:04d}', f'nano_{job_id}.root')
+    candidates = glob.glob(pattern)
+    if len(candidates) == 0:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def publish_sidecars(task, work_area, job_id, job_home):
+    """Write the sidecar record of the output in *job_home* and copy it next
+    to the staged output, such that check_crab_jobs.py does not need to open
+    the output. A missing record only means that the checker has to open the
+    output, so failures are not fatal.
+    """
+    sidecars = write_sidecars(job_home)
+    if len(sidecars) != 1:
+        print(f'WARNING: expected one sidecar record in {job_home}, found {len(sidecars)}')
+        return
+    staged_output = find_staged_output(task, work_area, job_id)
+    if staged_output is None:
+        print(f'WARNING: staged output of job {job_id} not found, the sidecar is not published')
+        return
+    local_output = sidecars[0][:-len(sidecar_path(''))]
+    if os.path.getsize(staged_output) != os.path.getsize(local_output):
+        print(f'WARNING: {staged_output} differs from the local output, the sidecar is not published')
+        return
+    try:
+        StorageRouter().copy(sidecars[0], sidecar_path(staged_output))
+    except Exception as e:
+        print(f'WARNING: could not publish the sidecar for {staged_output}: {e}')
+
 
 class UHHProdTask(ProdTask):
 
@@ -27,6 +84,10 @@ class UHHProdTask(ProdTask):
                 job_home, remove_job_home = self.law_job_home()
                 result = task.runJobLocally(grid_job_id, job_home)
                 state_str = 'finished' if result else 'failed'
+                if result:
+                    # publish the event counts next to the outputs before
+                    # the job home is removed
+                    publish_sidecars(task, work_area, grid_job_id, job_home)
                 if remove_job_home:
                     shutil.rmtree(job_home)
                 with self.output().open('w') as output:
@@ -36,3 +97,57 @@ class UHHProdTask(ProdTask):
             cond.notify_all()
             cond.release()
             thread.join()
+
+
+class UHHMergeTask(law.Task):
+    """Merge the small outputs of the finished jobs of a sample into files of
+    about *target_size* MB and write a manifest that maps the merged files to
+    the ids of the jobs they were created from, see merge_outputs.py.
+    The task is only complete if all groups were merged.
+    """
+
+    input_dir = luigi.Parameter(description="crab output directory of the sample, "
+                                            "which contains the <timestamp>/NNNN/ directories")
+    output_dir = luigi.Parameter(description="directory for the merged files, local or remote")
+    status_file = luigi.Parameter(description="crab status file (.json) of the task, "
+                                              "only the outputs of finished jobs are merged")
+    manifest = luigi.Parameter(default='', description="local copy of the manifest, required "
+                                                       "if output_dir is remote")
+    target_size = luigi.FloatParameter(default=2048., description="target size of the merged "
+                                                                  "files in MB (targetOutputFileSize)")
+    max_workers = luigi.IntParameter(default=4, description="number of parallel merges")
+    name_template = luigi.Parameter(default="nano_{id}.root",
+                                    description="file names of the job outputs")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.manifest and not self.is_local(self.output_dir):
+            raise ValueError(f"output_dir {self.output_dir} is remote, the manifest parameter is required")
+
+    @staticmethod
+    def is_local(path):
+        return path.startswith('file://') or '://' not in path
+
+    def output(self):
+        if self.manifest:
+            return law.LocalFileTarget(self.manifest)
+        return law.LocalFileTarget(os.path.join(PosixBackend.local_path(self.output_dir), MANIFEST_NAME))
+
+    def complete(self):
+        if not self.output().exists():
+            return False
+        with open(self.output().path) as f:
+            return not json.load(f).get("failed")
+
+    def run(self):
+        merger = OutputMerger(target_size=self.target_size, max_workers=self.max_workers, verbosity=1)
+        time_stamp, job_ids = load_finished_jobs(self.status_file)
+        manifest = merger.merge(self.input_dir, self.output_dir, time_stamp=time_stamp,
+                                job_ids=job_ids, name_template=self.name_template)
+        if self.manifest:
+            os.makedirs(os.path.dirname(os.path.abspath(self.manifest)), exist_ok=True)
+            with open(self.manifest, 'w') as f:
+                json.dump(manifest, f, indent=4)
+        print(f"{len(manifest['files'])} merged files saved in {self.output_dir}")
+        if manifest['failed']:
+            raise RuntimeError(f"could not merge {', '.join(manifest['failed'])}, see the manifest")
@@ -0,0 +1,443 @@
+"""Scale benchmark for the book-keeping of check_crab_jobs.py.
+
+The benchmark creates a synthetic crab base directory (status .json,
+job input files and a sample config) and replaces the remote services with
+local stand-ins: a fake gfal2 module that lists block-structured outputs
+and a fake DBS api. Thus, the phases of the check can be timed without
+access to DBS, the WLCG site or crab. For every phase, the wall time and
+the peak of the memory allocated by python (tracemalloc) are reported.
+
+Example:
+
+    python3 benchmarks/check_crab_jobs_scale.py --jobs 100000 --lfns-per-job 10
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import shutil
+import tarfile
+import tempfile
+import tracemalloc
+
+from io import BytesIO
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from contextlib import contextmanager
+
+thisdir = os.path.realpath(os.path.dirname(__file__))
+base_dir = os.path.dirname(thisdir)
+if not base_dir in sys.path:
+    sys.path.append(base_dir)
+
+SAMPLE_NAME = "FakeSample"
+DAS_KEY = "/FakeCampaign/RunIISummer20UL18MiniAODv2-106X_upgrade2018_realistic_v16_L1v1-v2/MINIAODSIM"
+TIME_STAMP = "230101_120000"
+WLCG_DIR = "/pnfs/fake/store/user/benchmark"
+# remote prefix, such that the outputs are listed with the fake gfal2 module
+# instead of the local file system
+WLCG_PREFIX = "srm://fake-se.example:8443/srm/managerv2?SFN="
+
+
+class FakeStat(object):
+    def __init__(self, mtime: float):
+        self.st_mtime = mtime
+
+
+class FakeGfalContext(object):
+    """Stand-in for a gfal2 context. Output blocks are listed from the
+    synthetic outputs of class::`SyntheticTask`, optionally with a
+    *latency* in seconds per request to mimic a remote site.
+    """
+    def __init__(self, task, latency: float=0):
+        self.task = task
+        self.latency = latency
+
+    def set_opt_integer(self, *args):
+        pass
+
+    def listdir(self, path: str) -> list[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.task.block_listing(int(os.path.basename(path.rstrip("/"))))
+
+    def stat(self, path: str) -> FakeStat:
+        if self.latency:
+            time.sleep(self.latency)
+        return FakeStat(self.task.mtime)
+
+
+def install_fake_gfal2(task, latency: float=0) -> None:
+    """Register a fake gfal2 module, which has to happen before the
+    modules of this repository are imported.
+    """
+    module = types.ModuleType("gfal2")
+    module.creat_context = lambda: FakeGfalContext(task, latency=latency)
+    sys.modules["gfal2"] = module
+
+
+class FakeDbsApi(object):
+    """Stand-in for the DbsApi that returns the synthetic file list."""
+    def __init__(self, task):
+        self.task = task
+        self.lfns = None
+
+    def listBlocks(self, dataset: str, **kwargs) -> list[dict]:
+        return [{"block_name": f"{dataset}#{i}"} for i in range(self.task.n_dbs_blocks)]
+
+    def listFiles(self, dataset: str or None=None, block_name: str or None=None, **kwargs) -> list[dict]:
+        # the LFNs are only generated once, such that listing the blocks
+        # does not cost more than listing the complete dataset
+        if self.lfns is None:
+            self.lfns = self.task.all_lfns()
+        lfns = self.lfns
+        if block_name:
+            i = int(block_name.split("#")[-1])
+            lfns = lfns[i::self.task.n_dbs_blocks]
+        return [
+            {
+                "logical_file_name": lfn,
+                "is_file_valid": 1,
+                "event_count": 1000,
+                "file_size": 2*1024**3,
+                "adler32": "0badc0de",
+            } for lfn in lfns
+        ]
+
+
+class SyntheticTask(object):
+    """Synthetic crab task with *n_jobs* jobs that process *lfns_per_job*
+    LFNs each. A fraction *failed_fraction* of the jobs failed, and half of
+    the failed jobs still left an output behind.
+    """
+    def __init__(
+        self,
+        n_jobs: int,
+        lfns_per_job: int,
+        failed_fraction: float=0.05,
+        n_dbs_blocks: int=100,
+        seed: int=42,
+    ):
+        self.n_jobs = n_jobs
+        self.lfns_per_job = lfns_per_job
+        self.n_dbs_blocks = n_dbs_blocks
+        self.mtime = time.time()
+        rng = random.Random(seed)
+        self.failed = set(
+            job_id for job_id in range(1, n_jobs+1) if rng.random() < failed_fraction
+        )
+        self.failed_with_output = set(x for x in self.failed if rng.random() < 0.5)
+
+    def lfn(self, index: int) -> str:
+        # realistic length of about 150 characters
+        return (f"/store/mc/RunIISummer20UL18MiniAODv2/FakeSample_TuneCP5_13TeV-powheg-pythia8"
+                f"/MINIAODSIM/106X_upgrade2018_realistic_v16_L1v1-v2/2560000/{index:012d}.root")
+
+    def job_lfns(self, job_id: int) -> list[str]:
+        start = (job_id-1)*self.lfns_per_job
+        return [self.lfn(i) for i in range(start, start+self.lfns_per_job)]
+
+    def all_lfns(self) -> list[str]:
+        return [self.lfn(i) for i in range(self.n_jobs*self.lfns_per_job)]
+
+    def block_listing(self, block: int) -> list[str]:
+        first = max(1, block*1000)
+        last = min(self.n_jobs, (block+1)*1000-1)
+        return [
+            f"output_{job_id}.tar" for job_id in range(first, last+1)
+            if not job_id in self.failed or job_id in self.failed_with_output
+        ]
+
+    def status(self, crab_dir: str) -> dict:
+        return {
+            "project_dir": os.path.abspath(crab_dir),
+            "task_name": f"{TIME_STAMP}:benchmark_crab_{SAMPLE_NAME}",
+            "n_jobs_total": self.n_jobs,
+            "details": {
+                str(job_id): {"State": "failed" if job_id in self.failed else "finished"}
+                for job_id in range(1, self.n_jobs+1)
+            },
+        }
+
+    def write(self, workdir: str, extracted: bool=False) -> tuple[str, str, str]:
+        """Write the synthetic sample directory, crab base directory and
+        sample config to *workdir*. The job input files are written to
+        'local/input_files.tar.gz' like `crab preparelocal` does, or
+        directly as files if *extracted* is True.
+
+        Returns:
+            tuple[str, str, str]: sample directory, crab directory, sample config
+        """
+        sample_dir = os.path.join(workdir, SAMPLE_NAME)
+        crab_dir = os.path.join(sample_dir, f"crab_{SAMPLE_NAME}")
+        local_dir = os.path.join(crab_dir, "local")
+        os.makedirs(local_dir)
+        with open(os.path.join(sample_dir, "status.json"), "w") as f:
+            json.dump(self.status(crab_dir), f)
+        sample_config = os.path.join(workdir, "samples.yaml")
+        with open(sample_config, "w") as f:
+            f.write(f"{SAMPLE_NAME}: {DAS_KEY}\n")
+
+        if extracted:
+            for job_id in range(1, self.n_jobs+1):
+                with open(os.path.join(local_dir, f"job_input_file_list_{job_id}.txt"), "w") as f:
+                    json.dump(self.job_lfns(job_id), f)
+        else:
+            with tarfile.open(os.path.join(local_dir, "input_files.tar.gz"), "w:gz") as archive:
+                for job_id in range(1, self.n_jobs+1):
+                    content = json.dumps(self.job_lfns(job_id)).encode()
+                    info = tarfile.TarInfo(f"job_input_file_list_{job_id}.txt")
+                    info.size = len(content)
+                    archive.addfile(info, BytesIO(content))
+        return sample_dir, crab_dir, sample_config
+
+
+class PhaseTimer(object):
+    """Record the wall time and the peak of the memory allocated by python
+    for every phase of the benchmark.
+    """
+    def __init__(self, trace_memory: bool=True):
+        self.trace_memory = trace_memory
+        self.results = list()
+        if trace_memory:
+            tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        yield
+        wall_time = time.perf_counter() - start
+        peak = None
+        if self.trace_memory:
+            peak = (tracemalloc.get_traced_memory()[1] - baseline)/1024**2
+        self.results.append({"phase": name, "wall_time": wall_time, "peak_memory_mb": peak})
+
+    def print_table(self) -> None:
+        headerparts = ["{: ^32}".format(x) for x in ["Phase", "Wall time [s]", "Peak memory [MB]"]]
+        lines = ["| {} |".format(" | ".join(headerparts))]
+        lines += ["| {} |".format(" | ".join(["---"]*len(headerparts)))]
+        for result in self.results:
+            peak = result["peak_memory_mb"]
+            lines.append("| {} |".format(" | ".join(
+                ["{: ^32}".format(x) for x in [
+                    result["phase"],
+                    f"{result['wall_time']:.3f}",
+                    f"{peak:.1f}" if peak is not None else "-",
+                ]]
+            )))
+        print("\n".join(lines))
+
+
+def main(
+    *args,
+    n_jobs: int,
+    lfns_per_job: int,
+    failed_fraction: float,
+    listing_latency: float,
+    listing_workers: int,
+    extracted: bool,
+    trace_memory: bool,
+    workdir: str or None,
+    output: str or None,
+    **kwargs,
+):
+    task = SyntheticTask(
+        n_jobs=n_jobs,
+        lfns_per_job=lfns_per_job,
+        failed_fraction=failed_fraction,
+    )
+    install_fake_gfal2(task, latency=listing_latency)
+
+    # the modules have to be imported after the fake gfal2 module is installed
+    import check_crab_jobs as ccj
+    from lfn_index import LFNInterner, LFNSet
+    from tracing import tracer
+
+    ccj.setup_interface(
+        listing_workers=listing_workers,
+        use_dbs_cache=False,
+    )
+    ccj.interface.dbs_api = FakeDbsApi(task)
+    tracer.enable()
+
+    cleanup = workdir is None
+    workdir = workdir if workdir else tempfile.mkdtemp(prefix="check_crab_jobs_scale_")
+    timer = PhaseTimer(trace_memory=trace_memory)
+    print(f"Benchmark with {n_jobs} jobs and {n_jobs*lfns_per_job} LFNs in '{workdir}'")
+    try:
+        with timer.phase("generate synthetic task"):
+            sample_dir, crab_dir, sample_config = task.write(workdir, extracted=extracted)
+
+        with timer.phase("DBS file list"):
+            known_lfns = ccj.interface.get_dbs_lfns(das_key=DAS_KEY)
+
+        with timer.phase("job inputs (build index)"):
+            input_map = ccj.get_job_inputs(crab_dir=crab_dir)
+
+        with timer.phase("job inputs (cached index)"):
+            input_map = ccj.get_job_inputs(crab_dir=crab_dir)
+
+        status = ccj.load_status_file(sample_dir=sample_dir, status_file="status")
+        job_details = status["details"]
+        block_paths = ccj.build_block_paths(
+            job_details=job_details,
+            das_key=DAS_KEY,
+            crab_dirname=f"crab_{SAMPLE_NAME}",
+            time_stamp=TIME_STAMP,
+            wlcg_dir=WLCG_DIR,
+            wlcg_prefix=WLCG_PREFIX,
+        )
+        with timer.phase("remote listing"):
+            listings = ccj.interface.load_remote_outputs(wlcg_paths=block_paths)
+            ccj.interface.listing_engine.forget(block_paths)
+            job_outputs = set(x for listing in listings.values() for x in listing)
+
+        with timer.phase("output index"):
+            output_index = ccj.interface.build_output_index(job_outputs=job_outputs)
+
+        with timer.phase("check job outputs"):
+            interner = LFNInterner()
+            known_lfns = LFNSet(interner, known_lfns)
+            done_lfns = LFNSet(interner)
+            failed_job_outputs = LFNSet(interner)
+            for state, collector_set in [("failed", failed_job_outputs), ("finished", done_lfns)]:
+                ccj.interface.check_job_outputs(
+                    job_outputs=job_outputs,
+                    output_index=output_index,
+                    collector_set=collector_set,
+                    input_map=input_map,
+                    job_details=job_details,
+                    state=state,
+                )
+
+        with timer.phase("set logic"):
+            unprocessed_lfns = known_lfns.symmetric_difference(done_lfns)
+
+        del input_map, listings, job_outputs, output_index
+        tracer.collect()
+        with timer.phase("check_sample (end-to-end)"):
+            _, sample_dict, _, _ = ccj.check_sample(
+                sample_dir=sample_dir,
+                suffices=[""],
+                status_files=["status"],
+                sample_config=sample_config,
+                wlcg_dir=WLCG_DIR,
+                wlcg_prefix=WLCG_PREFIX,
+                xrd_prefix="",
+                verbosity=0,
+            )
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    timer.print_table()
+    print("\nPhases of check_sample (end-to-end):")
+    tracer.print_summary()
+    print(f"\nSummary: {json.dumps(sample_dict)}")
+    print(f"Unprocessed LFNs: {len(unprocessed_lfns)}, outputs of failed jobs: {len(failed_job_outputs)}")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({
+                "n_jobs": n_jobs,
+                "n_lfns": n_jobs*lfns_per_job,
+                "phases": timer.results,
+                "check_sample_phases": [
+                    dict(zip(["phase", "category", "calls", "total", "max"], x))
+                    for x in tracer.summary()
+                ],
+            }, f, indent=4)
+
+
+def parse_arguments():
+    parser = ArgumentParser(
+        description=__doc__,
+        formatter_class=RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--jobs",
+        help="number of jobs of the synthetic crab task. Defaults to 10000",
+        type=int,
+        default=10000,
+        dest="n_jobs",
+    )
+    parser.add_argument(
+        "--lfns-per-job",
+        help="number of LFNs per job. Defaults to 10",
+        type=int,
+        default=10,
+        dest="lfns_per_job",
+    )
+    parser.add_argument(
+        "--failed-fraction",
+        help="fraction of failed jobs. Defaults to 0.05",
+        type=float,
+        default=0.05,
+        dest="failed_fraction",
+    )
+    parser.add_argument(
+        "--listing-latency",
+        help=" ".join("""
+            latency in seconds of every request to the fake gfal context to
+            mimic a remote site. Defaults to 0
+        """.split()),
+        type=float,
+        default=0,
+        dest="listing_latency",
+    )
+    parser.add_argument(
+        "--listing-workers",
+        help="number of concurrent listings. Defaults to 8",
+        type=int,
+        default=8,
+        dest="listing_workers",
+    )
+    parser.add_argument(
+        "--extracted",
+        help=" ".join("""
+            write the job input files directly instead of into
+            'input_files.tar.gz'
+        """.split()),
+        action="store_true",
+        default=False,
+        dest="extracted",
+    )
+    parser.add_argument(
+        "--no-memory",
+        help=" ".join("""
+            do not trace the memory allocations, which slows down the
+            benchmark
+        """.split()),
+        action="store_false",
+        default=True,
+        dest="trace_memory",
+    )
+    parser.add_argument(
+        "--workdir",
+        help=" ".join("""
+            directory for the synthetic task. Defaults to a temporary
+            directory that is removed afterwards
+        """.split()),
+        type=str,
+        default=None,
+        dest="workdir",
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help="save the results in this .json file",
+        metavar="path/to/results.json",
+        type=str,
+        default=None,
+        dest="output",
+    )
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    main(**vars(args))
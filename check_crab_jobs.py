@@ -1,7 +1,6 @@
 import os
 import sys
 import json
-import yaml
 
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from tqdm import tqdm
@@ -9,6 +8,8 @@ from itertools import chain
 from collections.abc import Iterable
 from typing import Any
 from subprocess import call, DEVNULL
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import numpy as np
 
 thisdir = os.path.realpath(os.path.dirname(__file__))
@@ -17,10 +18,26 @@ if not thisdir in sys.path:
     sys.path.append(thisdir)
 
 from wlcg_dbs_interface import WLCGInterface
+from crab_dir_state import CrabDirState, file_fingerprint
+from job_input_index import JobInputIndex
+from crab_status import StatusCollector
+from tracing import tracer
+from sample_catalog import SampleCatalog
+from lfn_index import LFNInterner, LFNSet, lfn_set_like
+from summary_io import SUMMARY_FORMATS, load_summary, summary_path, write_summary
+from output_profile import (
+    OutputProfile, print_size_profile_table, write_splitting_recommendations,
+)
+from event_sidecar import sidecar_path, is_sidecar
 from RunKit.crabTaskStatus import LogEntryParser
 from RunKit.sh_tools import sh_call
 
 interface = WLCGInterface()
+# settings to set up the interface, also used to set up the interfaces of
+# worker processes (see init_worker)
+interface_settings = dict()
+# collector for the status of crab tasks, see setup_interface
+status_collector = None
 wlcg_template= os.path.join("{wlcg_prefix}{wlcg_dir}",
     "{sample_name}",
     "{crab_dirname}",
@@ -28,69 +45,130 @@ wlcg_template= os.path.join("{wlcg_prefix}{wlcg_dir}",
 )
 verbosity=0
 
-def create_job_input(
-        crab_dir: str,
-        output_file: str,
-        counter: int=0,
-        max_attempt: int=3,
-    ):
-    from glob import glob
-    out_dict = dict()
-
-    # first, look for the job input files
-    local_fdir = os.path.join(crab_dir, "local")
-    input_files = glob(os.path.join(local_fdir, "job_input*.txt"))
-
-    if len(input_files) == 0:
-        # if no files are found, create them with crab
-        cmd = f"crab preparelocal -d {crab_dir}"
-
-        # if the counter is too large, something is wrong so abort
-        if counter >= max_attempt:
-            raise ValueError(f"Could not create local job inputs with command '{cmd}'")
-        # print(cmd)
-        call([cmd], shell=True, env=interface.getCmsswEnv(), stdout=DEVNULL)
-        # unpack the tar file
-        thisdir = os.getcwd()
-        os.chdir(local_fdir)
-        cmd = "tar -xvf input_files.tar.gz"
-        # print(f"in dir '{os.getcwd()}' do '{cmd}'")
-        call([cmd], shell=True, stdout=DEVNULL)
-        os.chdir(thisdir)
-        
-        # now that the job input files are created, call the function again
-        return create_job_input(
-            crab_dir=crab_dir,
-            output_file=output_file,
-            counter=counter+1,
-            max_attempt=max_attempt,
+def setup_interface(
+    verbosity: int=0,
+    listing_workers: int=8,
+    listing_timeout: int=300,
+    event_workers: int=8,
+    event_timeout: int=60,
+    event_retries: int=2,
+    event_pool: str="thread",
+    use_dbs_cache: bool=True,
+    dbs_cache: str or None=None,
+    dbs_cache_ttl: float=168,
+    refresh_dbs_cache: bool=False,
+    dbs_workers: int=8,
+    das_workers: int=4,
+    status_workers: int=4,
+    trace: str or None=None,
+    use_local_mount: bool=True,
+    wlcg_prefix: str or None=None,
+    wlcg_dir: str or None=None,
+    size_profile: bool=False,
+    **kwargs,
+) -> None:
+    """Function to configure the global WLCGInterface *interface* with the
+    settings from the ArgumentParser. The settings are also saved in the
+    global *interface_settings*, such that worker processes can set up
+    their own interface with meth::`init_worker`.
+    """
+    global interface_settings, status_collector
+    interface_settings = dict(
+        verbosity=verbosity,
+        listing_workers=listing_workers,
+        listing_timeout=listing_timeout,
+        event_workers=event_workers,
+        event_timeout=event_timeout,
+        event_retries=event_retries,
+        event_pool=event_pool,
+        use_dbs_cache=use_dbs_cache,
+        dbs_cache=dbs_cache,
+        dbs_cache_ttl=dbs_cache_ttl,
+        refresh_dbs_cache=refresh_dbs_cache,
+        dbs_workers=dbs_workers,
+        das_workers=das_workers,
+        status_workers=status_workers,
+        trace=trace,
+        use_local_mount=use_local_mount,
+        wlcg_prefix=wlcg_prefix,
+        wlcg_dir=wlcg_dir,
+        size_profile=size_profile,
+    )
+    if trace:
+        tracer.enable()
+    interface.verbosity = verbosity
+    interface.dbs_workers = dbs_workers
+    interface.setup_das_client(max_workers=das_workers)
+    status_collector = StatusCollector(
+        query=create_job_status,
+        max_workers=status_workers,
+        verbosity=verbosity,
+    )
+    interface.setup_listing_engine(
+        max_workers=listing_workers,
+        timeout=listing_timeout,
+        record_sizes=size_profile,
+    )
+    # list the outputs directly if the WLCG directory is mounted on this node
+    if use_local_mount and wlcg_prefix and wlcg_dir:
+        interface.setup_local_mount(
+            remote_prefix=wlcg_prefix,
+            local_prefix="",
+            probe=wlcg_dir,
         )
-    else:
-        # sort the files according to the job id
-        sorted_files = sorted(
-            input_files,
-            key=lambda x: int(".".join(x.split(".")[:-1]).split("_")[-1])
+    interface.setup_event_counting(
+        max_workers=event_workers,
+        timeout=event_timeout,
+        retries=event_retries,
+        mode=event_pool,
+    )
+    if use_dbs_cache:
+        interface.setup_dbs_cache(
+            path=dbs_cache,
+            ttl=dbs_cache_ttl*3600 if dbs_cache_ttl >= 0 else None,
+            refresh=refresh_dbs_cache,
         )
 
-        # create final dictionary
-        for jobid, infile in enumerate(sorted_files, start=1):
-            inlist = list()
-            with open(infile) as f:
-                inlist = json.load(f)
-            out_dict[jobid] = inlist
-    n_out_dict = len(out_dict)
-    n_input_files = len(input_files)
-    
-    if n_out_dict == n_input_files:
-        with open(output_file, "w") as f:
-            json.dump(out_dict, f, indent=4)
-    else:
-        print(f"""Malformed job input dictionary!
-              Included {n_out_dict} job ids from {n_input_files} input files!"""
-            )
-
+def init_worker(settings: dict[str, Any]) -> None:
+    """Initializer for worker processes. The gfal contexts and thread pools
+    of the interface cannot be shared across processes, so every worker
+    creates its own WLCGInterface and configures it with *settings*
+    (see meth::`setup_interface`).
+    """
+    global interface, verbosity
+    verbosity = settings.get("verbosity", 0)
+    interface = WLCGInterface(verbosity=verbosity)
+    setup_interface(**settings)
 
-            
+def create_job_input(
+        crab_dir: str,
+        counter: int=0,
+        max_attempt: int=3,
+    ) -> JobInputIndex or None:
+    """Load the index of the job inputs of *crab_dir* (see
+    class::`JobInputIndex`). If the job input files do not exist yet, they
+    are created with 'crab preparelocal' first. The files are read directly
+    from the archive, so there is no need to extract it.
+    Returns None if the job input files could not be created.
+    """
+    index = JobInputIndex(crab_dir=crab_dir)
+    if index.ensure():
+        return index
+
+    # if no files are found, create them with crab
+    cmd = f"crab preparelocal -d {crab_dir}"
+
+    # if the counter is too large, something is wrong so abort
+    if counter >= max_attempt:
+        raise ValueError(f"Could not create local job inputs with command '{cmd}'")
+    call([cmd], shell=True, env=interface.getCmsswEnv(), stdout=DEVNULL)
+
+    # now that the job input files are created, call the function again
+    return create_job_input(
+        crab_dir=crab_dir,
+        counter=counter+1,
+        max_attempt=max_attempt,
+    )
 
 def get_job_inputs(crab_dir: str, job_input_file: str="job_input_files.json"):
     """Load job input file. This .json file contains the mapping of the form
@@ -103,37 +181,50 @@ def get_job_inputs(crab_dir: str, job_input_file: str="job_input_files.json"):
         ...
     }
 
+    The mapping is the consolidated index of the job inputs (see
+    meth::`create_job_input`), which looks up the inputs of a job only when
+    they are accessed. If there are no job input files but a
+    mapping *job_input_file* from a previous version of this script exists,
+    the mapping is loaded from there instead.
+
     Args:
         crab_dir (str): current crab directory
         job_input_file (str, optional): file name in *crab_dir* containing the
                                         mapping. 
                                         Defaults to "job_input_files.json".
-    
-    Raises:
-        ValueError: If the file containing the file mapping does not exist
 
     Returns:
-        dict: file mapping of format described above
+        Mapping: file mapping of format described above
     """    
 
     # first, build file path
     path = os.path.join(crab_dir, "local", job_input_file)
-    # from IPython import embed
-    # embed()
-    # if the file does not exist, raise an error
-    if not os.path.exists(path):
-        # print(f"Could not load input mapping from file '{path}', will create it")
-        
-        create_job_input(crab_dir=crab_dir, output_file=path) 
-        if not os.path.exists(path):
-            print(f"Error! Could not create file '{path}'")
-            return None
-    # load json file
-    with open(path) as f:
-        input_map = json.load(f)
-
-    return input_map
+    index = JobInputIndex(crab_dir=crab_dir)
+    if not index.has_source() and os.path.exists(path):
+        # load json file
+        with open(path) as f:
+            return json.load(f)
+    try:
+        index = create_job_input(crab_dir=crab_dir)
+    except ValueError as e:
+        print(e)
+        index = None
+    if index is None:
+        print(f"Error! Could not create job input index for '{crab_dir}'")
+        return None
+    return index
+
+def get_job_input_fingerprint(
+    crab_dir: str,
+    job_input_file: str="job_input_files.json",
+) -> list[float] or None:
+    """Fingerprint of the source of the job inputs, see meth::`get_job_inputs`."""
+    index = JobInputIndex(crab_dir=crab_dir)
+    return file_fingerprint(index.meta_path) or file_fingerprint(
+        os.path.join(crab_dir, "local", job_input_file)
+    )
 
+@tracer.traced("crab status", category="crab")
 def create_job_status(crab_dir, output_path=None):
     returncode, output, err = sh_call(['crab', 'status', '--json', '-d', crab_dir],
                                         catch_stdout=True, split='\n',
@@ -145,6 +236,41 @@ def create_job_status(crab_dir, output_path=None):
             json.dump(return_dict, f, indent=4)
     return return_dict
 
+def get_status_path(sample_dir: str, status_file: str) -> str or None:
+    """Function to build the path to the status .json file in *sample_dir*.
+    If the file 'sample_dir/status_file.json' does not exist, the function
+    falls back to 'status.json'. Returns None if neither file exists.
+    """
+    # build path to the file containing the status information
+    status_path = os.path.join(sample_dir, f"{status_file}.json")
+
+    # also build a fallback in case the current file does not exist
+    backup_status_path = os.path.join(sample_dir, "status.json")
+
+    for path in [status_path, backup_status_path]:
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_status_file(sample_dir: str, status_file: str) -> dict[str, dict] or None:
+    """Function to load the status from the .json file 'sample_dir/status_file.json'.
+    If this file does not exist, the function falls back to 'status.json'.
+    In contrast to meth::`get_status`, crab is never called.
+
+    Args:
+        sample_dir (str): path to directory containing the status json file
+        status_file (str): name of the .json file containing the job stati
+
+    Returns:
+        dict or None: Dictionary with status information given by crab, or None
+                        if neither file exists
+    """
+    status_path = get_status_path(sample_dir=sample_dir, status_file=status_file)
+    if status_path is None:
+        return None
+    with open(status_path) as f:
+        return json.load(f)
+
 def get_status(sample_dir: str, status_file: str, crab_dir: str) -> dict[str, dict]:
     """Function to load the status from a .json file in *sample_dir*.
     If the file 'sample_dir/status_file.json' does not exist, the script falls
@@ -164,27 +290,15 @@ def get_status(sample_dir: str, status_file: str, crab_dir: str) -> dict[str, di
     Returns:
         dict: Dictionary with status information given by crab
     """    
-    status=dict()
-    # build path to the file containing the status information
-    status_path = os.path.join(sample_dir, f"{status_file}.json")
-
-    # also build a fallback in case the current file does not exist
-    backup_status_path = os.path.join(sample_dir, "status.json")
-
     # now check if the file in either *status_path* or the backup exists
-    if os.path.exists(status_path):
-        with open(status_path) as f:
-            status = json.load(f)
-    elif os.path.exists(backup_status_path):
-        with open(backup_status_path) as f:
-            status = json.load(f)
-    else:
+    status = load_status_file(sample_dir=sample_dir, status_file=status_file)
+    if status is None:
         # if they do not exist, raise an error
         # raise NotImplementedError("Obtaining the status from crab not implemented yet!")
         # cmd = f"crab status --long --json -d {crab_dir}"
         # call([cmd], shell=True, env=interface.getCmsswEnv())
         
-        status = create_job_status(crab_dir=crab_dir)
+        status = query_job_status(crab_dir=crab_dir)
     
     return status
 
@@ -213,9 +327,131 @@ def check_status(status: dict[str, dict], crab_dir: str) -> None:
         msg = f"Project dir in status file '{status_project_dir}' does not match current crab dir under scutiny '{abs_crab_dir}'!"
         print(msg)
         print("Trying to generate status")
-        status = create_job_status(crab_dir=crab_dir)
+        status = query_job_status(crab_dir=crab_dir)
     return status
 
+def query_job_status(crab_dir: str) -> dict[str, dict]:
+    """Obtain the status of *crab_dir* with `crab status`. The query is run
+    by the global *status_collector*, so every task is only queried once per
+    run, see class::`StatusCollector`.
+    """
+    if status_collector is None:
+        return create_job_status(crab_dir=crab_dir)
+    return status_collector.get(crab_dir)
+
+def is_status_stale(status: dict[str, dict] or None, crab_dir: str) -> bool:
+    """Check whether the status has to be obtained with `crab status`, i.e.
+    whether there is no status file or it belongs to a different crab base
+    directory (see meth::`check_status`).
+    """
+    if not status:
+        return True
+    status_project_dir = status.get("project_dir", None)
+    return bool(status_project_dir) and status_project_dir != os.path.abspath(crab_dir)
+
+def prefetch_job_status(
+    sample_dir: str,
+    sample_name: str,
+    suffices: list[str],
+    status_files: list[str],
+    **kwargs,
+) -> None:
+    """Function to queue `crab status` for all crab base directories of a
+    sample whose status file is missing or stale, such that the queries run
+    in parallel while other samples are checked.
+    """
+    if status_collector is None:
+        return
+    for suffix, status_file in zip(suffices, status_files):
+        if not suffix == "" and not suffix.startswith("_"):
+            suffix = "_"+suffix
+        crab_dir = os.path.join(sample_dir, f"crab_{sample_name}"+suffix)
+        if not os.path.exists(crab_dir):
+            continue
+        status = load_status_file(sample_dir=sample_dir, status_file=status_file)
+        if is_status_stale(status, crab_dir):
+            status_collector.submit(crab_dir)
+
+def build_block_paths(
+    job_details: dict[str, dict],
+    das_key: str,
+    crab_dirname: str,
+    time_stamp: str,
+    wlcg_dir: str,
+    wlcg_prefix: str,
+) -> list[str]:
+    """Function to build the paths to the output blocks of a crab task on
+    the remote WLCG site. Crab arranges the output files in blocks of 1000
+    jobs depending on the job id, i.e. '.../TIME_STAMP/0000', '.../TIME_STAMP/0001', ...
+
+    Args:
+        job_details (dict): Dictionary containing the status of the jobs of
+                            format {job_id: ADDITIONAL_INFORMATION}
+        das_key (str): DAS key of the sample, used to obtain the campaign name
+        crab_dirname (str): name of the crab base directory
+        time_stamp (str): time stamp of the crab task
+        wlcg_dir (str): Name of the WLCG Directory containing the outputs
+        wlcg_prefix (str): Prefix to contact the WLCG Directory with gfal
+
+    Returns:
+        list[str]: list of paths to the output blocks
+    """
+    campaign_name = interface.get_campaign_name(
+        das_key=das_key,
+    )
+    this_wlcg_template = wlcg_template.format(
+        wlcg_prefix=wlcg_prefix,
+        wlcg_dir=wlcg_dir,
+        sample_name=campaign_name,
+        crab_dirname=crab_dirname,
+        time_stamp=time_stamp
+    )
+    if len(job_details) == 0:
+        return []
+    # get maximum ID to identify maximum block number
+    max_jobid = np.max([int(x) for x in job_details.keys()])
+    return [
+        os.path.join(this_wlcg_template, f"{i:04d}")
+        for i in range(int(max_jobid/1000)+1)
+    ]
+
+def prefetch_remote_outputs(
+    sample_dir: str,
+    sample_name: str,
+    das_key: str,
+    suffices: list[str],
+    status_files: list[str],
+    wlcg_dir: str,
+    wlcg_prefix: str,
+    **kwargs,
+) -> None:
+    """Function to queue the listing of all output blocks of all crab
+    base directories of a sample in the background. Only status information
+    that is already available as .json file is considered, i.e. crab is
+    never called here. Directories that are not queued here are listed
+    later in meth::`check_crab_directory`.
+    """
+    for suffix, status_file in zip(suffices, status_files):
+        if not suffix == "" and not suffix.startswith("_"):
+            suffix = "_"+suffix
+        crab_dirname = f"crab_{sample_name}"+suffix
+        if not os.path.exists(os.path.join(sample_dir, crab_dirname)):
+            continue
+        status = load_status_file(sample_dir=sample_dir, status_file=status_file)
+        if not status:
+            continue
+        time_stamp = status.get("task_name", None)
+        if not time_stamp:
+            continue
+        interface.prefetch_remote_outputs(build_block_paths(
+            job_details=status.get("details", dict()),
+            das_key=das_key,
+            crab_dirname=crab_dirname,
+            time_stamp=time_stamp.split(":")[0],
+            wlcg_dir=wlcg_dir,
+            wlcg_prefix=wlcg_prefix,
+        ))
+
 def check_crab_directory(
     sample_dir: str,
     sample_name: str,
@@ -233,6 +469,10 @@ def check_crab_directory(
     job_input_file: str="job_input_files.json",
     event_lookup: dict[str, int] or None=None,
     event_comparison_container: list[dict[str, Any]] or None=None,
+    failed_sidecars: set[str] or None=None,
+    unchecked_lfns: set[str] or None=None,
+    incremental: bool=False,
+    output_profile: OutputProfile or None=None,
     **kwargs,
 ) -> None:
     """Function to check a specific crab base directory in *sample_dir*.
@@ -274,6 +514,23 @@ def check_crab_directory(
                                         mapping of job_id -> input file(s) for
                                         a given *crab_dir*. 
                                         Defaults to "job_input_files.json".
+        failed_sidecars (set[str], optional):   Set of the sidecar records of
+                                        the *failed_job_outputs*, which are
+                                        removed together with them.
+                                        Defaults to None.
+        unchecked_lfns (set[str], optional):    Set of lfns of the jobs in
+                                        output blocks that could not be
+                                        listed, which are neither done nor
+                                        missing. Defaults to None.
+        incremental (bool, optional):   reuse the results of the previous run
+                                        if neither the status, the crab
+                                        directory nor the remote output blocks
+                                        changed, see class::`CrabDirState`.
+                                        Defaults to False.
+        output_profile (OutputProfile, optional):   profile to collect the
+                                        sizes of the outputs of finished jobs,
+                                        see meth::`profile_job_outputs`.
+                                        Defaults to None.
 
     Raises:
         ValueError: If previously unkown lfns are encountered
@@ -292,7 +549,8 @@ def check_crab_directory(
     pbar.set_description(f"Checking directory {crab_dir}")
     
     # load the input file mapping of the form 'job_ids' -> list of lfns
-    input_map = get_job_inputs(crab_dir=crab_dir, job_input_file=job_input_file)
+    with tracer.span("load job inputs", category="inputs", crab_dir=crab_dir):
+        input_map = get_job_inputs(crab_dir=crab_dir, job_input_file=job_input_file)
     
     if not input_map:
         if verbosity >= 1:
@@ -300,7 +558,7 @@ def check_crab_directory(
         return
     # perform sanity checks
     # first load a flat list of lfns
-    flat_lfns = set(chain.from_iterable(input_map.values()))
+    flat_lfns = lfn_set_like(known_lfns, chain.from_iterable(input_map.values()))
 
     # if we don't know any lfns yet, use this set as a baseline
     if len(known_lfns) == 0:
@@ -333,14 +591,15 @@ def check_crab_directory(
         known_lfns.update(flat_lfns)
 
     # load the dictionary containing the job stati
-    status = get_status(
-        sample_dir=sample_dir,
-        status_file=status_file,
-        crab_dir=crab_dir
-    )
-    # status = create_job_status(crab_dir)
-    # sanity check whether we indeed loaded the correct status file
-    status = check_status(status=status, crab_dir=crab_dir)
+    with tracer.span("load job status", category="crab", crab_dir=crab_dir):
+        status = get_status(
+            sample_dir=sample_dir,
+            status_file=status_file,
+            crab_dir=crab_dir
+        )
+        # status = create_job_status(crab_dir)
+        # sanity check whether we indeed loaded the correct status file
+        status = check_status(status=status, crab_dir=crab_dir)
 
     # get general information about jobs
     n_jobs = status.get("n_jobs_total", 0)
@@ -355,69 +614,261 @@ def check_crab_directory(
         print("Could not retrieve time stamp from status json!")
         return
     time_stamp = time_stamp.split(":")[0]
-    campaign_name = interface.get_campaign_name(
+    block_paths = build_block_paths(
+        job_details=job_details,
         das_key=das_key,
-    )
-    this_wlcg_template = wlcg_template.format(
-        wlcg_prefix=wlcg_prefix,
-        wlcg_dir=wlcg_dir,
-        sample_name=campaign_name,
         crab_dirname=crab_dirname,
-        time_stamp=time_stamp
+        time_stamp=time_stamp,
+        wlcg_dir=wlcg_dir,
+        wlcg_prefix=wlcg_prefix,
     )
 
-    # create complete path on remote WLCG system to output file
-    # crab arranges the output files in blocks depending on the job id
-    
-    # get maximum ID to identify maximum block number later
-    max_jobid = np.max([int(x) for x in job_details.keys()])
-    # initialize set of outputs
-    job_outputs = set()
-    # get the maximum block number and iterate through the blocks
-    pbar_blocks = tqdm(range(int(max_jobid/1000)+1))
-    for i in pbar_blocks:
-        pbar_blocks.set_description(f"Loading outputs for block {i:04d}")
-        job_outputs.update(
-            interface.load_remote_output(
-                wlcg_path=os.path.join(this_wlcg_template, f"{i:04d}"),
-            )
+    # in incremental mode, compare the current state of the crab directory
+    # to the state saved by the previous run
+    state = None
+    fingerprint = None
+    mtimes = dict()
+    reusable_blocks = set()
+    if incremental:
+        state = CrabDirState(crab_dir=crab_dir)
+        fingerprint = {
+            "status": file_fingerprint(get_status_path(
+                sample_dir=sample_dir, status_file=status_file
+            )),
+            "input_map": get_job_input_fingerprint(
+                crab_dir=crab_dir, job_input_file=job_input_file
+            ),
+            "time_stamp": time_stamp,
+            "event_comparison": bool(event_lookup),
+        }
+        if state.load() and state.matches(fingerprint):
+            mtimes = interface.stat_remote_directories(wlcg_paths=block_paths)
+            reusable_blocks = state.unchanged_blocks(mtimes)
+            if (reusable_blocks == set(block_paths) and
+                restore_crab_directory_state(
+                    state=state,
+                    done_lfns=done_lfns,
+                    failed_job_outputs=failed_job_outputs,
+                    failed_sidecars=failed_sidecars,
+                    time_stamps=time_stamps,
+                    event_comparison_container=event_comparison_container,
+                )
+            ):
+                if verbosity >= 1:
+                    print(f"Directory {crab_dir} did not change, reusing previous results")
+                if output_profile is not None:
+                    job_outputs = set(chain.from_iterable(
+                        state.blocks[x]["files"] for x in block_paths
+                    ))
+                    profile_job_outputs(
+                        output_profile=output_profile,
+                        job_outputs=job_outputs,
+                        output_index=interface.build_output_index(job_outputs=job_outputs),
+                        input_map=input_map,
+                        job_details=job_details,
+                    )
+                if interface.listing_engine:
+                    interface.listing_engine.forget(block_paths)
+                return
+        else:
+            mtimes = interface.stat_remote_directories(wlcg_paths=block_paths)
+            reusable_blocks = set()
+
+    # load the outputs of all blocks concurrently. If the blocks were
+    # already queued with meth::`prefetch_remote_outputs`, this only
+    # collects the results. In incremental mode, the blocks are not queued
+    # in advance and the listings of blocks that did not change are taken
+    # from the previous run, so only the changed blocks are listed
+    pbar.set_description(f"Loading outputs for {len(block_paths)} blocks of {crab_dirname}")
+    listings = interface.load_remote_outputs(wlcg_paths=[
+        x for x in block_paths if not x in reusable_blocks
+    ])
+    for path in reusable_blocks:
+        listings[path] = state.blocks[path]["files"]
+    # the outputs of blocks that could not be listed are unknown, so their
+    # jobs are excluded from the book-keeping of this run
+    failed_blocks = set(
+        int(os.path.basename(x)) for x in block_paths if not x in listings
+    )
+    if failed_blocks:
+        print(f"WARNING: could not list {len(failed_blocks)} output blocks of {crab_dir}")
+        unchecked_ids = set(
+            x for x in job_details if int(x)//1000 in failed_blocks
         )
+        if unchecked_lfns is not None:
+            unchecked_lfns.update(chain.from_iterable(
+                input_map.get(x, []) for x in unchecked_ids
+            ))
+        job_details = {
+            x: info for x, info in job_details.items() if not x in unchecked_ids
+        }
+    job_outputs = set(chain.from_iterable(listings.values()))
+
+    # index the outputs by job id once, such that the following checks
+    # don't need to match every job against every output
+    output_index = interface.build_output_index(job_outputs=job_outputs)
+    if output_profile is not None:
+        with tracer.span("profile output sizes", category="storage", crab_dir=crab_dir):
+            profile_job_outputs(
+                output_profile=output_profile,
+                job_outputs=job_outputs,
+                output_index=output_index,
+                input_map=input_map,
+                job_details=job_details,
+            )
+    if interface.listing_engine:
+        interface.listing_engine.forget(block_paths)
+
+    # keep track of the results of this directory for the incremental mode
+    if incremental and not failed_blocks:
+        previous_done_lfns = done_lfns.copy()
+        previous_failed_job_outputs = failed_job_outputs.copy()
+        previous_failed_sidecars = (failed_sidecars.copy()
+                                    if failed_sidecars is not None else set())
+        n_event_comparisons = (len(event_comparison_container)
+                                if event_comparison_container is not None else 0)
 
     # load information about failed jobs
-    interface.check_job_outputs(
-        job_outputs=job_outputs,
-        collector_set=failed_job_outputs,
-        input_map=input_map,
-        job_details=job_details,
-        state="failed",
-        wlcg_prefix=wlcg_prefix,
-        xrd_prefix=xrd_prefix,
-    )
+    with tracer.span("check failed jobs", category="bookkeeping", crab_dir=crab_dir):
+        interface.check_job_outputs(
+            job_outputs=job_outputs,
+            output_index=output_index,
+            collector_set=failed_job_outputs,
+            sidecar_collector=failed_sidecars,
+            input_map=input_map,
+            job_details=job_details,
+            state="failed",
+            wlcg_prefix=wlcg_prefix,
+            xrd_prefix=xrd_prefix,
+        )
 
     # load information about finished jobs
     ndone = len(done_lfns)
-    interface.check_job_outputs(
-        job_outputs=job_outputs,
-        collector_set=done_lfns,
-        input_map=input_map,
-        job_details=job_details,
-        state="finished",
-        event_comparison_container=event_comparison_container,
-        event_lookup=event_lookup,
-    )
+    with tracer.span("check finished jobs", category="bookkeeping", crab_dir=crab_dir):
+        interface.check_job_outputs(
+            job_outputs=job_outputs,
+            output_index=output_index,
+            collector_set=done_lfns,
+            input_map=input_map,
+            job_details=job_details,
+            state="finished",
+            event_comparison_container=event_comparison_container,
+            event_lookup=event_lookup,
+        )
 
     if ndone< len(done_lfns):
         time_stamps.append(time_stamp)
     else:
         time_stamps.append([])
 
+    # the results are incomplete if blocks could not be listed, so they are
+    # not saved for the next run
+    if incremental and not failed_blocks:
+        state.save(
+            fingerprint=fingerprint,
+            blocks={
+                path: {"mtime": mtimes.get(path), "files": listings[path]}
+                for path in block_paths
+            },
+            results={
+                "done_lfns": sorted(done_lfns.difference(previous_done_lfns)),
+                "failed_job_outputs": sorted(
+                    failed_job_outputs.difference(previous_failed_job_outputs)
+                ),
+                "failed_sidecars": sorted(
+                    failed_sidecars.difference(previous_failed_sidecars)
+                    if failed_sidecars is not None else []
+                ),
+                "time_stamp": time_stamps[-1],
+                "event_comparison": (
+                    event_comparison_container[n_event_comparisons:]
+                    if event_comparison_container is not None else []
+                ),
+            },
+        )
+
+def profile_job_outputs(
+    output_profile: OutputProfile,
+    job_outputs: set[str],
+    output_index: dict[str, set[str]],
+    input_map: dict[str, list[str]],
+    job_details: dict[str, dict],
+) -> None:
+    """Add the outputs of all finished jobs to *output_profile*. The sizes
+    are taken from the listings (see meth::`WLCGInterface.get_output_sizes`)
+    and the number of events from the sidecar records next to the outputs
+    (if they exist).
+    """
+    outputs = {
+        path: id for id in job_details
+        if job_details[id]["State"] == "finished"
+        for path in output_index.get(id, set())
+    }
+    sizes = interface.get_output_sizes(outputs)
+    available_sidecars = set(filter(is_sidecar, job_outputs))
+    records = interface.load_sidecars({
+        x: sidecar_path(x) for x in outputs if sidecar_path(x) in available_sidecars
+    })
+    for path, id in outputs.items():
+        if not path in sizes:
+            continue
+        record = records.get(path)
+        output_profile.add(
+            size=sizes[path],
+            n_inputs=len(input_map.get(id, [])),
+            n_events=record["counts"].get("Events") if record else None,
+        )
+
+def restore_crab_directory_state(
+    state: CrabDirState,
+    done_lfns: set[str],
+    failed_job_outputs: set[str],
+    time_stamps: list[str],
+    event_comparison_container: list[dict[str, Any]] or None=None,
+    failed_sidecars: set[str] or None=None,
+) -> bool:
+    """Function to fill the book-keeping containers with the results of a
+    crab base directory saved in a previous run, see class::`CrabDirState`.
+    If LFNs of the saved state are already marked as done, the state is not
+    consistent with the current run and nothing is restored.
+
+    Returns:
+        bool: True if the state was restored, else False
+    """
+    results = state.results
+    if not done_lfns.isdisjoint(results.get("done_lfns", [])):
+        return False
+    done_lfns.update(results.get("done_lfns", []))
+    failed_job_outputs.update(results.get("failed_job_outputs", []))
+    if failed_sidecars is not None:
+        failed_sidecars.update(results.get("failed_sidecars", []))
+    time_stamps.append(results.get("time_stamp", []))
+    if event_comparison_container is not None:
+        event_comparison_container += results.get("event_comparison", [])
+    return True
+
+def is_sample_complete(sample_info: dict[str, Any]) -> bool:
+    """Small function to decide whether a sample in a summary created by
+    meth::`build_meta_info_table` is complete, i.e. all LFNs were processed,
+    there are no outputs from failed jobs, all outputs could be listed and
+    the total number of LFNs
+    matches the number in DAS (if available).
+    """
+    return (
+        sample_info.get("missing", -1) == 0
+        and sample_info.get("outputs from failed jobs", 0) == 0
+        and sample_info.get("unchecked", 0) == 0
+        and sample_info.get("das_total", -1) in [-1, sample_info.get("total")]
+    )
+
 def post_processing(
     meta_infos: dict[str, Any],
-    event_comparison: dict[str, list[dict[str, Any]]] or None=None
+    event_comparison: dict[str, list[dict[str, Any]]] or None=None,
+    summary_format: str="json",
 ):
     # do some final sanity check: if we found missing lfns, print them here
     # so the user can do something
-    build_meta_info_table(meta_infos=meta_infos)
+    build_meta_info_table(meta_infos=meta_infos, summary_format=summary_format)
 
     samples_with_missing_lfns = list(filter(
         lambda x: meta_infos[x]["missing"] != 0 or 
@@ -431,7 +882,8 @@ def post_processing(
         print("Samples with missing LFNS:")
         build_meta_info_table(
             meta_infos={x: meta_infos[x] for x in samples_with_missing_lfns},
-            outfilename="samples_with_missing_lfns.json"
+            outfilename="samples_with_missing_lfns.json",
+            summary_format=summary_format,
         )
 
     samples_wo_missing_lfns = list(filter(
@@ -446,7 +898,8 @@ def post_processing(
         print("Samples w/o missing LFNS:")
         build_meta_info_table(
             meta_infos={x: meta_infos[x] for x in samples_wo_missing_lfns},
-            outfilename="samples_wo_missing_lfns.json"
+            outfilename="samples_wo_missing_lfns.json",
+            summary_format=summary_format,
         )
     
     if event_comparison and len(event_comparison) > 0:
@@ -456,6 +909,223 @@ def post_processing(
     
     
 
+def check_sample(
+    sample_dir: str,
+    suffices: list[str],
+    status_files: list[str],
+    sample_config: str,
+    dump_filelists: bool=False,
+    rm_failed: bool=False,
+    rm_dry_run: bool=False,
+    local_job_summary_dict: dict[str, Any] or None=None,
+    incremental: bool=False,
+    size_profile: bool=False,
+    target_output_size: float=2048,
+    max_units_per_job: int=50,
+    **kwargs,
+) -> tuple[str, dict[str, Any], list[dict[str, Any]] or None, dict[str, str] or None]:
+    """Function to check all crab base directories of the sample in
+    *sample_dir*, see meth::`check_crab_directory`. The checks of different
+    samples are independent of each other, so this function can also be
+    used in a worker process (see meth::`init_worker`).
+
+    Returns:
+        tuple:  name of the sample, dictionary with the summary of the sample
+                (see meth::`build_meta_info_table`), the event comparison
+                (None if the events were not compared) and the results of
+                the removal of outputs from failed jobs (None if nothing
+                was removed)
+    """
+    verbosity = kwargs.get("verbosity", 0)
+    if local_job_summary_dict is None:
+        local_job_summary_dict = dict()
+    sample_name=os.path.basename(sample_dir)
+    das_key = interface.load_das_key(
+        sample_name=sample_name, sample_config=sample_config,
+    )
+    # queue `crab status` for tasks without up-to-date status file and the
+    # listing of the remote outputs while the LFNs are loaded.
+    # If they are already queued, this does nothing
+    prefetch_job_status(
+        sample_dir=sample_dir,
+        sample_name=sample_name,
+        suffices=suffices,
+        status_files=status_files,
+    )
+    # in incremental mode, only the blocks that changed since the previous
+    # run are listed, see meth::`check_crab_directory`
+    if not incremental:
+        prefetch_remote_outputs(
+            sample_dir=sample_dir,
+            sample_name=sample_name,
+            das_key=das_key,
+            suffices=suffices,
+            status_files=status_files,
+            **kwargs,
+        )
+    # get full set of lfns for this sample
+
+    # if verbosity is >= 2, we perform an event comparison, 
+    # so create lookup map accordingly
+    event_lookup = None
+    # container for event comparisons
+    sample_event_comparison = None
+    sum_events = None
+    # all LFNs and outputs of this sample are only stored once in the
+    # interner, the sets for the book-keeping only keep integer ids
+    interner = LFNInterner()
+    if verbosity >= 1:
+        event_lookup = interface.create_event_lookup(das_key=das_key)
+        # the list of lfns is now the list of keys
+        known_lfns = LFNSet(interner, event_lookup.keys())
+        sum_events = sum(event_lookup.values())
+        if verbosity >= 2:
+            sample_event_comparison = list()
+        else:
+            event_lookup = None
+    else:
+        # otherwise, there is no need to look up the events, so just 
+        # create the set of lfns directly
+        known_lfns = LFNSet(interner, interface.get_dbs_lfns(das_key=das_key))
+
+    # if the dbs could not be contacted for some reason, use DAS
+    # to load the total number of LFNS
+    if len(known_lfns) > 0:
+        n_total = len(known_lfns)
+    else:
+        # get total number of LFNs from DAS
+        n_total = interface.get_das_information(
+            das_key=das_key
+        )
+
+    # set up the sets to keep track of the lfns
+    done_lfns=LFNSet(interner)     # set of lfns processed by successful jobs
+    
+    # set of **outputs** from failed jobs, which shouldn't happen
+    failed_job_outputs=LFNSet(interner)
+    # sidecar records of these outputs, removed together with them
+    failed_sidecars=LFNSet(interner)
+    # set of lfns of jobs whose outputs could not be listed
+    unchecked_lfns=LFNSet(interner)
+
+    # set of relevant time stamps (needed for later merging of files)
+    time_stamps = list()
+
+    # sizes of the outputs to recommend the splitting of the sample
+    output_profile = OutputProfile(sample_name) if size_profile else None
+
+    # loop through suffices to load the respective crab base directories
+    pbar_suffix = tqdm(zip(suffices, status_files))
+    for suffix, status_file in pbar_suffix:
+        check_crab_directory(
+            sample_dir=sample_dir,
+            sample_name=sample_name,
+            suffix=suffix,
+            status_file=status_file,
+            known_lfns=known_lfns,
+            done_lfns=done_lfns,
+            failed_job_outputs=failed_job_outputs,
+            failed_sidecars=failed_sidecars,
+            unchecked_lfns=unchecked_lfns,
+            pbar=pbar_suffix,
+            incremental=incremental,
+            das_key=das_key,
+            time_stamps=time_stamps,
+            event_comparison_container=sample_event_comparison,
+            event_lookup=event_lookup,
+            output_profile=output_profile,
+            **kwargs,
+        )
+
+    # reduce known_lfns with the ignored lfns
+    ignored_files=SampleCatalog.for_config(sample_config).ignored_lfns(
+        sample_name, config_file=sample_config
+    )
+    if ignored_files :
+        print("found files to ignore")
+        known_lfns = known_lfns - ignored_files
+        n_total = len(known_lfns)
+    
+    local_job_infos = local_job_summary_dict.get(sample_name)
+    if local_job_infos:
+        done_lfns.update(local_job_infos["lfns"])
+        time_stamps.append(local_job_infos["timestamp"])
+
+    # in the end, all LFNs should be accounted for
+    with tracer.span("compare LFNs", category="bookkeeping", sample=sample_name):
+        unprocessed_lfns = known_lfns.symmetric_difference(done_lfns)
+        # lfns of jobs whose outputs could not be listed are not missing,
+        # they are reported separately
+        unchecked_lfns = unchecked_lfns.intersection(unprocessed_lfns)
+        unprocessed_lfns = unprocessed_lfns.difference(unchecked_lfns)
+
+    sample_dict = dict()
+    sample_dict["das_total"] = n_total
+    sample_dict["total"] = len(known_lfns)
+    if sum_events:
+        sample_dict["sum_events"] = sum_events
+    sample_dict["done"] = len(done_lfns)
+
+    removal_results = None
+    if rm_failed and len(failed_job_outputs) > 0:
+        removal_results = interface.remove_remote_files(
+            remote_files=failed_job_outputs.union(failed_sidecars),
+            dry_run=rm_dry_run,
+        )
+        if not rm_dry_run:
+            # only keep track of the outputs that could not be removed
+            failed_job_outputs = set(
+                path for path in failed_job_outputs
+                if removal_results.get(path) != "removed"
+            )
+            if len(failed_job_outputs) > 0:
+                print(f"WARNING: could not remove {len(failed_job_outputs)} outputs of failed jobs for sample {sample_name}")
+
+    if len(failed_job_outputs) > 0:
+        sample_dict["outputs from failed jobs"] = len(failed_job_outputs)
+    sample_dict["missing"] = len(unprocessed_lfns)
+    if len(unchecked_lfns) > 0:
+        sample_dict["unchecked"] = len(unchecked_lfns)
+    sample_dict["time_stamps"] = time_stamps.copy()
+    if output_profile is not None:
+        sample_dict.update(output_profile.summary(
+            target_size=target_output_size, max_units=max_units_per_job,
+        ))
+    if dump_filelists:
+        sample_dict["total_lfns"] = list(known_lfns)
+        sample_dict["done_lfns"] = list(done_lfns)
+        sample_dict["missing_lfns"] = list(unprocessed_lfns)
+        if len(failed_job_outputs) > 0:
+            sample_dict["failed_outputs"] = list(failed_job_outputs)
+    if (not sample_event_comparison and len(unprocessed_lfns) == 0
+        and len(failed_job_outputs) > 0):
+        # if the event comparison contains nothing, it might indicate
+        # that we actually processed all events.
+        # We could then consider to delete the job outputs that were 
+        # generated from failed jobs
+        pass
+    
+    if verbosity >= 3:
+        if len(failed_job_outputs) != 0:
+            print("WARNING: found job outputs that should not be there")
+            print(f"Sample: {sample_dir}")
+            for f in failed_job_outputs:
+                print(f)
+        if len(unprocessed_lfns) != 0:
+            print(f"WARNING: following LFNs for sample {sample_dir} were not processed!")
+            for f in unprocessed_lfns:
+                print(f)
+    return sample_name, sample_dict, sample_event_comparison, removal_results
+
+def run_check_sample(sample_dir: str, **kwargs) -> tuple[tuple, list[dict[str, Any]]]:
+    """Run meth::`check_sample` within a trace span. Returns the result and
+    the recorded trace events, such that the events of worker processes
+    can be merged into the trace of the main process.
+    """
+    with tracer.span("check sample", category="sample", sample=os.path.basename(sample_dir)):
+        result = check_sample(sample_dir=sample_dir, **kwargs)
+    return result, tracer.collect()
+
 def main(*args,
     sample_dirs=[],
     # wlcg_dir=None,
@@ -465,7 +1135,18 @@ def main(*args,
     sample_config=None,
     dump_filelists=False,
     rm_failed=False,
+    rm_dry_run=False,
+    rm_manifest="rm_failed_manifest.json",
     local_job_summary=None,
+    incremental=False,
+    previous_summary=None,
+    jobs=1,
+    summary_format="json",
+    trace=None,
+    size_profile=False,
+    target_output_size=2048,
+    undersized_threshold=0.25,
+    splitting_json="splitting_recommendations.json",
     **kwargs
 ):
     """main function. Load information provided by the ArgumentParser. Loops
@@ -483,156 +1164,165 @@ def main(*args,
         for summary in local_job_summary:
             with open(summary) as f:
                 local_job_summary_dict.update(json.load(f))
-    # loop through the sample directories containing the crab base directories
-    pbar_sampledirs = tqdm(sample_dirs)
-    for sample_dir in pbar_sampledirs:
-        # if a sample dir does not exist, no need to check it
+
+    # in incremental mode, samples that were already complete in a previous
+    # summary are not checked again
+    complete_samples = dict()
+    if incremental and previous_summary:
+        for summary in previous_summary:
+            complete_samples.update({
+                sample: info for sample, info in load_summary(summary).items()
+                if is_sample_complete(info)
+            })
+
+    # queue `crab status` for all tasks without up-to-date status file and
+    # (unless in incremental mode) the listing of the remote outputs of all
+    # samples, such that they run in the background while the samples are
+    # checked.
+    # Worker processes do this with their own interface instead
+    for sample_dir in (sample_dirs if jobs <= 1 else []):
         if not os.path.exists(sample_dir):
-            if verbosity >= 1:
-                print(f"Directory {sample_dir} does not exist, skipping!")
             continue
         sample_dir = sample_dir.strip(os.path.sep)
-
-        # from IPython import embed; embed()
-        # extract the sample name from the sample directory
-        sample_name=os.path.basename(sample_dir)
-        pbar_sampledirs.set_description(f"Checking sample {sample_name}")
+        sample_name = os.path.basename(sample_dir)
+        if sample_name in complete_samples:
+            continue
         das_key = interface.load_das_key(
             sample_name=sample_name, sample_config=sample_config,
         )
-        # get full set of lfns for this sample
-
-        # if verbosity is >= 2, we perform an event comparison, 
-        # so create lookup map accordingly
-        event_lookup = None
-        # container for event comparisons
-        sample_event_comparison = None
-        sum_events = None
-        if verbosity >= 1:
-            event_lookup = interface.create_event_lookup(das_key=das_key)
-            # the list of lfns is now the list of keys
-            known_lfns = set(event_lookup.keys())
-            sum_events = sum(event_lookup.values())
-            if verbosity >= 2:
-                sample_event_comparison = list()
-            else:
-                event_lookup = None
-        else:
-            # otherwise, there is no need to look up the events, so just 
-            # create the set of lfns directly
-            known_lfns=interface.get_dbs_lfns(das_key=das_key)   
-
-        # if the dbs could not be contacted for some reason, use DAS
-        # to load the total number of LFNS
-        if len(known_lfns) > 0:
-            n_total = len(known_lfns)
-        else:
-            # get total number of LFNs from DAS
-            n_total = interface.get_das_information(
-                das_key=das_key
-            )
-
-        # set up the sets to keep track of the lfns
-        done_lfns=set()     # set of lfns processed by successful jobs
-        
-        # set of **outputs** from failed jobs, which shouldn't happen
-        failed_job_outputs=set()    
-
-        # set of relevant time stamps (needed for later merging of files)
-        time_stamps = list()
-
-        # loop through suffices to load the respective crab base directories
-        pbar_suffix = tqdm(zip(suffices, status_files))
-        for suffix, status_file in pbar_suffix:
-            check_crab_directory(
+        # the summary from DAS is only needed if there is no file list
+        if not interface.has_file_list(das_key):
+            interface.prefetch_das_information([das_key])
+        prefetch_job_status(
+            sample_dir=sample_dir,
+            sample_name=sample_name,
+            suffices=suffices,
+            status_files=status_files,
+        )
+        if not incremental:
+            prefetch_remote_outputs(
                 sample_dir=sample_dir,
                 sample_name=sample_name,
-                suffix=suffix,
-                status_file=status_file,
-                known_lfns=known_lfns,
-                done_lfns=done_lfns,
-                failed_job_outputs=failed_job_outputs,
-                pbar=pbar_suffix,
                 das_key=das_key,
-                time_stamps=time_stamps,
-                event_comparison_container=sample_event_comparison,
-                event_lookup=event_lookup,
+                suffices=suffices,
+                status_files=status_files,
                 **kwargs,
             )
 
-        # reduce known_lfns with the ignored lfns
-        with open(sample_config, "r") as f:
-            config_file_inputs=yaml.safe_load(f)
-        ignored_files=config_file_inputs[sample_name].get("ignore_miniAOD_LFNs")
-        if ignored_files :
-            print("found files to ignore")
-            known_lfns = known_lfns - set(ignored_files)
-            n_total = len(known_lfns)
-        
-        local_job_infos = local_job_summary_dict.get(sample_name)
-        if local_job_infos:
-            done_lfns.update(local_job_infos["lfns"])
-            time_stamps.append(local_job_infos["timestamp"])
-
-        # in the end, all LFNs should be accounted for
-        unprocessed_lfns = known_lfns.symmetric_difference(done_lfns)
-
-        sample_dict = dict()
-        sample_dict["das_total"] = n_total
-        sample_dict["total"] = len(known_lfns)
-        if sum_events:
-            sample_dict["sum_events"] = sum_events
-        sample_dict["done"] = len(done_lfns)
-
-        if rm_failed:
-            # rm_bar = tqdm(failed_job_outputs)
-            # for f in rm_bar:
-                # rm_bar.set_description(f"Deleting file {f}")
-            def chunks(lst, n):
-                """Yield successive n-sized chunks from lst."""
-                for i in range(0, len(lst), n):
-                    yield lst[i:i + n]
-            for c in list(chunks(list(failed_job_outputs), 400)):      
-                cmd = f"gfal-rm {' '.join(c)}"
-                call([cmd], shell=True)
-            failed_job_outputs = set()
+    # loop through the sample directories containing the crab base directories
+    # and check them either one after another or in a pool of worker processes
+    relevant_sample_dirs = list()
+    for sample_dir in sample_dirs:
+        # if a sample dir does not exist, no need to check it
+        if not os.path.exists(sample_dir):
+            if verbosity >= 1:
+                print(f"Directory {sample_dir} does not exist, skipping!")
+            continue
+        sample_dir = sample_dir.strip(os.path.sep)
 
-        if len(failed_job_outputs) > 0:
-            sample_dict["outputs from failed jobs"] = len(failed_job_outputs)
-        sample_dict["missing"] = len(unprocessed_lfns)
-        sample_dict["time_stamps"] = time_stamps.copy()
-        if dump_filelists:
-            sample_dict["total_lfns"] = list(known_lfns.copy())
-            sample_dict["done_lfns"] = list(done_lfns.copy())
-            sample_dict["missing_lfns"] = list(unprocessed_lfns.copy())
-            if len(failed_job_outputs) > 0:
-                sample_dict["failed_outputs"] = list(failed_job_outputs.copy())
-        meta_infos[sample_name] = sample_dict.copy()
+        # extract the sample name from the sample directory
+        sample_name=os.path.basename(sample_dir)
+        if sample_name in complete_samples:
+            if verbosity >= 1:
+                print(f"Sample {sample_name} was already complete, skipping!")
+            meta_infos[sample_name] = complete_samples[sample_name]
+            continue
+        relevant_sample_dirs.append(sample_dir)
+
+    sample_kwargs = dict(
+        suffices=suffices,
+        status_files=status_files,
+        sample_config=sample_config,
+        dump_filelists=dump_filelists,
+        rm_failed=rm_failed,
+        rm_dry_run=rm_dry_run,
+        local_job_summary_dict=local_job_summary_dict,
+        incremental=incremental,
+        size_profile=size_profile,
+        target_output_size=target_output_size,
+        **kwargs,
+    )
+    if jobs > 1:
+        # every worker needs its own interface, so create the workers with
+        # 'spawn' and set up the interface in the initializer
+        executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(interface_settings,),
+        )
+        with executor:
+            futures = [
+                executor.submit(run_check_sample, sample_dir=sample_dir, **sample_kwargs)
+                for sample_dir in relevant_sample_dirs
+            ]
+            pbar_samples = tqdm(as_completed(futures), total=len(futures))
+            pbar_samples.set_description("Checking samples")
+            for _ in pbar_samples:
+                pass
+            # collect the results in the order of the sample directories,
+            # such that the output does not depend on the scheduling
+            results = [future.result() for future in futures]
+    else:
+        results = list()
+        pbar_sampledirs = tqdm(relevant_sample_dirs)
+        for sample_dir in pbar_sampledirs:
+            pbar_sampledirs.set_description(f"Checking sample {os.path.basename(sample_dir)}")
+            results.append(run_check_sample(sample_dir=sample_dir, **sample_kwargs))
+
+    removal_manifest = dict()
+    for result, trace_events in results:
+        tracer.merge(trace_events)
+        sample_name, sample_dict, sample_event_comparison, removal_results = result
+        meta_infos[sample_name] = sample_dict
         if sample_event_comparison and len(sample_event_comparison) > 0:
-            event_comparison[sample_name] = sample_event_comparison.copy()
-        elif len(unprocessed_lfns) == 0 and len(failed_job_outputs) > 0:
-            # if the event comparison contains nothing, it might indicate
-            # that we actually processed all events.
-            # We could then consider to delete the job outputs that were 
-            # generated from failed jobs
-            pass
-        
-        if verbosity >= 3:
-            if len(failed_job_outputs) != 0:
-                print("WARNING: found job outputs that should not be there")
-                print(f"Sample: {sample_dir}")
-                for f in failed_job_outputs:
-                    print(f)
-            if len(unprocessed_lfns) != 0:
-                print(f"WARNING: following LFNs for sample {sample_dir} were not processed!")
-                for f in unprocessed_lfns:
-                    print(f)
+            event_comparison[sample_name] = sample_event_comparison
+        if removal_results:
+            removal_manifest[sample_name] = removal_results
+
+    if rm_failed:
+        # save the result of the removal for every file
+        with open(rm_manifest, "w") as f:
+            json.dump(removal_manifest, f, indent=4)
+        n_files = sum(len(x) for x in removal_manifest.values())
+        if rm_dry_run:
+            print(f"Dry run: {n_files} outputs of failed jobs would be removed, see '{rm_manifest}'")
+        else:
+            n_removed = sum(
+                list(x.values()).count("removed") for x in removal_manifest.values()
+            )
+            print(f"Removed {n_removed}/{n_files} outputs of failed jobs, see '{rm_manifest}'")
     
-    post_processing(meta_infos=meta_infos, event_comparison=event_comparison)
+    post_processing(
+        meta_infos=meta_infos,
+        event_comparison=event_comparison,
+        summary_format=summary_format,
+    )
+
+    if size_profile:
+        print("\n\n")
+        print_size_profile_table(
+            meta_infos=meta_infos,
+            target_size=target_output_size,
+            threshold=undersized_threshold,
+        )
+        write_splitting_recommendations(
+            meta_infos=meta_infos,
+            path=splitting_json,
+            target_size=target_output_size,
+            threshold=undersized_threshold,
+        )
+        print(f"\nRecommended splitting saved in '{splitting_json}', apply it with update_sample_config.py")
+
+    if trace:
+        tracer.write(trace)
+        print(f"\nTime spent per phase (trace saved in '{trace}'):")
+        tracer.print_summary()
 
 def build_meta_info_table(
     meta_infos: dict,
-    outfilename: str="crab_job_summary.json"
+    outfilename: str="crab_job_summary.json",
+    summary_format: str="json",
 ) -> None:
     """Helper function to convert collected information of crab jobs into
     human-readable table. The information is safed in *meta_infos*, which
@@ -649,6 +1339,9 @@ def build_meta_info_table(
 
     Current supported formats: markdown (md)
 
+    The information is saved in *outfilename*, where the extension is
+    replaced according to *summary_format* (see module::`summary_io`).
+
     Args:
         meta_infos (dict): Dictionary containing above mentioned information
     """    
@@ -682,8 +1375,11 @@ def build_meta_info_table(
     # create final table
     table = "\n".join(lines)
     print(table)
-    with open(outfilename, "w") as f:
-        json.dump(meta_infos, f, indent=4)
+    write_summary(
+        meta_infos,
+        path=summary_path(outfilename, summary_format),
+        summary_format=summary_format,
+    )
 
 
 def parse_arguments():
@@ -832,6 +1528,35 @@ def parse_arguments():
         dest="rm_failed",
     )
 
+    parser.add_argument(
+        "--rm-dry-run",
+        help=" ".join(
+            """
+            together with `--rm-failed`, only write the outputs of failed
+            jobs that would be removed to the manifest (see `--rm-manifest`)
+            without removing them
+            """.split()
+        ),
+        default=False,
+        action="store_true",
+        dest="rm_dry_run",
+    )
+
+    parser.add_argument(
+        "--rm-manifest",
+        help=" ".join(
+            """
+            path to the .json file that contains the result of the removal
+            for every output of failed jobs. Defaults to
+            'rm_failed_manifest.json'
+            """.split()
+        ),
+        default="rm_failed_manifest.json",
+        type=str,
+        dest="rm_manifest",
+        metavar="path/to/manifest.json",
+    )
+
     parser.add_argument(
         "sample_dirs",
         help=" ".join("""
@@ -860,6 +1585,337 @@ def parse_arguments():
     )
 
 
+    parser.add_argument(
+        "--listing-workers",
+        help=" ".join(
+            """
+            number of remote directories that are listed concurrently.
+            Also defines the number of gfal contexts that are shared between
+            the listings. Defaults to 8
+            """.split()
+        ),
+        type=int,
+        default=8,
+        dest="listing_workers",
+    )
+
+    parser.add_argument(
+        "--listing-timeout",
+        help=" ".join(
+            """
+            timeout in seconds for a single listing request to the remote
+            site. The jobs of directories that cannot be listed within this
+            time are reported as 'unchecked' instead of 'missing'.
+            Defaults to 300
+            """.split()
+        ),
+        type=int,
+        default=300,
+        dest="listing_timeout",
+    )
+
+    parser.add_argument(
+        "--event-workers",
+        help=" ".join(
+            """
+            number of job outputs that are opened concurrently to count
+            the events (only relevant for verbosity >= 2). Defaults to 8
+            """.split()
+        ),
+        type=int,
+        default=8,
+        dest="event_workers",
+    )
+
+    parser.add_argument(
+        "--event-timeout",
+        help=" ".join(
+            """
+            timeout in seconds for opening a single job output to count
+            the events. Defaults to 60
+            """.split()
+        ),
+        type=int,
+        default=60,
+        dest="event_timeout",
+    )
+
+    parser.add_argument(
+        "--event-retries",
+        help=" ".join(
+            """
+            number of additional attempts to open a job output if the first
+            attempt fails. Outputs that still cannot be opened are listed
+            in the event comparison. Defaults to 2
+            """.split()
+        ),
+        type=int,
+        default=2,
+        dest="event_retries",
+    )
+
+    parser.add_argument(
+        "--event-pool",
+        help=" ".join(
+            """
+            type of worker pool to count the events, either 'thread' or
+            'process'. Defaults to 'thread'
+            """.split()
+        ),
+        choices=["thread", "process"],
+        default="thread",
+        dest="event_pool",
+    )
+
+    parser.add_argument(
+        "--dbs-cache",
+        help=" ".join(
+            """
+            path to the SQLite file that caches the file lists and event
+            counts from DBS/DAS. Defaults to
+            $ANALYSIS_DATA_PATH/dbs_cache.sqlite
+            """.split()
+        ),
+        type=str,
+        default=None,
+        dest="dbs_cache",
+        metavar="path/to/dbs_cache.sqlite",
+    )
+
+    parser.add_argument(
+        "--dbs-cache-ttl",
+        help=" ".join(
+            """
+            time in hours after which cached DBS/DAS information expires.
+            Use a negative value to never expire entries. Defaults to 168
+            """.split()
+        ),
+        type=float,
+        default=168,
+        dest="dbs_cache_ttl",
+    )
+
+    parser.add_argument(
+        "--refresh-dbs-cache",
+        help=" ".join(
+            """
+            ignore the cached DBS/DAS information for all samples that are
+            checked and query DBS/DAS again
+            """.split()
+        ),
+        action="store_true",
+        default=False,
+        dest="refresh_dbs_cache",
+    )
+
+    parser.add_argument(
+        "--dbs-workers",
+        help=" ".join(
+            """
+            number of blocks of a dataset whose file lists are loaded from
+            DBS in parallel. Defaults to 8
+            """.split()
+        ),
+        type=int,
+        default=8,
+        dest="dbs_workers",
+    )
+
+    parser.add_argument(
+        "--das-workers",
+        help=" ".join(
+            """
+            number of dasgoclient queries that run in parallel if the file
+            lists cannot be loaded from DBS. Defaults to 4
+            """.split()
+        ),
+        type=int,
+        default=4,
+        dest="das_workers",
+    )
+
+    parser.add_argument(
+        "--no-dbs-cache",
+        help="do not cache DBS/DAS information on disk",
+        action="store_false",
+        default=True,
+        dest="use_dbs_cache",
+    )
+
+    parser.add_argument(
+        "--incremental",
+        help=" ".join(
+            """
+            save the state of every crab base directory and only check the
+            directories again whose status, crab directory or remote output
+            blocks changed since the last run. Samples that are complete in
+            the summaries given with `--previous-summary` are skipped
+            """.split()
+        ),
+        action="store_true",
+        default=False,
+        dest="incremental",
+    )
+
+    parser.add_argument(
+        "--previous-summary",
+        help=" ".join(
+            """
+            path to summary files of previous runs (e.g. crab_job_summary.json).
+            Only used together with `--incremental`
+            """.split()
+        ),
+        metavar="path/to/crab_job_summary.json",
+        nargs="+",
+        type=str,
+        default=None,
+        dest="previous_summary",
+    )
+
+    parser.add_argument(
+        "-j", "--jobs",
+        help=" ".join(
+            """
+            number of samples that are checked in parallel in separate
+            processes. Defaults to 1
+            """.split()
+        ),
+        type=int,
+        default=1,
+        dest="jobs",
+    )
+
+    parser.add_argument(
+        "--status-workers",
+        help=" ".join(
+            """
+            number of `crab status` calls that run in parallel for tasks
+            without an up-to-date status file. Defaults to 4
+            """.split()
+        ),
+        type=int,
+        default=4,
+        dest="status_workers",
+    )
+
+    parser.add_argument(
+        "--trace",
+        help=" ".join(
+            """
+            record the time spent in the different phases (DBS, crab
+            status, listing, event counting, book-keeping) and save it in
+            the Chrome trace format to this file. A summary is printed at
+            the end
+            """.split()
+        ),
+        metavar="path/to/trace.json",
+        type=str,
+        default=None,
+        dest="trace",
+    )
+
+    parser.add_argument(
+        "--no-local-mount",
+        help=" ".join(
+            """
+            always contact the WLCG directory with the `--wlcg-prefix`.
+            By default, the outputs are listed directly on the file system
+            if the WLCG directory is mounted on this node (e.g. /pnfs on
+            the NAF)
+            """.split()
+        ),
+        action="store_false",
+        default=True,
+        dest="use_local_mount",
+    )
+
+    parser.add_argument(
+        "--summary-format",
+        help=" ".join(
+            """
+            format of the summary files. 'parquet' saves every sample in
+            its own row group, such that the missing LFNs of a single sample
+            can be loaded without reading the complete file (requires
+            pyarrow). Defaults to 'json'
+            """.split()
+        ),
+        choices=SUMMARY_FORMATS,
+        default="json",
+        dest="summary_format",
+    )
+
+    parser.add_argument(
+        "--size-profile",
+        help=" ".join(
+            """
+            collect the sizes of the outputs of finished jobs (and the
+            number of events from their sidecar records) while the outputs
+            are listed. For every sample, a size histogram and the
+            recommended unitsPerJob for the `--target-output-size` are
+            printed and saved in `--splitting-json`
+            """.split()
+        ),
+        action="store_true",
+        default=False,
+        dest="size_profile",
+    )
+
+    parser.add_argument(
+        "--target-output-size",
+        help=" ".join(
+            """
+            target size of the outputs in MB, i.e. the targetOutputFileSize
+            of the crabOverseer config. Only used with `--size-profile`.
+            Defaults to 2048
+            """.split()
+        ),
+        type=float,
+        default=2048,
+        dest="target_output_size",
+    )
+
+    parser.add_argument(
+        "--max-units-per-job",
+        help=" ".join(
+            """
+            upper limit for the recommended number of input files per job.
+            Only used with `--size-profile`. Defaults to 50
+            """.split()
+        ),
+        type=int,
+        default=50,
+        dest="max_units_per_job",
+    )
+
+    parser.add_argument(
+        "--undersized-threshold",
+        help=" ".join(
+            """
+            samples whose median output is smaller than this fraction of
+            the `--target-output-size` are marked as undersized. Only used
+            with `--size-profile`. Defaults to 0.25
+            """.split()
+        ),
+        type=float,
+        default=0.25,
+        dest="undersized_threshold",
+    )
+
+    parser.add_argument(
+        "--splitting-json",
+        help=" ".join(
+            """
+            path to the file for the recommended splitting of the samples.
+            Only used with `--size-profile`. Defaults to
+            splitting_recommendations.json
+            """.split()
+        ),
+        metavar="path/to/splitting_recommendations.json",
+        type=str,
+        default="splitting_recommendations.json",
+        dest="splitting_json",
+    )
+
     parser.add_argument("-l", "--local-job-summary",
         help=" ".join(
             """
@@ -884,7 +1940,7 @@ def parse_arguments():
     
     global verbosity
     verbosity = args.verbosity
-    interface.verbosity = verbosity
+    setup_interface(**vars(args))
     return args
 
 if __name__ == '__main__':
@@ -0,0 +1,93 @@
+import os
+import json
+
+from typing import Any
+
+
+def file_fingerprint(path: str or None) -> list[float] or None:
+    """Small function to build a fingerprint of the file at *path* from its
+    modification time and size. Returns None if the file does not exist.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_mtime, stat.st_size]
+
+
+class CrabDirState(object):
+    """State of a crab base directory from a previous run of check_crab_jobs.py.
+    The state is saved as .json file in the crab base directory and contains
+    - fingerprint:  information to decide whether the directory changed since
+                    the last check, e.g. the modification time of the status
+                    .json file and the job inputs. The modification time of
+                    the crab base directory itself is not used, since saving
+                    the state changes it
+    - blocks:       snapshot of the remote listing, i.e. the modification time
+                    and the files of every output block
+    - results:      the results of the check, i.e. the done LFNs, the outputs of
+                    failed jobs, the time stamp and the event comparison
+    """
+    version = 1
+
+    def __init__(
+        self,
+        crab_dir: str,
+        state_file: str="check_crab_jobs_state.json",
+    ):
+        self.path = os.path.join(crab_dir, state_file)
+        self.fingerprint = None
+        self.blocks = dict()
+        self.results = dict()
+
+    def load(self) -> bool:
+        """Load the state from disk. Returns True if a state of the current
+        version was found.
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: could not load state from '{self.path}': {e}")
+            return False
+        if state.get("version") != self.version:
+            return False
+        self.fingerprint = state.get("fingerprint")
+        self.blocks = state.get("blocks", dict())
+        self.results = state.get("results", dict())
+        return True
+
+    def save(
+        self,
+        fingerprint: dict[str, Any],
+        blocks: dict[str, dict[str, Any]],
+        results: dict[str, Any],
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.blocks = blocks
+        self.results = results
+        # write to a temporary file first such that an aborted run cannot
+        # leave a broken state behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": self.version,
+                "fingerprint": fingerprint,
+                "blocks": blocks,
+                "results": results,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def matches(self, fingerprint: dict[str, Any]) -> bool:
+        return self.fingerprint is not None and self.fingerprint == fingerprint
+
+    def unchanged_blocks(self, mtimes: dict[str, float or None]) -> set[str]:
+        """Return the blocks in *mtimes* whose modification time is known
+        and did not change w.r.t. the snapshot.
+        """
+        return set(
+            path for path, mtime in mtimes.items()
+            if mtime is not None and path in self.blocks
+            and self.blocks[path].get("mtime") == mtime
+        )
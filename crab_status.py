@@ -0,0 +1,96 @@
+import os
+
+from threading import Lock
+from typing import Any, Callable
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from crab_dir_state import file_fingerprint
+
+
+def crab_dir_fingerprint(crab_dir: str) -> list[Any]:
+    """Fingerprint of a crab base directory, i.e. the modification time of
+    the directory and the fingerprint of the request cache, which crab
+    updates when the task changes (see meth::`file_fingerprint`).
+    """
+    return [
+        os.stat(crab_dir).st_mtime if os.path.exists(crab_dir) else None,
+        file_fingerprint(os.path.join(crab_dir, ".requestcache")),
+    ]
+
+
+class StatusCollector(object):
+    """Collect the status of crab tasks with `crab status` in a pool of
+    *max_workers* threads. Every call of `crab status` takes a while, so the
+    status of all relevant tasks can be requested in advance with
+    meth::`prefetch` and is collected with meth::`get` once it is needed.
+    The parsed status is cached for the lifetime of the collector and keyed
+    by the absolute path of the crab base directory and its fingerprint
+    (see meth::`crab_dir_fingerprint`), so the same task is only queried
+    again if it changed.
+
+    Args:
+        query (Callable[[str], dict]):  function to obtain the parsed status
+                                        of a crab base directory
+        max_workers (int, optional):    number of concurrent queries.
+                                        Defaults to 4.
+    """
+    def __init__(
+        self,
+        query: Callable[[str], dict[str, Any]],
+        max_workers: int=4,
+        verbosity: int=0,
+    ):
+        self.query = query
+        self.max_workers = max_workers
+        self.verbosity = verbosity
+        self.executor = None
+        self.futures = dict()
+        self.__lock = Lock()
+
+    def key(self, crab_dir: str) -> tuple[str, str]:
+        return os.path.abspath(crab_dir), repr(crab_dir_fingerprint(crab_dir))
+
+    def submit(self, crab_dir: str) -> Future:
+        """Queue the query for the status of *crab_dir*. If the status was
+        already requested and the task did not change, the existing future is
+        returned.
+        """
+        key = self.key(crab_dir)
+        with self.__lock:
+            future = self.futures.get(key)
+            if future is None:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                if self.verbosity >= 1:
+                    print(f"Querying status of crab task in '{crab_dir}'")
+                future = self.executor.submit(self.run_query, crab_dir)
+                self.futures[key] = future
+        return future
+
+    def run_query(self, crab_dir: str) -> dict[str, Any]:
+        status = self.query(crab_dir)
+        # `crab status` itself may touch the crab base directory, which must
+        # not trigger another query, so the status is also cached for the
+        # fingerprint after the query
+        key = self.key(crab_dir)
+        with self.__lock:
+            if key not in self.futures:
+                future = Future()
+                future.set_result(status)
+                self.futures[key] = future
+        return status
+
+    def prefetch(self, crab_dirs: list[str]) -> None:
+        for crab_dir in crab_dirs:
+            self.submit(crab_dir)
+
+    def get(self, crab_dir: str) -> dict[str, Any]:
+        """Return the status of *crab_dir*. Exceptions of the query are
+        raised here.
+        """
+        return self.submit(crab_dir).result()
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
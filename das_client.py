@@ -0,0 +1,152 @@
+import json
+
+from subprocess import PIPE, Popen
+from threading import Lock
+from typing import Any
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from tracing import tracer
+
+# summary information about a dataset, which DAS returns with a single
+# query for the dataset
+DAS_FIELDS = ["file_size", "num_event", "num_file"]
+
+
+def run_das_query(query: str) -> list[dict[str, Any]]:
+    """Run the DAS query *query* with dasgoclient and return the parsed
+    json output.
+
+    Raises:
+        ValueError: if the output of dasgoclient cannot be parsed
+    """
+    process = Popen(
+        ["dasgoclient", "-query", query, "-json"],
+        stdin=PIPE, stdout=PIPE, stderr=PIPE,
+    )
+    output, _ = process.communicate()
+    return json.loads(output)
+
+
+def parse_dataset_information(
+    das_infos: list[dict[str, Any]],
+    fields: Iterable[str]=DAS_FIELDS,
+) -> dict[str, Any]:
+    """Extract the summary *fields* from the output of a DAS query for a
+    dataset. DAS returns several records from different services, and not
+    all of them have the same information. A field is only extracted if all
+    records that provide it agree on its value.
+
+    Returns:
+        dict[str, Any]: Dictionary of format {field: value} for all fields
+                        that could be extracted
+    """
+    information = dict()
+    for field in fields:
+        relevant_values = list(set(
+            y.get(field)
+            # only consider entries in DAS info list with dataset information
+            for x in das_infos if "dataset" in x.keys()
+            # only consider those elements in dataset info that also have
+            # the relevant information
+            for y in x["dataset"] if field in y.keys()
+        ))
+        # if this set has more than 1 or zero entries, something went wrong
+        if len(relevant_values) == 1:
+            information[field] = relevant_values[0]
+    return information
+
+
+class DASClient(object):
+    """Batched access to the summary information of datasets in DAS. All
+    fields (see DAS_FIELDS) of a dataset are obtained with a single call of
+    dasgoclient, and the calls for different datasets run concurrently in a
+    pool of *max_workers* threads. The results are kept for the lifetime of
+    the client and are stored in the persistent *cache* (see
+    class::`DBSCache`) if given, so every dataset is queried at most once.
+    The datasets that are needed later can be requested in advance with
+    meth::`prefetch`.
+    """
+    def __init__(
+        self,
+        max_workers: int=4,
+        cache=None,
+        verbosity: int=0,
+    ):
+        self.max_workers = max_workers
+        self.cache = cache
+        self.verbosity = verbosity
+        self.executor = None
+        self.futures = dict()
+        self.__lock = Lock()
+
+    def load_cached(self, das_key: str) -> dict[str, Any] or None:
+        """Load the information for *das_key* from the persistent cache.
+        Returns None unless all fields are cached.
+        """
+        if not self.cache:
+            return None
+        information = dict()
+        for field in DAS_FIELDS:
+            value = self.cache.load_das_information(das_key, field)
+            if value is None:
+                return None
+            information[field] = value
+        return information
+
+    @tracer.traced("query DAS", category="das")
+    def query(self, das_key: str) -> dict[str, Any]:
+        try:
+            information = parse_dataset_information(run_das_query(das_key))
+        except Exception as e:
+            # something went wrong in the query or the parsing, so there is
+            # no information for this dataset
+            if self.verbosity >= 1:
+                print(f"WARNING: DAS query for '{das_key}' failed: {e}")
+            return dict()
+        if self.cache:
+            for field, value in information.items():
+                self.cache.store_das_information(das_key, field, value)
+        return information
+
+    def submit(self, das_key: str) -> Future:
+        """Queue the query for *das_key* unless it is already known."""
+        with self.__lock:
+            future = self.futures.get(das_key)
+            if future is None:
+                future = Future()
+                cached = self.load_cached(das_key)
+                if cached is not None:
+                    future.set_result(cached)
+                else:
+                    if self.executor is None:
+                        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                    future = self.executor.submit(self.query, das_key)
+                self.futures[das_key] = future
+        return future
+
+    def prefetch(self, das_keys: Iterable[str]) -> None:
+        for das_key in das_keys:
+            self.submit(das_key)
+
+    def get(self, das_key: str, field: str, default: Any=-1) -> Any:
+        """Return the value of *field* for dataset *das_key*, or *default*
+        if it could not be obtained.
+        """
+        if not field in DAS_FIELDS:
+            raise ValueError(f"Unknown DAS field '{field}', allowed fields: {', '.join(DAS_FIELDS)}")
+        return self.submit(das_key).result().get(field, default)
+
+    def query_files(self, query: str) -> list[dict[str, Any]]:
+        """Run the file query *query* (e.g. 'file dataset=...') and return
+        the information of all files.
+        """
+        file_list = list()
+        for info in run_das_query(query):
+            file_list += info.get("file", [])
+        return file_list
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import sqlite3
+
+from itertools import repeat
+from contextlib import closing
+from typing import Any
+from collections.abc import Iterable
+
+
+def default_cache_path() -> str:
+    """Default location of the cache file. Uses $ANALYSIS_DATA_PATH if it
+    is set (see env.sh), else '~/.cache/nanoprod'.
+    """
+    cache_dir = os.environ.get(
+        "ANALYSIS_DATA_PATH",
+        os.path.join(os.path.expanduser("~"), ".cache", "nanoprod")
+    )
+    return os.path.join(cache_dir, "dbs_cache.sqlite")
+
+
+def normalize_file_info(info: dict[str, Any]) -> dict[str, Any]:
+    """Convert the information about a single file to the format of the DBS
+    detail listing. *info* can either follow the DBS format
+    ('logical_file_name', 'event_count', ...) or the dasgoclient format
+    ('name', 'nevents', 'size', ...).
+    """
+    def get(*keys):
+        for key in keys:
+            if key in info:
+                return info[key]
+        return None
+
+    return {
+        "logical_file_name": get("logical_file_name", "name"),
+        "is_file_valid": bool(get("is_file_valid")),
+        "event_count": get("event_count", "nevents"),
+        "file_size": get("file_size", "size"),
+        "adler32": get("adler32", "checksum"),
+    }
+
+
+class DBSCache(object):
+    """Persistent on-disk cache for information from DBS and DAS.
+    The information is stored in a SQLite database at *path* and is keyed
+    by the DAS key of the dataset. For every dataset, the complete file list
+    is stored including the validity flag, the number of events, the file
+    size and the adler32 checksum of every LFN. Additionally, summary
+    information obtained with dasgoclient (e.g. 'num_file') is stored.
+
+    Entries older than *ttl* seconds are considered as expired. If *ttl*
+    is None, entries never expire. If *refresh* is True, entries stored
+    before the cache object was created are ignored, which effectively
+    invalidates the entries for all datasets that are queried.
+    """
+    def __init__(
+        self,
+        path: str or None=None,
+        ttl: float or None=7*24*3600,
+        refresh: bool=False,
+    ):
+        self.path = path if path else default_cache_path()
+        self.ttl = ttl
+        self.refresh = refresh
+        self.created_at = time.time()
+        cache_dir = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        with closing(self.connect()) as connection, connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS datasets (
+                    das_key TEXT PRIMARY KEY,
+                    fetched_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    das_key TEXT,
+                    lfn TEXT,
+                    is_valid INTEGER,
+                    event_count INTEGER,
+                    file_size INTEGER,
+                    adler32 TEXT,
+                    PRIMARY KEY (das_key, lfn)
+                );
+                CREATE INDEX IF NOT EXISTS files_lfn ON files (lfn);
+                CREATE TABLE IF NOT EXISTS das_info (
+                    das_key TEXT,
+                    field TEXT,
+                    value TEXT,
+                    fetched_at REAL,
+                    PRIMARY KEY (das_key, field)
+                );
+            """)
+
+    def connect(self) -> sqlite3.Connection:
+        # connections are created per operation, such that the cache can be
+        # used from several threads and processes
+        return sqlite3.connect(self.path, timeout=60)
+
+    def is_valid_entry(self, fetched_at: float or None) -> bool:
+        if fetched_at is None:
+            return False
+        if self.refresh and fetched_at < self.created_at:
+            return False
+        if self.ttl is None:
+            return True
+        return time.time() - fetched_at < self.ttl
+
+    def has_file_list(self, das_key: str) -> bool:
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT fetched_at FROM datasets WHERE das_key = ?", (das_key,)
+            ).fetchone()
+        return row is not None and self.is_valid_entry(row[0])
+
+    def load_file_columns(
+        self,
+        das_key: str,
+        valid_only: bool=True,
+    ) -> tuple[list, list, list, list] or None:
+        """Load the file list of dataset *das_key* from the cache in column
+        form, i.e. without a dictionary per file.
+
+        Args:
+            das_key (str): DAS key of the dataset
+            valid_only (bool, optional):    only return files where the flag
+                                            'is_file_valid' is set.
+                                            Defaults to True.
+
+        Returns:
+            tuple or None:  the LFNs, the number of events, the file sizes and
+                            the adler32 checksums, or None if there is no
+                            valid entry for *das_key*
+        """
+        if not self.has_file_list(das_key):
+            return None
+        query = """
+            SELECT lfn, event_count, file_size, adler32
+            FROM files WHERE das_key = ?
+        """
+        if valid_only:
+            query += " AND is_valid = 1"
+        with closing(self.connect()) as connection:
+            rows = connection.execute(query, (das_key,)).fetchall()
+        if len(rows) == 0:
+            return list(), list(), list(), list()
+        return tuple(list(x) for x in zip(*rows))
+
+    def load_file_info(self, lfn: str) -> dict[str, Any] or None:
+        """Load the information for the single file *lfn* from any cached
+        dataset. Returns None if there is no valid entry.
+        """
+        with closing(self.connect()) as connection:
+            row = connection.execute("""
+                SELECT files.lfn, files.is_valid, files.event_count,
+                    files.file_size, files.adler32, datasets.fetched_at
+                FROM files JOIN datasets ON files.das_key = datasets.das_key
+                WHERE files.lfn = ?
+            """, (lfn,)).fetchone()
+        if row is None or not self.is_valid_entry(row[5]):
+            return None
+        return {
+            "logical_file_name": row[0],
+            "is_file_valid": bool(row[1]),
+            "event_count": row[2],
+            "file_size": row[3],
+            "adler32": row[4],
+        }
+
+    def store_file_columns(
+        self,
+        das_key: str,
+        lfns: list[str],
+        event_counts: Iterable[int or None],
+        file_sizes: Iterable[int or None],
+        adler32: Iterable[str or None],
+        is_valid: Iterable[bool] or None=None,
+    ) -> None:
+        """Store the file list of dataset *das_key* in column form, i.e. one
+        list per field in the format of the DBS detail listing. Existing
+        entries for this dataset are replaced. If *is_valid* is None, all
+        files are stored as valid.
+        """
+        rows = zip(
+            repeat(das_key),
+            lfns,
+            repeat(1) if is_valid is None else map(int, is_valid),
+            event_counts,
+            file_sizes,
+            adler32,
+        )
+        with closing(self.connect()) as connection, connection:
+            connection.execute("DELETE FROM files WHERE das_key = ?", (das_key,))
+            connection.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO datasets VALUES (?, ?)",
+                (das_key, time.time())
+            )
+
+    def load_das_information(self, das_key: str, field: str) -> Any or None:
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT value, fetched_at FROM das_info WHERE das_key = ? AND field = ?",
+                (das_key, field)
+            ).fetchone()
+        if row is None or not self.is_valid_entry(row[1]):
+            return None
+        return json.loads(row[0])
+
+    def store_das_information(self, das_key: str, field: str, value: Any) -> None:
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO das_info VALUES (?, ?, ?, ?)",
+                (das_key, field, json.dumps(value), time.time())
+            )
+
+    def invalidate(self, das_key: str or None=None) -> None:
+        """Remove all cached information for dataset *das_key*. If *das_key*
+        is None, the complete cache is cleared.
+        """
+        with closing(self.connect()) as connection, connection:
+            for table in ["datasets", "files", "das_info"]:
+                if das_key is None:
+                    connection.execute(f"DELETE FROM {table}")
+                else:
+                    connection.execute(
+                        f"DELETE FROM {table} WHERE das_key = ?", (das_key,)
+                    )
@@ -0,0 +1,146 @@
+import numpy as np
+
+from typing import Any
+from collections.abc import Iterable
+
+from dbs_cache import normalize_file_info
+
+
+def parse_adler32(checksum: str or None) -> int:
+    """Convert the hexadecimal adler32 *checksum* to an integer, -1 if the
+    checksum is unknown.
+    """
+    try:
+        return int(checksum, 16)
+    except (TypeError, ValueError):
+        return -1
+
+
+class DBSFileTable(object):
+    """Compact table of the valid files of a dataset. Only the fields that
+    are needed for the checks are kept: the LFNs and numpy arrays with the
+    number of events, the file sizes and the adler32 checksums (as integers,
+    -1 if unknown). Compared to the detail dictionaries of DBS, this needs
+    only a fraction of the memory for large datasets.
+    """
+    def __init__(
+        self,
+        lfns: list[str] or None=None,
+        event_counts: Iterable[int] or None=None,
+        file_sizes: Iterable[int] or None=None,
+        adler32: Iterable[int] or None=None,
+    ):
+        self.lfns = list(lfns) if lfns else list()
+        n_files = len(self.lfns)
+        self.event_counts = self.to_array(event_counts, n_files)
+        self.file_sizes = self.to_array(file_sizes, n_files)
+        self.adler32 = self.to_array(adler32, n_files)
+
+    @staticmethod
+    def to_array(values: Iterable[int] or None, n_files: int) -> np.ndarray:
+        if values is None:
+            return np.full(n_files, -1, dtype=np.int64)
+        return np.asarray(
+            [-1 if x is None else x for x in values], dtype=np.int64
+        ).reshape(n_files)
+
+    @classmethod
+    def from_file_infos(
+        cls,
+        file_infos: Iterable[dict[str, Any]],
+        valid_only: bool=True,
+    ) -> "DBSFileTable":
+        """Create the table from the DBS detail listing or the output of
+        dasgoclient (see meth::`normalize_file_info`). If *valid_only* is
+        True, files where the flag 'is_file_valid' is not set are skipped.
+        """
+        lfns, event_counts, file_sizes, adler32 = list(), list(), list(), list()
+        for info in map(normalize_file_info, file_infos):
+            if valid_only and not info["is_file_valid"]:
+                continue
+            lfns.append(info["logical_file_name"])
+            event_counts.append(info["event_count"])
+            file_sizes.append(info["file_size"])
+            adler32.append(parse_adler32(info["adler32"]))
+        return cls(lfns, event_counts, file_sizes, adler32)
+
+    @classmethod
+    def from_columns(
+        cls,
+        lfns: list[str],
+        event_counts: Iterable[int or None],
+        file_sizes: Iterable[int or None],
+        adler32: Iterable[str or None],
+    ) -> "DBSFileTable":
+        """Create the table from the columns of the file list in the format
+        of the DBS detail listing (None if unknown, adler32 as hexadecimal
+        string), see meth::`to_columns`.
+        """
+        return cls(lfns, event_counts, file_sizes, map(parse_adler32, adler32))
+
+    @classmethod
+    def concatenate(cls, tables: Iterable["DBSFileTable"]) -> "DBSFileTable":
+        """Combine the *tables* (e.g. of all blocks of a dataset) into one
+        table.
+        """
+        tables = list(tables)
+        table = cls()
+        if len(tables) == 0:
+            return table
+        for x in tables:
+            table.lfns += x.lfns
+        table.event_counts = np.concatenate([x.event_counts for x in tables])
+        table.file_sizes = np.concatenate([x.file_sizes for x in tables])
+        table.adler32 = np.concatenate([x.adler32 for x in tables])
+        return table
+
+    def __len__(self) -> int:
+        return len(self.lfns)
+
+    def lfn_set(self) -> set[str]:
+        return set(self.lfns)
+
+    def event_lookup(self) -> dict[str, int]:
+        """Return the mapping {lfn: number_of_events}."""
+        return dict(zip(self.lfns, self.event_counts.tolist()))
+
+    def total_events(self) -> int:
+        return int(self.event_counts[self.event_counts >= 0].sum())
+
+    def to_columns(self) -> tuple[list[str], list[int or None], list[int or None], list[str or None]]:
+        """Return the LFNs, the number of events, the file sizes and the
+        adler32 checksums as lists in the format of the DBS detail listing,
+        i.e. None if unknown and the checksums as hexadecimal strings.
+        """
+        def known(values):
+            return [None if x < 0 else x for x in values.tolist()]
+
+        return (
+            self.lfns,
+            known(self.event_counts),
+            known(self.file_sizes),
+            [None if x < 0 else f"{x:08x}" for x in self.adler32.tolist()],
+        )
+
+    def to_file_infos(self, lfns: Iterable[str] or None=None) -> list[dict[str, Any]]:
+        """Convert the table to the format of the DBS detail listing. If
+        *lfns* is given, only these files are converted.
+        """
+        if lfns is not None:
+            lfns = set(lfns)
+            indices = [i for i, lfn in enumerate(self.lfns) if lfn in lfns]
+            return DBSFileTable(
+                [self.lfns[i] for i in indices],
+                self.event_counts[indices],
+                self.file_sizes[indices],
+                self.adler32[indices],
+            ).to_file_infos()
+        return [
+            {
+                "logical_file_name": lfn,
+                "is_file_valid": True,
+                "event_count": event_count,
+                "file_size": file_size,
+                "adler32": adler32,
+            } for lfn, event_count, file_size, adler32 in zip(*self.to_columns())
+        ]
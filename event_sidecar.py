@@ -0,0 +1,94 @@
+import os
+import json
+
+from glob import glob
+from typing import Any
+
+# suffix of the sidecar files, i.e. the record for 'nano_1.root' is saved
+# as 'nano_1.root.counts.json'
+SIDECAR_SUFFIX = ".counts.json"
+SIDECAR_VERSION = 1
+DEFAULT_TREES = ["Events", "EventsNotSelected", "LuminosityBlocks", "Runs"]
+
+
+def sidecar_path(output_path: str) -> str:
+    return f"{output_path}{SIDECAR_SUFFIX}"
+
+
+def is_sidecar(path: str) -> bool:
+    return path.endswith(SIDECAR_SUFFIX)
+
+
+def build_sidecar(
+    root_file: str,
+    source_lfns: list[str] or None=None,
+    trees: list[str]=DEFAULT_TREES,
+) -> dict[str, Any]:
+    """Build the sidecar record for the local file *root_file*, i.e. the
+    number of entries in all *trees* that exist in the file, the file size
+    and the LFNs that were processed to create the file.
+    """
+    # uproot is only needed when the record is created, so import it here
+    import uproot as up
+
+    counts = dict()
+    with up.open(root_file) as f:
+        for tree in trees:
+            if tree in f:
+                counts[tree] = int(f[tree].num_entries)
+    return {
+        "version": SIDECAR_VERSION,
+        "file": os.path.basename(root_file),
+        "size": os.path.getsize(root_file),
+        "counts": counts,
+        "source_lfns": list(source_lfns) if source_lfns else list(),
+    }
+
+
+def write_sidecar(
+    root_file: str,
+    source_lfns: list[str] or None=None,
+    trees: list[str]=DEFAULT_TREES,
+) -> str:
+    """Write the sidecar record for *root_file* next to it, see
+    meth::`build_sidecar`. Returns the path to the sidecar file.
+    """
+    path = sidecar_path(root_file)
+    record = build_sidecar(root_file, source_lfns=source_lfns, trees=trees)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_sidecars(
+    directory: str,
+    pattern: str="nano*.root",
+    source_lfns: list[str] or None=None,
+) -> list[str]:
+    """Write sidecar records for all files in *directory* that match
+    *pattern*. Files that cannot be read are skipped with a warning.
+    """
+    paths = list()
+    for root_file in sorted(glob(os.path.join(directory, pattern))):
+        try:
+            paths.append(write_sidecar(root_file, source_lfns=source_lfns))
+        except Exception as e:
+            print(f"WARNING: could not write sidecar for '{root_file}': {e}")
+    return paths
+
+
+def parse_sidecar(content: str or bytes) -> dict[str, Any] or None:
+    """Parse the content of a sidecar file. Returns None if the content is
+    not a valid record of the current version.
+    """
+    try:
+        record = json.loads(content)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(record, dict) or record.get("version") != SIDECAR_VERSION:
+        return None
+    if not isinstance(record.get("counts"), dict):
+        return None
+    return record
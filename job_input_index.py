@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import tarfile
+import multiprocessing
+import numpy as np
+
+from glob import glob
+from typing import Any
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+# names of the files with the inputs of the individual jobs, which are
+# created by 'crab preparelocal'
+JOB_INPUT_PATTERN = re.compile(r"job_input_file_list_(\d+)\.txt$|job_input_(\d+)\.txt$")
+
+
+def parse_job_id(name: str) -> int or None:
+    match = JOB_INPUT_PATTERN.search(os.path.basename(name))
+    if not match:
+        return None
+    return int(match.group(1) or match.group(2))
+
+
+def parse_job_inputs(contents: list[bytes]) -> list[list[str]]:
+    """Parse the contents of several job input files. This is a module-level
+    function such that it can be used in a process pool.
+    """
+    return [json.loads(x) for x in contents]
+
+
+class JobInputIndex(Mapping):
+    """Consolidated index of the inputs of all jobs of a crab base directory.
+    The index is built once from the job input files in
+    'CRAB_DIR/local/input_files.tar.gz' (or already extracted files
+    'CRAB_DIR/local/job_input*.txt'), which are read directly from the
+    archive. It is saved in 'CRAB_DIR/local/job_input_index' as
+    - lfns.txt:     all unique LFNs, the line number is the id of the LFN
+    - job_ids.npy:  the ids of the jobs
+    - offsets.npy:  the inputs of job i are the LFN ids
+                    lfn_ids[offsets[i]:offsets[i+1]]
+    - lfn_ids.npy:  the LFN ids of the inputs of all jobs
+    - meta.json:    version and fingerprint of the source of the index
+
+    The arrays are memory-mapped when the index is loaded. The index is
+    rebuilt if the source changed, i.e. if its modification time or size
+    differs from the fingerprint.
+
+    A loaded index is a read-only mapping {job_id: list_of_lfns} in the same
+    format as the 'job_input_files.json' files, i.e. with the job ids as
+    strings. The LFNs of a job are only looked up when they are accessed.
+    """
+    version = 1
+
+    def __init__(self, crab_dir: str, index_dirname: str="job_input_index"):
+        self.local_dir = os.path.join(crab_dir, "local")
+        self.index_dir = os.path.join(self.local_dir, index_dirname)
+        self.meta_path = os.path.join(self.index_dir, "meta.json")
+        self.lfns = list()
+        self.job_ids = None
+        self.offsets = None
+        self.lfn_ids = None
+
+    @property
+    def archive_path(self) -> str:
+        return os.path.join(self.local_dir, "input_files.tar.gz")
+
+    def source_files(self) -> list[str]:
+        """Return the sources of the index, i.e. the archive if it exists,
+        else all job input files that were already extracted.
+        """
+        if os.path.exists(self.archive_path):
+            return [self.archive_path]
+        return sorted(
+            x for x in glob(os.path.join(self.local_dir, "job_input*.txt"))
+            if parse_job_id(x) is not None
+        )
+
+    def fingerprint(self) -> dict[str, list[float]]:
+        fingerprint = dict()
+        for path in self.source_files():
+            stat = os.stat(path)
+            fingerprint[os.path.basename(path)] = [stat.st_mtime, stat.st_size]
+        return fingerprint
+
+    def has_source(self) -> bool:
+        return len(self.source_files()) > 0
+
+    def is_valid(self) -> bool:
+        if not os.path.exists(self.meta_path):
+            return False
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return (meta.get("version") == self.version
+                and meta.get("fingerprint") == self.fingerprint())
+
+    def read_sources(self) -> dict[int, bytes]:
+        """Read the raw content of all job input files."""
+        contents = dict()
+        sources = self.source_files()
+        if sources == [self.archive_path]:
+            with tarfile.open(self.archive_path, "r:gz") as archive:
+                for member in archive:
+                    job_id = parse_job_id(member.name) if member.isfile() else None
+                    if job_id is not None:
+                        contents[job_id] = archive.extractfile(member).read()
+        else:
+            for path in sources:
+                with open(path, "rb") as f:
+                    contents[parse_job_id(path)] = f.read()
+        return contents
+
+    def build(self, max_workers: int=4, chunk_size: int=500) -> None:
+        """Build the index from the source files. The files are parsed in
+        *max_workers* processes in chunks of *chunk_size* files.
+        """
+        contents = self.read_sources()
+        job_ids = sorted(contents)
+        chunks = [
+            [contents[x] for x in job_ids[i:i+chunk_size]]
+            for i in range(0, len(job_ids), chunk_size)
+        ]
+        if max_workers > 1 and len(chunks) > 1:
+            # don't fork the threads of the caller (e.g. the listing engine)
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                parsed = list(executor.map(parse_job_inputs, chunks))
+        else:
+            parsed = list(map(parse_job_inputs, chunks))
+
+        lfn_table = dict()
+        offsets = [0]
+        lfn_ids = list()
+        for chunk in parsed:
+            for inputs in chunk:
+                lfn_ids += [lfn_table.setdefault(x, len(lfn_table)) for x in inputs]
+                offsets.append(len(lfn_ids))
+
+        if not os.path.exists(self.index_dir):
+            os.makedirs(self.index_dir)
+        # the meta file is written last, such that an incomplete index is
+        # never considered as valid
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        with open(os.path.join(self.index_dir, "lfns.txt"), "w") as f:
+            f.write("".join(f"{x}\n" for x in lfn_table))
+        np.save(os.path.join(self.index_dir, "job_ids.npy"), np.array(job_ids, dtype=np.int64))
+        np.save(os.path.join(self.index_dir, "offsets.npy"), np.array(offsets, dtype=np.int64))
+        np.save(os.path.join(self.index_dir, "lfn_ids.npy"), np.array(lfn_ids, dtype=np.int32))
+        with open(self.meta_path, "w") as f:
+            json.dump({
+                "version": self.version,
+                "fingerprint": self.fingerprint(),
+                "n_jobs": len(job_ids),
+                "n_lfns": len(lfn_table),
+            }, f)
+
+    def load(self) -> None:
+        with open(os.path.join(self.index_dir, "lfns.txt")) as f:
+            self.lfns = f.read().splitlines()
+        self.job_ids = np.load(os.path.join(self.index_dir, "job_ids.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(self.index_dir, "offsets.npy"), mmap_mode="r")
+        self.lfn_ids = np.load(os.path.join(self.index_dir, "lfn_ids.npy"), mmap_mode="r")
+
+    def ensure(self, max_workers: int=4) -> bool:
+        """Load the index and (re)build it first if necessary. Returns False
+        if there are no source files to build the index from.
+        """
+        if not self.is_valid():
+            if not self.has_source():
+                return False
+            self.build(max_workers=max_workers)
+        self.load()
+        return True
+
+    def __len__(self) -> int:
+        return len(self.job_ids) if self.job_ids is not None else 0
+
+    def __iter__(self):
+        if self.job_ids is None:
+            return iter([])
+        return (str(x) for x in self.job_ids.tolist())
+
+    def __getitem__(self, job_id: str) -> list[str]:
+        # the job ids are sorted, see meth::`build`
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            raise KeyError(job_id)
+        index = int(np.searchsorted(self.job_ids, job_id)) if len(self) else 0
+        if index >= len(self) or self.job_ids[index] != job_id:
+            raise KeyError(str(job_id))
+        return self.inputs(index)
+
+    def inputs(self, index: int) -> list[str]:
+        """Return the LFNs of the *index*-th job in the index."""
+        lfns = self.lfns
+        start, stop = self.offsets[index], self.offsets[index+1]
+        return [lfns[x] for x in self.lfn_ids[start:stop]]
@@ -0,0 +1,153 @@
+import os
+import zlib
+import hashlib
+
+from threading import Lock
+from typing import Callable
+
+
+def adler32_of_file(path: str, chunk_size: int=16*1024**2) -> str:
+    """Compute the adler32 checksum of the file at *path* in the format used
+    by DBS, i.e. as hexadecimal string with 8 digits.
+    """
+    checksum = 1
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            checksum = zlib.adler32(data, checksum)
+    return f"{checksum & 0xffffffff:08x}"
+
+
+def checksums_match(checksum: str, reference: str) -> bool:
+    # DBS does not always keep leading zeros, so compare the numbers
+    try:
+        return int(checksum, 16) == int(reference, 16)
+    except (TypeError, ValueError):
+        return False
+
+
+class LFNCache(object):
+    """Node-local cache for input files (e.g. miniAOD) keyed by their LFN.
+    The files are stored content-addressed as 'CACHE_DIR/XX/SHA1_OF_LFN.root'.
+    Downloads are written to a '.part' file first, which is only moved to its
+    final location once the download is complete and the adler32 checksum
+    matches the reference (if given). Thus, an aborted download never ends
+    up as cached file, and the '.part' file can be used to resume the
+    download if the protocol allows it.
+
+    The total size of the cache is limited by *quota* (in bytes). If a new
+    file does not fit, the least recently used files are evicted.
+    """
+    def __init__(
+        self,
+        cache_dir: str,
+        quota: float=100*1024**3,
+        verbosity: int=0,
+    ):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.quota = quota
+        self.verbosity = verbosity
+        self.__lock = Lock()
+        self.__lfn_locks = dict()
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def path_for(self, lfn: str) -> str:
+        key = hashlib.sha1(lfn.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.root")
+
+    def lock_for(self, lfn: str) -> Lock:
+        # make sure that the same LFN is not downloaded twice at the same time
+        with self.__lock:
+            return self.__lfn_locks.setdefault(lfn, Lock())
+
+    def cached_files(self) -> list[os.DirEntry]:
+        entries = list()
+        for subdir in os.scandir(self.cache_dir):
+            if not subdir.is_dir():
+                continue
+            entries += [x for x in os.scandir(subdir.path) if x.name.endswith(".root")]
+        return entries
+
+    def evict(self, required_space: float=0) -> None:
+        """Remove the least recently used files until *required_space* bytes
+        fit into the quota.
+        """
+        with self.__lock:
+            entries = sorted(self.cached_files(), key=lambda x: x.stat().st_mtime)
+            total = sum(x.stat().st_size for x in entries)
+            for entry in entries:
+                if total + required_space <= self.quota:
+                    break
+                if self.verbosity >= 1:
+                    print(f"evicting {entry.path} from LFN cache")
+                total -= entry.stat().st_size
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def fetch(
+        self,
+        lfn: str,
+        download: Callable[[str, str], None],
+        checksum: str or None=None,
+        size: float or None=None,
+        max_attempts: int=2,
+    ) -> str:
+        """Return the path to the cached copy of *lfn*. If the file is not
+        cached yet, it is downloaded with *download(lfn, partial_path)*, which
+        may resume an existing partial file. If *checksum* is given, the
+        adler32 checksum of the download is verified and the download is
+        repeated from scratch if it does not match.
+
+        Args:
+            lfn (str): LFN of the file
+            download (Callable[[str, str], None]):  function to download *lfn*
+                                                    to the given path, raises
+                                                    an exception if it fails
+            checksum (str, optional):   reference adler32 checksum.
+                                        Defaults to None.
+            size (float, optional): expected size in bytes, used to free space
+                                    in the cache beforehand. Defaults to None.
+            max_attempts (int, optional): number of downloads. Defaults to 2.
+
+        Raises:
+            IOError: if the file could not be downloaded and verified
+
+        Returns:
+            str: path to the cached file
+        """
+        path = self.path_for(lfn)
+        with self.lock_for(lfn):
+            if os.path.exists(path):
+                # mark the file as recently used
+                os.utime(path)
+                return path
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            if size:
+                self.evict(required_space=size)
+            partial_path = f"{path}.part"
+            for _ in range(max_attempts):
+                download(lfn, partial_path)
+                if not checksum or checksums_match(adler32_of_file(partial_path), checksum):
+                    os.replace(partial_path, path)
+                    return path
+                print(f"WARNING: checksum mismatch for '{lfn}', downloading it again")
+                os.remove(partial_path)
+        raise IOError(f"Could not download '{lfn}' with valid checksum")
+
+    def link(self, cached_path: str, target: str) -> None:
+        """Make the cached file available at *target* without copying it.
+        A hard link keeps the file on disk even if it is evicted from the
+        cache, so *target* should be removed once it is not needed anymore.
+        """
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.link(cached_path, target)
+        except OSError:
+            os.symlink(cached_path, target)
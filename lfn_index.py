@@ -0,0 +1,156 @@
+import numpy as np
+
+from collections.abc import Iterable
+
+
+class LFNInterner(object):
+    """Table that maps every LFN (or any other path) to a dense integer id.
+    Every string is only stored once, all sets of LFNs only keep the ids,
+    see class::`LFNSet`.
+    """
+    dtype = np.int32
+
+    def __init__(self):
+        self.ids = dict()
+        self.lfns = list()
+
+    def __len__(self) -> int:
+        return len(self.lfns)
+
+    def intern(self, lfn: str) -> int:
+        id = self.ids.get(lfn)
+        if id is None:
+            id = len(self.lfns)
+            self.ids[lfn] = id
+            self.lfns.append(lfn)
+        return id
+
+    def intern_many(self, lfns: Iterable[str]) -> np.ndarray:
+        """Return the sorted, unique ids of *lfns*. Unknown LFNs are added
+        to the table.
+        """
+        return np.unique(np.fromiter(
+            (self.intern(x) for x in lfns), dtype=self.dtype
+        ))
+
+    def find_many(self, lfns: Iterable[str]) -> np.ndarray:
+        """Return the sorted, unique ids of all *lfns* that are already in
+        the table. Unknown LFNs are skipped.
+        """
+        get = self.ids.get
+        return np.unique(np.fromiter(
+            (id for id in map(get, lfns) if id is not None), dtype=self.dtype
+        ))
+
+    def lookup(self, ids: Iterable[int]) -> list[str]:
+        lfns = self.lfns
+        return [lfns[id] for id in ids]
+
+
+class LFNSet(object):
+    """Set of LFNs that is stored as sorted array of ids of an
+    class::`LFNInterner`. All set operations are performed on the integer
+    arrays, which is much faster and needs much less memory than sets of
+    strings for samples with many files.
+    The class implements the parts of the interface of the built-in set that
+    are used for the book-keeping, i.e. operations with other LFNSets of the
+    same interner or with any iterable of strings, membership tests and
+    iteration over the LFNs.
+    """
+    def __init__(
+        self,
+        interner: LFNInterner,
+        lfns: Iterable[str] or None=None,
+        ids: np.ndarray or None=None,
+    ):
+        self.interner = interner
+        if ids is not None:
+            self.ids = ids
+        elif lfns is not None:
+            self.ids = interner.intern_many(lfns)
+        else:
+            self.ids = np.empty(0, dtype=interner.dtype)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        lfns = self.interner.lfns
+        return (lfns[id] for id in self.ids)
+
+    def __contains__(self, lfn: str) -> bool:
+        id = self.interner.ids.get(lfn)
+        if id is None:
+            return False
+        index = np.searchsorted(self.ids, id)
+        return index < len(self.ids) and self.ids[index] == id
+
+    def __repr__(self) -> str:
+        return f"LFNSet({len(self)} LFNs)"
+
+    def other_ids(self, other: Iterable[str], add: bool=False) -> np.ndarray:
+        """Convert *other* to sorted ids. If *add* is False, LFNs that are
+        not in the table are skipped, which is fine for all operations that
+        can only remove elements from this set.
+        """
+        if isinstance(other, LFNSet) and other.interner is self.interner:
+            return other.ids
+        if add:
+            return self.interner.intern_many(other)
+        return self.interner.find_many(other)
+
+    def copy(self) -> "LFNSet":
+        return LFNSet(self.interner, ids=self.ids.copy())
+
+    def to_list(self) -> list[str]:
+        return self.interner.lookup(self.ids)
+
+    def union(self, other: Iterable[str]) -> "LFNSet":
+        return LFNSet(self.interner, ids=np.union1d(self.ids, self.other_ids(other, add=True)))
+
+    def intersection(self, other: Iterable[str]) -> "LFNSet":
+        return LFNSet(self.interner, ids=np.intersect1d(
+            self.ids, self.other_ids(other), assume_unique=True
+        ))
+
+    def difference(self, other: Iterable[str]) -> "LFNSet":
+        return LFNSet(self.interner, ids=np.setdiff1d(
+            self.ids, self.other_ids(other), assume_unique=True
+        ))
+
+    def symmetric_difference(self, other: Iterable[str]) -> "LFNSet":
+        return LFNSet(self.interner, ids=np.setxor1d(
+            self.ids, self.other_ids(other, add=True), assume_unique=True
+        ))
+
+    def isdisjoint(self, other: Iterable[str]) -> bool:
+        return len(self.intersection(other)) == 0
+
+    def update(self, *others: Iterable[str]) -> None:
+        for other in others:
+            self.ids = np.union1d(self.ids, self.other_ids(other, add=True))
+
+    def difference_update(self, *others: Iterable[str]) -> None:
+        for other in others:
+            self.ids = np.setdiff1d(self.ids, self.other_ids(other), assume_unique=True)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __xor__ = symmetric_difference
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LFNSet) and other.interner is self.interner:
+            return np.array_equal(self.ids, other.ids)
+        if isinstance(other, (set, frozenset)):
+            return len(other) == len(self) and all(x in self for x in other)
+        return NotImplemented
+
+
+def lfn_set_like(reference: Iterable[str], lfns: Iterable[str]) -> LFNSet or set[str]:
+    """Create a set of *lfns* of the same kind as *reference*, i.e. an
+    class::`LFNSet` with the same interner or a built-in set.
+    """
+    if isinstance(reference, LFNSet):
+        return LFNSet(reference.interner, lfns=lfns)
+    return set(lfns)
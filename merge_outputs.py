@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+
+from subprocess import PIPE, Popen
+from typing import Any
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from event_sidecar import DEFAULT_TREES, SIDECAR_SUFFIX, parse_sidecar
+from storage_backends import StorageRouter
+
+MB = 1024**2
+MANIFEST_NAME = "merge_manifest.json"
+# crab stores the outputs as <timestamp>/<NNNN>/nano_<job_id>.root
+BLOCK_PATTERN = re.compile(r"^\d{4}$")
+
+
+def load_finished_jobs(status_path: str) -> tuple[str, set[str]]:
+    """Load the time stamp of the crab task and the ids of all finished jobs
+    from the crab status file *status_path* (see check_crab_jobs.py).
+
+    Raises:
+        ValueError: if the status file does not contain the task name
+
+    Returns:
+        tuple[str, set[str]]: the time stamp and the job ids
+    """
+    with open(status_path) as f:
+        status = json.load(f)
+    task_name = status.get("task_name")
+    if not task_name:
+        raise ValueError(f"Could not retrieve time stamp from '{status_path}'")
+    job_ids = {
+        str(int(job_id)) for job_id, info in status.get("details", dict()).items()
+        if info.get("State") == "finished"
+    }
+    return task_name.split(":")[0], job_ids
+
+
+def find_job_outputs(
+    storage: StorageRouter,
+    directory: str,
+    time_stamp: str,
+    job_ids: Iterable[str],
+    name_template: str="nano_{id}.root",
+) -> dict[str, dict[str, Any]]:
+    """Find the outputs of the jobs *job_ids* of the crab task with
+    *time_stamp* in the crab output *directory* of a sample, i.e. the files
+    that match *name_template* in the subdirectories <time_stamp>/<NNNN>/.
+    Outputs of all other jobs (e.g. leftovers of failed jobs) and of other
+    submissions, which have their own job numbering, are ignored.
+
+    Returns:
+        dict:   {job_id: {"path": ..., "size": ..., "sidecar": path or None}}
+    """
+    prefix, suffix = name_template.split("{id}")
+    pattern = re.compile("^" + re.escape(prefix) + r"(\d+)" + re.escape(suffix) + "$")
+    job_ids = {str(int(x)) for x in job_ids}
+    timestamp_dir = f"{directory.rstrip('/')}/{time_stamp}"
+    outputs = dict()
+    for block in sorted(x for x in storage.listdir(timestamp_dir) if BLOCK_PATTERN.match(x)):
+        block_dir = f"{timestamp_dir}/{block}"
+        entries = storage.scandir(block_dir)
+        for name, size in entries.items():
+            match = pattern.match(name)
+            if not match or not str(int(match.group(1))) in job_ids:
+                continue
+            sidecar = f"{name}{SIDECAR_SUFFIX}"
+            outputs[str(int(match.group(1)))] = {
+                "path": f"{block_dir}/{name}",
+                "size": size,
+                "sidecar": f"{block_dir}/{sidecar}" if sidecar in entries else None,
+            }
+    return outputs
+
+
+def plan_merge_groups(
+    outputs: dict[str, dict[str, Any]],
+    target_size: float=2048,
+) -> list[list[str]]:
+    """Group the job outputs (see meth::`find_job_outputs`) in the order of
+    their job ids, such that the files of every group add up to at most
+    *target_size* (in MB). Outputs that are larger than the target on their
+    own form a group of their own.
+
+    Returns:
+        list[list[str]]: job ids of every group
+    """
+    groups = list()
+    group, group_size = list(), 0
+    for job_id in sorted(outputs, key=int):
+        size = outputs[job_id]["size"]
+        if group and group_size + size > target_size*MB:
+            groups.append(group)
+            group, group_size = list(), 0
+        group.append(job_id)
+        group_size += size
+    if group:
+        groups.append(group)
+    return groups
+
+
+def count_entries(root_file: str, trees: Iterable[str]=DEFAULT_TREES) -> dict[str, int]:
+    """Return the number of entries of all *trees* that exist in *root_file*."""
+    # uproot is only needed when files are merged, so import it here
+    import uproot as up
+
+    counts = dict()
+    with up.open(root_file) as f:
+        for tree in trees:
+            if tree in f:
+                counts[tree] = int(f[tree].num_entries)
+    return counts
+
+
+def run_hadd(inputs: list[str], output: str) -> None:
+    """Merge the *inputs* into *output* with hadd of ROOT, which streams the
+    trees and keeps all objects of the inputs.
+
+    Raises:
+        RuntimeError: if hadd fails
+    """
+    process = Popen(["hadd", "-f", output] + inputs, stdout=PIPE, stderr=PIPE)
+    _, error = process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"hadd failed for '{output}': {error.decode(errors='replace')}")
+
+
+class OutputMerger(object):
+    """Merge the small outputs of the jobs of a sample into files of about
+    the targetOutputFileSize of the crabOverseer config. The groups (see
+    meth::`plan_merge_groups`) are merged in parallel in a pool of
+    *max_workers* threads, each running hadd in a local *work_dir*. Inputs
+    that are neither mounted nor accessible with XRootD are downloaded to
+    the *work_dir* first. After the merge, the number of entries of all *trees* is compared to the sum
+    of the inputs, which is taken from the sidecar records (see
+    event_sidecar.py) if possible. Only verified files are copied to the
+    output directory, together with a manifest that maps every merged file
+    to the job ids and paths of its inputs.
+
+    Args:
+        storage (StorageRouter, optional):  access to the input and output
+                                            directories. Defaults to the
+                                            storage of a WLCGInterface,
+                                            i.e. including gfal.
+        target_size (float, optional):      target size of the merged files
+                                            in MB. Defaults to 2048.
+        max_workers (int, optional):        number of parallel merges.
+                                            Defaults to 4.
+    """
+    def __init__(
+        self,
+        storage: StorageRouter or None=None,
+        target_size: float=2048,
+        max_workers: int=4,
+        trees: list[str]=DEFAULT_TREES,
+        work_dir: str or None=None,
+        verbosity: int=0,
+    ):
+        if storage is None:
+            # the same storage access as in check_crab_jobs.py
+            from wlcg_dbs_interface import WLCGInterface
+            storage = WLCGInterface(verbosity=verbosity).storage
+        self.storage = storage
+        self.target_size = target_size
+        self.max_workers = max_workers
+        self.trees = trees
+        self.work_dir = work_dir
+        self.verbosity = verbosity
+
+    def stage_input(self, path: str, work_dir: str) -> str:
+        """Return the path under which hadd and uproot can open *path*, i.e.
+        the local path for files on a mounted storage and the URL for XRootD.
+        All other files (e.g. srm or gsiftp) are downloaded to *work_dir*.
+        """
+        backend, backend_path = self.storage.resolve(path)
+        if backend is self.storage.posix:
+            return backend.local_path(backend_path)
+        if backend is self.storage.xrootd:
+            return backend_path
+        local_path = os.path.join(work_dir, os.path.basename(path))
+        self.storage.download(path, local_path)
+        return local_path
+
+    def expected_counts(
+        self,
+        outputs: list[dict[str, Any]],
+        paths: list[str],
+    ) -> dict[str, int]:
+        """Sum the entries of the *outputs*, which can be opened under the
+        (local) *paths*, see meth::`stage_input`.
+        """
+        counts = dict()
+        for output, path in zip(outputs, paths):
+            record = None
+            if output["sidecar"]:
+                try:
+                    record = parse_sidecar(self.storage.read(output["sidecar"]))
+                except Exception as e:
+                    if self.verbosity >= 1:
+                        print(f"WARNING: could not read sidecar '{output['sidecar']}': {e}")
+            if record:
+                input_counts = record["counts"]
+            else:
+                input_counts = count_entries(path, trees=self.trees)
+            for tree, n_entries in input_counts.items():
+                if tree in self.trees:
+                    counts[tree] = counts.get(tree, 0) + n_entries
+        return counts
+
+    def merge_group(
+        self,
+        outputs: dict[str, dict[str, Any]],
+        job_ids: list[str],
+        target: str,
+    ) -> dict[str, Any]:
+        """Merge the outputs of the jobs *job_ids* into *target*.
+
+        Raises:
+            RuntimeError: if the merged file does not contain all entries of
+                          the inputs
+        """
+        sources = [outputs[x] for x in job_ids]
+        work_dir = tempfile.mkdtemp(dir=self.work_dir)
+        try:
+            paths = [self.stage_input(x["path"], work_dir) for x in sources]
+            expected = self.expected_counts(sources, paths)
+            merged = os.path.join(work_dir, os.path.basename(target))
+            run_hadd(paths, merged)
+            counts = count_entries(merged, trees=self.trees)
+            if counts != expected:
+                raise RuntimeError(
+                    f"entries in '{target}' do not match the inputs: "
+                    f"{counts} (merged) vs. {expected} (inputs)"
+                )
+            size = os.path.getsize(merged)
+            self.storage.copy(merged, target)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if self.verbosity >= 1:
+            print(f"merged {len(job_ids)} outputs into '{target}' ({size/MB:.1f} MB)")
+        return {
+            "job_ids": [int(x) for x in job_ids],
+            "sources": [x["path"] for x in sources],
+            "size": size,
+            "counts": counts,
+        }
+
+    def merge(
+        self,
+        input_dir: str,
+        output_dir: str,
+        time_stamp: str,
+        job_ids: Iterable[str],
+        name_template: str="nano_{id}.root",
+        output_template: str="nano_merged_{id}.root",
+    ) -> dict[str, Any]:
+        """Merge the outputs of the finished jobs *job_ids* of the crab task
+        with *time_stamp* in the crab output directory *input_dir* of a
+        sample (see meth::`find_job_outputs`) into
+        *output_dir* and write the manifest (MANIFEST_NAME) there. Groups
+        that cannot be merged are recorded in the entry 'failed' of the
+        manifest, finished jobs without output in 'missing_job_ids'.
+
+        Returns:
+            dict: the manifest
+        """
+        job_ids = {str(int(x)) for x in job_ids}
+        outputs = find_job_outputs(
+            self.storage, input_dir, time_stamp=time_stamp, job_ids=job_ids,
+            name_template=name_template,
+        )
+        groups = plan_merge_groups(outputs, target_size=self.target_size)
+        output_dir = output_dir.rstrip("/")
+        self.storage.mkdir(output_dir)
+        targets = [
+            f"{output_dir}/{output_template.format(id=i+1)}" for i in range(len(groups))
+        ]
+        print(f"merging {len(outputs)} outputs of '{input_dir}' into {len(groups)} files")
+        results = dict()
+        failed = dict()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                (group, target, executor.submit(self.merge_group, outputs, group, target))
+                for group, target in zip(groups, targets)
+            ]
+            # a failed group must not prevent the manifest of the others
+            for group, target, future in futures:
+                name = os.path.basename(target)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"WARNING: could not merge into '{target}': {e}")
+                    failed[name] = {
+                        "job_ids": [int(x) for x in group],
+                        "sources": [outputs[x]["path"] for x in group],
+                        "error": str(e),
+                    }
+
+        manifest = {
+            "input_dir": input_dir,
+            "time_stamp": time_stamp,
+            "target_size": self.target_size,
+            "files": results,
+            "failed": failed,
+            "missing_job_ids": sorted(int(x) for x in job_ids.difference(outputs)),
+        }
+        with tempfile.NamedTemporaryFile("w", suffix=".json", dir=self.work_dir, delete=False) as f:
+            json.dump(manifest, f, indent=4)
+        try:
+            self.storage.copy(f.name, f"{output_dir}/{MANIFEST_NAME}")
+        finally:
+            os.remove(f.name)
+        return manifest
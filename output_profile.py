@@ -0,0 +1,196 @@
+import json
+import numpy as np
+
+from typing import Any
+
+# edges of the bins of the size histograms in MB, the last bin is open
+SIZE_BIN_EDGES_MB = [0, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+MB = 1024**2
+
+
+def size_bin_labels() -> list[str]:
+    labels = [
+        f"{low}-{high}" for low, high in zip(SIZE_BIN_EDGES_MB[:-1], SIZE_BIN_EDGES_MB[1:])
+    ]
+    return labels + [f">{SIZE_BIN_EDGES_MB[-1]}"]
+
+
+class OutputProfile(object):
+    """Profile of the sizes of the job outputs of a sample. For every output,
+    the size, the number of input files of the job and (if known) the number
+    of events are recorded with meth::`add`. Since the skim efficiency
+    varies a lot between samples, the size per input file is used to
+    recommend the number of input files per job (unitsPerJob for the
+    'FileBased' splitting), such that the outputs reach the
+    targetOutputFileSize of the crabOverseer config.
+    """
+    def __init__(self, sample_name: str):
+        self.sample_name = sample_name
+        self.sizes = list()
+        self.n_inputs = list()
+        self.n_events = list()
+
+    def add(self, size: int, n_inputs: int=1, n_events: int or None=None) -> None:
+        self.sizes.append(size)
+        self.n_inputs.append(max(1, n_inputs))
+        self.n_events.append(-1 if n_events is None else n_events)
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def histogram(self) -> list[int]:
+        """Number of outputs per size bin, see SIZE_BIN_EDGES_MB."""
+        counts, _ = np.histogram(
+            np.asarray(self.sizes, dtype=np.float64)/MB,
+            bins=SIZE_BIN_EDGES_MB + [np.inf],
+        )
+        return counts.tolist()
+
+    def median_size(self) -> int or None:
+        if len(self) == 0:
+            return None
+        return int(np.median(self.sizes))
+
+    def median_events(self) -> int or None:
+        events = np.asarray(self.n_events, dtype=np.int64)
+        events = events[events >= 0]
+        if len(events) == 0:
+            return None
+        return int(np.median(events))
+
+    def median_size_per_input(self) -> float or None:
+        if len(self) == 0:
+            return None
+        return float(np.median(
+            np.asarray(self.sizes, dtype=np.float64)/np.asarray(self.n_inputs)
+        ))
+
+    def recommend_units_per_job(
+        self,
+        target_size: float=2048,
+        max_units: int=50,
+    ) -> int or None:
+        """Recommend the number of input files per job, such that the median
+        output reaches *target_size* (in MB) without exceeding it. The
+        recommendation is limited to *max_units*. Returns None if there are
+        no outputs.
+        """
+        size_per_input = self.median_size_per_input()
+        if size_per_input is None:
+            return None
+        if size_per_input <= 0:
+            return max_units
+        units = int(target_size*MB // size_per_input)
+        return min(max(1, units), max_units)
+
+    def summary(self, target_size: float=2048, max_units: int=50) -> dict[str, Any]:
+        """Return the entries for the summary of the sample, see
+        meth::`check_crab_jobs.build_meta_info_table`.
+        """
+        if len(self) == 0:
+            return dict()
+        summary = {
+            "n_outputs": len(self),
+            "median_output_size": self.median_size(),
+            "recommended_units_per_job": self.recommend_units_per_job(
+                target_size=target_size, max_units=max_units,
+            ),
+            "output_size_histogram": self.histogram(),
+        }
+        median_events = self.median_events()
+        if median_events is not None:
+            summary["median_output_events"] = median_events
+        return summary
+
+
+def is_undersized(
+    sample_info: dict[str, Any],
+    target_size: float=2048,
+    threshold: float=0.25,
+) -> bool:
+    """Check whether the median output of a sample is smaller than
+    *threshold* times the *target_size* (in MB).
+    """
+    median_size = sample_info.get("median_output_size")
+    if median_size is None:
+        return False
+    return median_size < threshold*target_size*MB
+
+
+def print_size_profile_table(
+    meta_infos: dict[str, dict[str, Any]],
+    target_size: float=2048,
+    threshold: float=0.25,
+) -> None:
+    """Print the size profiles of all samples in *meta_infos* (see
+    meth::`OutputProfile.summary`) as markdown tables.
+    """
+    samples = [x for x in meta_infos if "median_output_size" in meta_infos[x]]
+    if len(samples) == 0:
+        return
+
+    headerparts = ["{: ^16}".format(x)
+        for x in ["Sample", "#Outputs", "Median size [MB]", "Median #events",
+                    "unitsPerJob", "Undersized"]
+    ]
+    lines = ["| {} |".format(" | ".join(headerparts))]
+    lines += ["| {} |".format(" | ".join(["---"]*len(headerparts)))]
+    for s in samples:
+        info = meta_infos[s]
+        lines.append("| {} |".format(" | ".join(
+            ["{: ^16}".format(x) for x in [
+                s,
+                info.get("n_outputs", sum(info["output_size_histogram"])),
+                f"{info['median_output_size']/MB:.1f}",
+                info.get("median_output_events", "-"),
+                info.get("recommended_units_per_job", "-"),
+                "YES" if is_undersized(info, target_size, threshold) else "",
+            ]]
+        )))
+    print(f"Output sizes (target: {target_size} MB)")
+    print("\n".join(lines))
+
+    # size histograms in MB
+    headerparts = ["{: ^16}".format("Sample")] + ["{: ^9}".format(x) for x in size_bin_labels()]
+    lines = ["| {} |".format(" | ".join(headerparts))]
+    lines += ["| {} |".format(" | ".join(["---"]*len(headerparts)))]
+    for s in samples:
+        lines.append("| {} |".format(" | ".join(
+            ["{: ^16}".format(s)]
+            + ["{: ^9}".format(x) for x in meta_infos[s]["output_size_histogram"]]
+        )))
+    print("\nNumber of outputs per size [MB]")
+    print("\n".join(lines))
+
+
+def build_splitting_recommendations(
+    meta_infos: dict[str, dict[str, Any]],
+    target_size: float=2048,
+    threshold: float=0.25,
+) -> dict[str, dict[str, Any]]:
+    """Collect the recommended splitting of all samples with a size profile
+    in the format {sample_name: {"unitsPerJob": N, ...}}, which can be
+    applied to the sample configs with update_sample_config.py.
+    """
+    return {
+        sample: {
+            "unitsPerJob": info["recommended_units_per_job"],
+            "median_output_size_mb": round(info["median_output_size"]/MB, 1),
+            "undersized": is_undersized(info, target_size, threshold),
+        }
+        for sample, info in meta_infos.items()
+        if info.get("recommended_units_per_job") is not None
+    }
+
+
+def write_splitting_recommendations(
+    meta_infos: dict[str, dict[str, Any]],
+    path: str="splitting_recommendations.json",
+    target_size: float=2048,
+    threshold: float=0.25,
+) -> None:
+    recommendations = build_splitting_recommendations(
+        meta_infos, target_size=target_size, threshold=threshold,
+    )
+    with open(path, "w") as f:
+        json.dump({"targetOutputFileSize": target_size, "samples": recommendations}, f, indent=4)
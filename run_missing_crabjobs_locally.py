@@ -6,7 +6,10 @@ from tqdm import tqdm
 from datetime import datetime
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from subprocess import call
-import yaml
+from typing import Any
+from queue import Queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 thisdir = os.path.realpath(os.path.dirname(__file__))
 
@@ -14,18 +17,67 @@ if not thisdir in sys.path:
     sys.path.append(thisdir)
 
 from wlcg_dbs_interface import WLCGInterface
+from sample_catalog import SampleCatalog
+from lfn_cache import LFNCache
+from event_sidecar import write_sidecar, sidecar_path
+from summary_io import load_summary
+from tracing import tracer
 # from RunKit.nanoProdWrapper import create_PSet
 from RunKit.sh_tools import sh_call
 
 interface = WLCGInterface()
+# node-local cache for the inputs, see meth::`setup_input_cache`
+input_cache = None
+# DBS information (e.g. checksums) of the inputs, loaded per dataset
+input_file_infos = dict()
 
 verbosity = 0
 
+def setup_input_cache(
+    cache_dir: str or None,
+    cache_quota: float=100,
+) -> None:
+    """Set up the node-local cache for the input files in *cache_dir* with
+    a quota of *cache_quota* GB. If *cache_dir* is None, the inputs are
+    downloaded directly into the job directories.
+    """
+    global input_cache
+    if not cache_dir:
+        input_cache = None
+        return
+    input_cache = LFNCache(
+        cache_dir=cache_dir,
+        quota=cache_quota*1024**3,
+        verbosity=verbosity,
+    )
+
+def fetch_cached_input(lfn: str, local_lfn_path: str) -> bool:
+    """Make *lfn* available at *local_lfn_path* through the input cache.
+    The download is verified with the adler32 checksum known to DBS.
+
+    Returns:
+        bool: True if the input is available locally, else False
+    """
+    file_info = input_file_infos.get(lfn) or interface.get_file_info(lfn) or dict()
+    try:
+        cached_path = input_cache.fetch(
+            lfn=lfn,
+            download=interface.download_lfn,
+            checksum=file_info.get("adler32"),
+            size=file_info.get("file_size"),
+        )
+    except IOError as e:
+        print(e)
+        return False
+    input_cache.link(cached_path, local_lfn_path)
+    return True
+
 def run_custom_nano_command(
     input_file: str,
     nevents: int=-1,
     era: str="Run2_2017",
     sampleType: str = "mc",
+    cwd: str or None=None,
     **kwargs,
 ):
     # first build the cms PSet
@@ -39,64 +91,324 @@ def run_custom_nano_command(
 
     # from IPython import embed; embed()
 
-    sh_call([" ".join(cmd)], shell=True, catch_stdout=False, split='\n', env=interface.getCmsswEnv())
+    with tracer.span("create PSet", category="job", input_file=input_file):
+        sh_call([" ".join(cmd)], shell=True, catch_stdout=False, split='\n', env=interface.getCmsswEnv(), cwd=cwd)
     print("done writing PSet.py")
     cmd=f'{thisdir}/RunKit/crabJob.sh'
 
     print("executing job")
-    sh_call([cmd], shell=True, catch_stdout=False, split='\n', env=interface.getCmsswEnv())
+    with tracer.span("cmsRun", category="job", input_file=input_file):
+        sh_call([cmd], shell=True, catch_stdout=False, split='\n', env=interface.getCmsswEnv(), cwd=cwd)
 
-def run_job(
+@tracer.traced("stage input", category="transfer")
+def stage_input(
     lfn: str,
     tmp_dir: str,
-    wlcg_path:str,
-    output_name:str,
     fail_on_exception: bool=False,
     **kwargs,
-):
-    # cd into tmp dir. If it doesn't exist, create it
+) -> bool:
+    """Copy the input *lfn* into the working directory *tmp_dir*.
+    If the directory doesn't exist, it is created. If the input cache is
+    set up (see meth::`setup_input_cache`), the input is taken from the
+    cache instead.
+
+    Returns:
+        bool: True if the input is available locally, else False
+    """
+    tmp_dir = os.path.abspath(tmp_dir)
     if not os.path.exists(tmp_dir):
         os.makedirs(tmp_dir)
-    cwd = os.getcwd()
-    os.chdir(tmp_dir)
 
-    local_lfn_name = os.path.basename(lfn)
+    local_lfn_path = os.path.join(tmp_dir, os.path.basename(lfn))
     # copy lfn locally
-    if not os.path.exists(local_lfn_name):
-        interface.get_remote_file(
-            filepath=lfn,
-            target=local_lfn_name
-        )
-        if not os.path.exists(local_lfn_name):
+    if not os.path.exists(local_lfn_path):
+        if input_cache:
+            fetch_cached_input(lfn, local_lfn_path)
+        else:
+            interface.get_remote_file(
+                filepath=lfn,
+                target=local_lfn_path
+            )
+        if not os.path.exists(local_lfn_path):
             msg = f"Unable to load '{lfn}'"
             if fail_on_exception:
                 raise ValueError(msg)
             else:
                 print(msg)
-                os.chdir(cwd)
-                return
-
-    final_output = os.path.abspath("nano_0.root")
-    # run the job with this LFN
-    run_custom_nano_command(
-        input_file=local_lfn_name,
-        **kwargs,
-    )
-    # copy the output to the (remote) WLCG site
-    # from IPython import embed; embed()
+                return False
+    return True
+
+def process_job(
+    lfn: str,
+    tmp_dir: str,
+    cleanup_input: bool=False,
+    **kwargs,
+) -> None:
+    """Run CMSSW for the input *lfn* in the working directory *tmp_dir*.
+    The input has to be available locally, see meth::`stage_input`.
+    If *cleanup_input* is True, the local copy of the input is removed
+    afterwards.
+    """
+    tmp_dir = os.path.abspath(tmp_dir)
+    local_lfn_name = os.path.basename(lfn)
+    try:
+        run_custom_nano_command(
+            input_file=local_lfn_name,
+            cwd=tmp_dir,
+            **kwargs,
+        )
+    finally:
+        if cleanup_input:
+            local_lfn_path = os.path.join(tmp_dir, local_lfn_name)
+            if os.path.lexists(local_lfn_path):
+                os.remove(local_lfn_path)
+
+@tracer.traced("upload output", category="transfer")
+def upload_output(
+    tmp_dir: str,
+    wlcg_path:str,
+    output_name:str,
+    cleanup: bool=False,
+    lfn: str or None=None,
+    **kwargs,
+) -> None:
+    """Copy the output of the job in *tmp_dir* to the (remote) WLCG site.
+    The output is accompanied by a sidecar record with the event counts
+    (see module::`event_sidecar`), which is uploaded after the output.
+    """
+    final_output = os.path.join(os.path.abspath(tmp_dir), "nano_0.root")
     final_target = f"{wlcg_path}/{output_name}"
+    # the record has to be created before the output is cleaned up
+    sidecar = None
+    try:
+        sidecar = write_sidecar(final_output, source_lfns=[lfn] if lfn else None)
+    except Exception as e:
+        print(f"WARNING: could not write sidecar for '{final_output}': {e}")
     try:
         interface.move_file_to_remote(
             local_file=final_output,
             target_file=final_target,
-            route_url=None
+            route_url=None,
+            cleanup=cleanup,
         )
     except Exception as e:
         print(f"Problems when moving file '{final_output}' to '{final_target}'")
         raise e
-    # change back to the original directory after we're done
-    os.chdir(cwd)
+    # a missing sidecar only means that the checker has to open the output,
+    # so this is not a reason to fail the job
+    if sidecar:
+        try:
+            interface.move_file_to_remote(
+                local_file=sidecar,
+                target_file=sidecar_path(final_target),
+                route_url=None,
+                cleanup=cleanup,
+            )
+        except Exception as e:
+            print(f"WARNING: could not upload sidecar '{sidecar}': {e}")
+
+def run_job(
+    lfn: str,
+    tmp_dir: str,
+    wlcg_path:str,
+    output_name:str,
+    fail_on_exception: bool=False,
+    **kwargs,
+) -> bool:
+    """Run the job for a single *lfn* in the working directory *tmp_dir*.
+    The working directory is passed to all commands explicitly instead of
+    changing the directory of the process, such that several jobs can run
+    in parallel (see meth::`run_jobs`).
+
+    Returns:
+        bool: True if the output was moved to the remote site, else False
+    """
+    with tracer.span("job", category="job", lfn=lfn):
+        if not stage_input(lfn=lfn, tmp_dir=tmp_dir, fail_on_exception=fail_on_exception):
+            return False
+        # run the job with this LFN. Inputs from the cache are only linked
+        # into the working directory, and the link has to be removed such
+        # that the eviction of the cached file actually frees the space
+        process_job(
+            lfn=lfn, tmp_dir=tmp_dir, cleanup_input=bool(input_cache), **kwargs
+        )
+        # copy the output to the (remote) WLCG site
+        upload_output(tmp_dir=tmp_dir, wlcg_path=wlcg_path, output_name=output_name, lfn=lfn)
+    return True
+
+def get_number_of_slots(
+    cores_per_job: int=1,
+    memory_per_job: int=2500,
+) -> int:
+    """Small function to determine how many jobs can run in parallel on this
+    node. The number is limited by the available cores and by the available
+    memory.
+
+    Args:
+        cores_per_job (int, optional): number of cores per job. Defaults to 1.
+        memory_per_job (int, optional): memory per job in MB. Defaults to 2500.
+
+    Returns:
+        int: number of jobs that can run in parallel (at least 1)
+    """
+    try:
+        n_cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n_cores = os.cpu_count() or 1
 
+    # use the memory that is currently available, not the total memory
+    memory = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    memory = int(line.split()[1]) / 1024
+                    break
+    except OSError:
+        pass
+    if memory is None:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024**2
+
+    return max(1, min(
+        n_cores // max(1, cores_per_job),
+        int(memory // max(1, memory_per_job)),
+    ))
+
+def run_jobs(jobs: list[dict[str, Any]], n_slots: int=1) -> list[bool]:
+    """Run the *jobs* (keyword arguments for meth::`run_job`) in a pool of
+    *n_slots* workers. Every job runs in its own working directory, so the
+    workers are threads that mainly wait for the transfers and cmsRun.
+
+    Returns:
+        list[bool]: whether the jobs were successful, in the order of *jobs*
+    """
+    def run_safely(job):
+        try:
+            return run_job(**job)
+        except Exception as e:
+            print(f"Job for LFN '{job['lfn']}' failed: {e}")
+            return False
+
+    if n_slots <= 1:
+        pbar_jobs = tqdm(jobs)
+        results = list()
+        for job in pbar_jobs:
+            lfn_shortname = "/".join(job["lfn"].split("/")[-3:])
+            pbar_jobs.set_description(f"Running LFN {lfn_shortname}")
+            results.append(run_safely(job))
+        return results
+
+    with ThreadPoolExecutor(max_workers=n_slots) as executor:
+        futures = [executor.submit(run_safely, job) for job in jobs]
+        pbar_jobs = tqdm(as_completed(futures), total=len(futures))
+        pbar_jobs.set_description(f"Running {len(jobs)} jobs in {n_slots} slots")
+        for _ in pbar_jobs:
+            pass
+    return [future.result() for future in futures]
+
+
+def run_pipeline(
+    jobs: list[dict[str, Any]],
+    n_slots: int=1,
+    prefetch_depth: int=2,
+    n_downloads: int=2,
+) -> list[bool]:
+    """Run the *jobs* (keyword arguments for meth::`run_job`) in a pipeline
+    with three stages that are connected by bounded queues:
+    - download: *n_downloads* threads copy the inputs of the next jobs
+    - process:  *n_slots* threads run CMSSW for the downloaded inputs
+    - upload:   one thread copies the outputs to the remote site
+    Thus, the inputs of the next jobs are downloaded and the outputs of
+    previous jobs are uploaded while CMSSW is running. The inputs are removed
+    after processing and at most *n_slots* + *prefetch_depth* inputs are on
+    the local disk at the same time.
+
+    Returns:
+        list[bool]: whether the jobs were successful, in the order of *jobs*
+    """
+    results = [False]*len(jobs)
+    # limits the number of inputs on disk (downloading, waiting or processing)
+    input_slots = threading.BoundedSemaphore(n_slots + max(0, prefetch_depth))
+    download_queue = Queue()
+    process_queue = Queue(maxsize=max(1, prefetch_depth))
+    upload_queue = Queue(maxsize=max(1, n_slots))
+    pbar_jobs = tqdm(total=len(jobs))
+    pbar_jobs.set_description(f"Running {len(jobs)} jobs in {n_slots} slots")
+    pbar_lock = threading.Lock()
+
+    def done(index, success):
+        results[index] = success
+        with pbar_lock:
+            pbar_jobs.update(1)
+
+    def download():
+        while True:
+            item = download_queue.get()
+            if item is None:
+                break
+            index, job = item
+            input_slots.acquire()
+            try:
+                staged = stage_input(**job)
+            except Exception as e:
+                print(f"Download of LFN '{job['lfn']}' failed: {e}")
+                staged = False
+            if staged:
+                process_queue.put(item)
+            else:
+                input_slots.release()
+                done(index, False)
+
+    def process():
+        while True:
+            item = process_queue.get()
+            if item is None:
+                break
+            index, job = item
+            try:
+                process_job(cleanup_input=True, **job)
+                upload_queue.put(item)
+            except Exception as e:
+                print(f"Job for LFN '{job['lfn']}' failed: {e}")
+                done(index, False)
+            finally:
+                input_slots.release()
+
+    def upload():
+        while True:
+            item = upload_queue.get()
+            if item is None:
+                break
+            index, job = item
+            try:
+                upload_output(cleanup=True, **job)
+                done(index, True)
+            except Exception as e:
+                print(f"Upload for LFN '{job['lfn']}' failed: {e}")
+                done(index, False)
+
+    for item in enumerate(jobs):
+        download_queue.put(item)
+
+    downloaders = [threading.Thread(target=download) for _ in range(max(1, n_downloads))]
+    processors = [threading.Thread(target=process) for _ in range(max(1, n_slots))]
+    uploader = threading.Thread(target=upload)
+    for thread in downloaders + processors + [uploader]:
+        thread.start()
+
+    # shut down the stages one after another with one sentinel per thread
+    for thread in downloaders:
+        download_queue.put(None)
+    for thread in downloaders:
+        thread.join()
+    for thread in processors:
+        process_queue.put(None)
+    for thread in processors:
+        thread.join()
+    upload_queue.put(None)
+    uploader.join()
+    pbar_jobs.close()
+    return results
 
 def build_wlcg_path(
     wlcg_prefix: str,
@@ -121,23 +433,18 @@ def build_wlcg_path(
         job_output=job_output,
     )
 
-def load_config_info(config, sample, key="sampleType"):
-    sampleType=None
-    # try to find information about the sample in the yaml config
-    sample_info = config.get(sample, dict())
-    sampleType = sample_info.get(key)
-
-    # if no sample specific information can be found, look for the general
-    # config section
-    if not sampleType:
-        general_config = config.get("config", dict())
-        sample_info = general_config.get("params", dict())
-
-        # try again
-        sampleType = sample_info.get(key)
-        if not sampleType:
-            raise ValueError(f"Could not load key '{key}' for sample '{sample}'")
-    return sampleType
+def load_config_info(config, sample, key="sampleType", config_file=None):
+    """Load the information *key* (e.g. 'sampleType' or 'era') for *sample*
+    from the SampleCatalog *config*. The catalog already falls back to the
+    general 'config/params' section and the 'GLOBAL' section if there is no
+    sample specific information.
+    """
+    # try to find information about the sample in the yaml configs
+    sample_info = config.get(sample, config_file=config_file)
+    value = sample_info.get(key) if sample_info else None
+    if not value:
+        raise ValueError(f"Could not load key '{key}' for sample '{sample}'")
+    return value
 
 def main(
     *args, 
@@ -148,14 +455,44 @@ def main(
     veto_dirs: list[str]=None,
     tmp_dir: str="./tmp",
     remote_dir_suffix: str="recovery_3",
+    n_jobs: int=1,
+    cores_per_job: int=1,
+    memory_per_job: int=2500,
+    pipeline: bool=False,
+    prefetch_depth: int=2,
+    n_downloads: int=2,
+    trace: str or None=None,
+    input_cache_dir: str or None=None,
+    cache_quota: float=100,
+    use_input_cache: bool=True,
+    use_local_mount: bool=False,
+    transfer_timeout: int=600,
     **kwargs,
 ):
     if not veto_dirs:
         veto_dirs=list()
+    interface.transfer_timeout = transfer_timeout
+    # write the outputs directly to the WLCG directory if it is mounted
+    if use_local_mount:
+        interface.setup_local_mount(
+            remote_prefix=wlcg_prefix,
+            local_prefix="",
+            probe=wlcg_dir,
+            writable=True,
+        )
+    # in the pipeline mode, the inputs are removed after processing and
+    # `prefetch_depth` limits the disk usage, which a cache would undermine
+    if use_input_cache and pipeline:
+        print("The input cache is not used in the pipeline mode")
+    elif use_input_cache:
+        setup_input_cache(
+            cache_dir=(input_cache_dir if input_cache_dir
+                        else os.path.join(tmp_dir, "lfn_cache")),
+            cache_quota=cache_quota,
+        )
     # load dictionary with missing lfns
-    missing_lfn_dict = dict()
-    with open(missing_files_json) as f:
-        missing_lfn_dict = json.load(f)
+    # only the missing LFNs are needed, so columnar summaries only load them
+    missing_lfn_dict = load_summary(missing_files_json, columns=["missing_lfns"])
     
     # filter out samples that are accounted for in the list of veto directories
     missing_samples = list(filter(
@@ -167,12 +504,19 @@ def main(
     # create a time stamp that mimics the crab format
     timestamp = '{:%y%m%d_%H%M%S}'.format(datetime.now())
     local_job_summary = dict()
-    with open(sample_config) as f:
-        sample_dict = yaml.load(f, yaml.Loader)
+    catalog = SampleCatalog.for_config(sample_config)
+    # first collect the jobs for all samples, such that they can share the
+    # available slots
+    jobs = list()
+    job_samples = list()
     for sample in pbar_samples:
-        pbar_samples.set_description(f"Run missing jobs for sample '{sample}'")
-        sampleType = load_config_info(config=sample_dict, sample=sample, key="sampleType")
-        era = load_config_info(config=sample_dict, sample=sample, key="era")
+        pbar_samples.set_description(f"Collect missing jobs for sample '{sample}'")
+        sampleType = load_config_info(
+            config=catalog, sample=sample, key="sampleType", config_file=sample_config
+        )
+        era = load_config_info(
+            config=catalog, sample=sample, key="era", config_file=sample_config
+        )
         # load das key for this sample
         das_key = interface.load_das_key(
             sample_name=sample,
@@ -183,16 +527,19 @@ def main(
         sample_campaign = interface.get_campaign_name(das_key=das_key)
         
         # loop through the list of missing lfns
-        pbar_missing_lfns = tqdm(missing_lfn_dict[sample]["missing_lfns"])
-        missing_lfns = list()
         final_remote_dir = (f"crab_{sample}_{remote_dir_suffix}" 
                             if not remote_dir_suffix == ""
                             else f"crab_{sample}"
                         )
-        for i, lfn in enumerate(pbar_missing_lfns):
-            lfn_shortname = "/".join(lfn.split("/")[-3:])
+        missing_lfns = missing_lfn_dict[sample].get("missing_lfns", [])
+        if input_cache:
+            # load the checksums of all inputs of the sample at once instead
+            # of querying every file separately
+            input_file_infos.update(interface.get_file_infos(
+                das_key=das_key, lfns=missing_lfns
+            ))
+        for i, lfn in enumerate(missing_lfns):
             fname = ".".join(os.path.basename(lfn).split(".")[:-1])
-            pbar_missing_lfns.set_description(f"Running LFN {lfn_shortname}")
 
             blocknumber = int(i/10000)
             wlcg_path = build_wlcg_path(
@@ -203,23 +550,48 @@ def main(
                 time_stamp=timestamp,
                 job_output=f"{blocknumber:04d}"
             )
-            run_job(
+            jobs.append(dict(
                 lfn=lfn,
                 tmp_dir=os.path.join(tmp_dir, sample, fname),
                 wlcg_path=wlcg_path,
                 output_name=f"nano_{i}.root",
                 sampleType=sampleType,
                 era=era,
-            )
-            missing_lfns.append(lfn)
+            ))
+            job_samples.append(sample)
         local_job_summary[sample] = {
             "timestamp": timestamp,
             "remote_dir": final_remote_dir,
-            "lfns": missing_lfns,
+            "lfns": list(),
         }
+
+    if not n_jobs or n_jobs <= 0:
+        n_jobs = get_number_of_slots(
+            cores_per_job=cores_per_job,
+            memory_per_job=memory_per_job,
+        )
+    if pipeline:
+        results = run_pipeline(
+            jobs=jobs,
+            n_slots=n_jobs,
+            prefetch_depth=prefetch_depth,
+            n_downloads=n_downloads,
+        )
+    else:
+        results = run_jobs(jobs=jobs, n_slots=n_jobs)
+
+    # only LFNs with successful jobs are considered as done
+    for sample, job, success in zip(job_samples, jobs, results):
+        if success:
+            local_job_summary[sample]["lfns"].append(job["lfn"])
     with open("local_job_summary.json", "w") as f:
         json.dump(local_job_summary, f, indent=4)
 
+    if trace:
+        tracer.write(trace)
+        print(f"\nTime spent per phase (trace saved in '{trace}'):")
+        tracer.print_summary()
+
 def parse_arguments():
     description = """
     Script to run missing crab jobs locally and move the to the target
@@ -318,7 +690,8 @@ def parse_arguments():
         help=" ".join(
             """
                 file that contains the missing lfns 
-                (see structure in description)
+                (see structure in description). Can also be a summary
+                in the parquet format (see check_crab_jobs.py)
             """.split()
         ),
         dest="missing_files_json",
@@ -367,6 +740,160 @@ def parse_arguments():
         dest="veto_dirs"
     )
 
+    parser.add_argument(
+        "-n", "--jobs",
+        help=" ".join(
+            """
+                number of jobs to run in parallel. If 0, the number is
+                determined from the available cores and memory (see
+                `--cores-per-job` and `--memory-per-job`). Defaults to 1,
+                i.e. the jobs run one after another
+            """.split()
+        ),
+        type=int,
+        default=1,
+        dest="n_jobs",
+    )
+
+    parser.add_argument(
+        "--cores-per-job",
+        help="number of cores that one job needs. Defaults to 1",
+        type=int,
+        default=1,
+        dest="cores_per_job",
+    )
+
+    parser.add_argument(
+        "--memory-per-job",
+        help="memory in MB that one job needs. Defaults to 2500",
+        type=int,
+        default=2500,
+        dest="memory_per_job",
+    )
+
+    parser.add_argument(
+        "--pipeline",
+        help=" ".join(
+            """
+                download the inputs of the next jobs and upload the outputs
+                of previous jobs while CMSSW is running. The input cache is
+                not used in this mode
+            """.split()
+        ),
+        action="store_true",
+        default=False,
+        dest="pipeline",
+    )
+
+    parser.add_argument(
+        "--prefetch-depth",
+        help=" ".join(
+            """
+                number of inputs that are downloaded in advance in the
+                pipeline mode. Limits the local disk usage to
+                (jobs + prefetch depth) inputs. Defaults to 2
+            """.split()
+        ),
+        type=int,
+        default=2,
+        dest="prefetch_depth",
+    )
+
+    parser.add_argument(
+        "--downloads",
+        help=" ".join(
+            """
+                number of parallel downloads in the pipeline mode.
+                Defaults to 2
+            """.split()
+        ),
+        type=int,
+        default=2,
+        dest="n_downloads",
+    )
+
+    parser.add_argument(
+        "--input-cache",
+        help=" ".join(
+            """
+                directory of the node-local cache for the input files.
+                Inputs are only downloaded once and verified with the
+                adler32 checksum from DBS. Defaults to 'TMP_DIR/lfn_cache'.
+                Not used with `--pipeline`, where the inputs are removed
+                after processing such that `--prefetch-depth` limits the
+                local disk usage
+            """.split()
+        ),
+        type=str,
+        default=None,
+        metavar="path/to/input_cache",
+        dest="input_cache_dir",
+    )
+
+    parser.add_argument(
+        "--cache-quota",
+        help=" ".join(
+            """
+                maximum size of the input cache in GB. If it is exceeded,
+                the least recently used inputs are removed. Defaults to 100
+            """.split()
+        ),
+        type=float,
+        default=100,
+        dest="cache_quota",
+    )
+
+    parser.add_argument(
+        "--transfer-timeout",
+        help=" ".join(
+            """
+                timeout in seconds for every request when the inputs are
+                downloaded with XRootD. Defaults to 600
+            """.split()
+        ),
+        type=int,
+        default=600,
+        dest="transfer_timeout",
+    )
+
+    parser.add_argument(
+        "--no-input-cache",
+        help="download the inputs directly into the job directories",
+        action="store_false",
+        default=True,
+        dest="use_input_cache",
+    )
+
+    parser.add_argument(
+        "--local-mount",
+        help=" ".join(
+            """
+                copy the outputs directly to the WLCG directory if it is
+                mounted on this node (e.g. /pnfs on the NAF) instead of
+                using the `--wlcg-prefix`. The mount has to be writable
+            """.split()
+        ),
+        action="store_true",
+        default=False,
+        dest="use_local_mount",
+    )
+
+    parser.add_argument(
+        "--trace",
+        help=" ".join(
+            """
+                record the time spent in the different phases of the jobs
+                (download, PSet creation, cmsRun, upload) and save it in the
+                Chrome trace format to this file. A summary is printed at
+                the end
+            """.split()
+        ),
+        metavar="path/to/trace.json",
+        type=str,
+        default=None,
+        dest="trace",
+    )
+
     args = parser.parse_args()
     # from IPython import embed; embed()
     
@@ -378,6 +905,8 @@ def parse_arguments():
     
     global verbosity
     verbosity = args.verbosity
+    if args.trace:
+        tracer.enable()
     return args
 
 if __name__ == '__main__':
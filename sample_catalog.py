@@ -0,0 +1,212 @@
+import os
+import re
+import pickle
+import yaml
+
+from typing import Any
+
+# the C implementation of the yaml loader is much faster than the pure
+# python version, so use it whenever it is available
+try:
+    from yaml import CLoader as YamlLoader
+except ImportError:
+    from yaml import Loader as YamlLoader
+
+
+def default_cache_dir() -> str:
+    """Default directory for the compiled catalogs. Uses $ANALYSIS_DATA_PATH
+    if it is set (see env.sh), else '~/.cache/nanoprod'.
+    """
+    return os.path.join(
+        os.environ.get(
+            "ANALYSIS_DATA_PATH",
+            os.path.join(os.path.expanduser("~"), ".cache", "nanoprod")
+        ),
+        "sample_catalogs",
+    )
+
+
+class SampleCatalog(object):
+    """Catalog of the samples defined in the .yaml configs of an era, i.e.
+    the files 'NanoProd/crab/ERA/*.yaml'. Only the configs that are actually
+    used are loaded: 'global.yaml' (if it exists) and the sample configs
+    that are requested with meth::`for_config`. The information of every
+    sample is resolved, i.e.
+    - das_key:      DAS key of the miniAOD dataset ('miniAOD', 'inputDataset'
+                    or the value itself if the sample is defined as string)
+    - sampleType:   from the sample entry, the 'config/params' section of the
+                    file or the 'GLOBAL' section
+    - era:          same as sampleType
+    - remoteBase:   the name of the remote base and the resolved path from
+                    'GLOBAL/remoteBases'
+    - ignored_lfns: LFNs listed in 'ignore_miniAOD_LFNs'
+
+    The resolved configs are saved in a compiled cache file, which is used
+    for a config as long as neither the config nor 'global.yaml' was
+    modified. Within a process, every config is only loaded once.
+    """
+    reserved_keys = ["config", "GLOBAL"]
+    global_name = "global.yaml"
+    # catalogs that were already created in this process, see meth::`for_config`
+    instances = dict()
+
+    def __init__(self, config_dir: str, cache_dir: str or None=None):
+        self.config_dir = os.path.abspath(config_dir)
+        self.cache_dir = cache_dir if cache_dir else default_cache_dir()
+        self.cache_path = os.path.join(
+            self.cache_dir,
+            re.sub(r"[^A-Za-z0-9_.-]", "_", self.config_dir.strip(os.path.sep)) + ".pkl",
+        )
+        self.global_path = os.path.join(self.config_dir, self.global_name)
+        self.__global_mtime = (os.stat(self.global_path).st_mtime
+                               if os.path.exists(self.global_path) else None)
+        self.__global_config = None
+        # {config_file: {sample_name: resolved_information}}
+        self.files = dict()
+        # {sample_name: [config_file, ...]}
+        self.index = dict()
+        self.cache = self.load_cache()
+
+    @classmethod
+    def for_config(cls, sample_config: str) -> "SampleCatalog":
+        """Return the catalog for the era directory that contains the file
+        *sample_config* and make sure that *sample_config* is loaded.
+        Catalogs are only created once per directory and process.
+        """
+        config_dir = os.path.dirname(os.path.abspath(sample_config))
+        catalog = cls.instances.get(config_dir)
+        if catalog is None:
+            catalog = cls(config_dir=config_dir)
+            cls.instances[config_dir] = catalog
+        catalog.add_config(sample_config)
+        return catalog
+
+    @property
+    def global_config(self) -> dict[str, Any]:
+        """'GLOBAL' section of 'global.yaml', which is only parsed if a
+        config has to be resolved.
+        """
+        if self.__global_config is None:
+            self.__global_config = (
+                self.parse(self.global_path).get("GLOBAL", dict())
+                if self.__global_mtime is not None else dict()
+            )
+        return self.__global_config
+
+    @staticmethod
+    def parse(path: str) -> dict[str, Any]:
+        with open(path) as f:
+            return yaml.load(f, YamlLoader) or dict()
+
+    def load_cache(self) -> dict[str, dict[str, Any]]:
+        """Load the compiled configs of this directory, i.e. the mapping
+        {config_file: {"fingerprint": ..., "samples": ...}}.
+        """
+        if not os.path.exists(self.cache_path):
+            return dict()
+        try:
+            with open(self.cache_path, "rb") as f:
+                return pickle.load(f).get("configs", dict())
+        except Exception as e:
+            print(f"WARNING: could not load sample catalog from '{self.cache_path}': {e}")
+        return dict()
+
+    def save_cache(self) -> None:
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"configs": self.cache}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"WARNING: could not save sample catalog to '{self.cache_path}': {e}")
+
+    def add_config(self, config_file: str) -> None:
+        """Load the samples of *config_file*, either from the compiled cache
+        or by resolving the .yaml file (see meth::`resolve_file`).
+        """
+        path = os.path.abspath(config_file)
+        if path in self.files:
+            return
+        fingerprint = [os.stat(path).st_mtime, self.__global_mtime]
+        cached = self.cache.get(path)
+        if cached and cached.get("fingerprint") == fingerprint:
+            samples = cached["samples"]
+        else:
+            raw_config = self.parse(path)
+            global_config = dict(self.global_config)
+            global_config.update(raw_config.get("GLOBAL", dict()))
+            samples = self.resolve_file(raw_config, global_config)
+            self.cache[path] = {"fingerprint": fingerprint, "samples": samples}
+            self.save_cache()
+        self.files[path] = samples
+        self.build_index()
+
+    def build_index(self) -> None:
+        self.index = dict()
+        for path, samples in self.files.items():
+            for sample_name in samples:
+                self.index.setdefault(sample_name, list()).append(path)
+
+    def resolve_file(
+        self,
+        raw_config: dict[str, Any],
+        global_config: dict[str, Any],
+    ) -> dict[str, dict[str, Any]]:
+        """Resolve the information of all samples in the .yaml config
+        *raw_config*, see class description.
+        """
+        params = raw_config.get("config", dict()).get("params", dict())
+        remote_bases = global_config.get("remoteBases", dict())
+        samples = dict()
+        for sample_name, entry in raw_config.items():
+            if sample_name in self.reserved_keys:
+                continue
+            if isinstance(entry, str):
+                entry = {"miniAOD": entry}
+            elif not isinstance(entry, dict):
+                continue
+            remote_base = entry.get("remoteBase")
+            samples[sample_name] = {
+                "das_key": entry.get("miniAOD", entry.get("inputDataset")),
+                "sampleType": entry.get(
+                    "sampleType",
+                    params.get("sampleType", global_config.get("sampleType"))
+                ),
+                "era": entry.get("era", params.get("era", global_config.get("era"))),
+                "remoteBase": remote_base,
+                "remote_path": remote_bases.get(remote_base, remote_base),
+                "ignored_lfns": entry.get("ignore_miniAOD_LFNs") or [],
+                "entry": entry,
+            }
+        return samples
+
+    def get(
+        self,
+        sample_name: str,
+        config_file: str or None=None,
+    ) -> dict[str, Any] or None:
+        """Get the resolved information for sample *sample_name*. If a sample
+        is defined in several of the loaded files, the definition in
+        *config_file* is preferred. Returns None if the sample is unknown.
+        """
+        paths = self.index.get(sample_name, [])
+        if len(paths) == 0:
+            return None
+        if config_file:
+            config_file = os.path.abspath(config_file)
+            if config_file in paths:
+                return self.files[config_file][sample_name]
+        return self.files[paths[0]][sample_name]
+
+    def das_key(self, sample_name: str, config_file: str or None=None) -> str or None:
+        info = self.get(sample_name, config_file=config_file)
+        return info["das_key"] if info else None
+
+    def ignored_lfns(self, sample_name: str, config_file: str or None=None) -> list[str]:
+        info = self.get(sample_name, config_file=config_file)
+        return info["ignored_lfns"] if info else []
+
+    def samples(self) -> list[str]:
+        return sorted(self.index)
@@ -0,0 +1,466 @@
+"""Plan the job splitting of samples from the number of events per file in DBS
+and the processing rates measured with the ProdBenchmark task
+(see NanoProd/python/benchmarks.py).
+"""
+import os
+import sys
+import json
+import numpy as np
+
+from glob import glob
+from typing import Any
+from collections.abc import Iterable
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+
+thisdir = os.path.realpath(os.path.dirname(__file__))
+if not thisdir in sys.path:
+    sys.path.append(thisdir)
+
+from dbs_file_list import DBSFileTable
+from sample_catalog import SampleCatalog
+
+SPLIT_STRATEGIES = ["events", "runtime"]
+
+
+def load_benchmark_rates(paths: Iterable[str]) -> dict[str, dict[str, Any]]:
+    """Load the processing rates written by ProdBenchmark ('INPUT.rate.json').
+    *paths* can be files or directories, which are searched for rate files.
+
+    Returns:
+        dict:   {"inputs": {benchmark_input: {era: events_per_second}},
+                 "era_types": {era: {sample_type: median_events_per_second}},
+                 "types": {sample_type: median_events_per_second}}
+    """
+    files = list()
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob(os.path.join(path, "*.rate.json")))
+        else:
+            files.append(path)
+    inputs = dict()
+    by_era_type = dict()
+    by_type = dict()
+    for path in files:
+        with open(path) as f:
+            rate = json.load(f)
+        events_per_second = rate.get("events_per_second")
+        if not events_per_second:
+            continue
+        inputs.setdefault(rate["input"], dict())[rate["era"]] = events_per_second
+        by_era_type.setdefault(rate["era"], dict()).setdefault(
+            rate["sample_type"], list()
+        ).append(events_per_second)
+        by_type.setdefault(rate["sample_type"], list()).append(events_per_second)
+    return {
+        "inputs": inputs,
+        "era_types": {
+            era: {key: float(np.median(values)) for key, values in types.items()}
+            for era, types in by_era_type.items()
+        },
+        "types": {key: float(np.median(values)) for key, values in by_type.items()},
+    }
+
+
+def rate_for_sample(
+    rates: dict[str, dict[str, Any]],
+    sample_name: str,
+    sample_type: str or None,
+    era: str or None,
+    benchmark_map: dict[str, str] or None=None,
+) -> float or None:
+    """Return the processing rate for *sample_name* in *era*. The benchmark
+    input of the sample is taken from *benchmark_map* ({sample_name:
+    benchmark_input}), otherwise it is assumed to have the name of the
+    sample. If this input was not benchmarked in *era*, the rate falls back
+    to (in this order) the median over the eras of the mapped input, the
+    median of all benchmarks of *sample_type* in *era* and the median of
+    all benchmarks of *sample_type*, with a warning.
+    """
+    benchmark = (benchmark_map or dict()).get(sample_name, sample_name)
+    measured = rates["inputs"].get(benchmark, dict())
+    if era in measured:
+        return measured[era]
+    if measured and benchmark != sample_name:
+        print(f"WARNING: benchmark '{benchmark}' was not run for era '{era}', "
+              f"using its median rate for '{sample_name}'")
+        return float(np.median(list(measured.values())))
+    if sample_type in rates["era_types"].get(era, dict()):
+        print(f"WARNING: no benchmark for '{sample_name}', using the median rate "
+              f"of '{sample_type}' samples in era '{era}'")
+        return rates["era_types"][era][sample_type]
+    if sample_type in rates["types"]:
+        print(f"WARNING: no benchmark for '{sample_name}' in era '{era}', using the "
+              f"median rate of '{sample_type}' samples in all eras")
+        return rates["types"][sample_type]
+    return None
+
+
+def balanced_groups(weights: np.ndarray, target: float) -> list[np.ndarray]:
+    """Split the files with *weights* (e.g. number of events or expected
+    runtime) into consecutive groups of about equal weight, which does not
+    exceed *target* unless a single file is heavier. The files are kept in
+    their order, such that the files of a DBS block stay together.
+
+    Returns:
+        list[np.ndarray]: indices of the files of every group
+    """
+    if len(weights) == 0:
+        return list()
+    cumulative = np.cumsum(weights, dtype=np.float64)
+    n_jobs = max(1, int(np.ceil(cumulative[-1]/target)))
+    # distribute the total weight evenly instead of filling every job up
+    # to the target, such that there is no small job at the end
+    boundaries = cumulative[-1]/n_jobs*np.arange(1, n_jobs)
+    # cut before or after the file that crosses a boundary, whichever is closer
+    crossing = np.searchsorted(cumulative, boundaries, side="left")
+    before = np.where(crossing > 0, cumulative[np.maximum(crossing - 1, 0)], 0.)
+    after = cumulative[np.minimum(crossing, len(weights) - 1)]
+    cuts = np.where(boundaries - before < after - boundaries, crossing, crossing + 1)
+    cuts = np.unique(cuts[(cuts > 0) & (cuts < len(weights))])
+    return np.split(np.arange(len(weights)), cuts)
+
+
+def files_per_job(weights: np.ndarray, target: float, max_units: int=50) -> int:
+    """Number of files per job for the 'FileBased' splitting of crab, which
+    groups the files without looking at their content. The number is chosen
+    such that even jobs with heavy files (90% quantile) stay below *target*.
+    """
+    if len(weights) == 0:
+        return 1
+    heavy = float(np.quantile(weights, 0.9))
+    if heavy <= 0:
+        return max_units
+    return int(min(max(1, target//heavy), max_units))
+
+
+def plan_sample(
+    table: DBSFileTable,
+    strategy: str="events",
+    events_per_job: int=100000,
+    rate: float or None=None,
+    max_runtime: float=2.0,
+    safety_factor: float=0.75,
+    file_overhead: float=0.,
+    max_units: int=50,
+) -> tuple[dict[str, Any], list[list[str]]]:
+    """Plan the splitting of the files in *table*.
+    For the 'events' strategy, every job processes about *events_per_job*
+    events. For the 'runtime' strategy, the expected runtime of every file
+    is estimated from the processing *rate* in events per second plus
+    *file_overhead* seconds (e.g. to open the remote file), and the jobs
+    are balanced such that they finish within *safety_factor* times
+    *max_runtime* hours.
+
+    Returns:
+        tuple:  the summary of the plan, which contains the recommended
+                unitsPerJob for the 'FileBased' splitting, and the LFNs of
+                the balanced jobs
+    """
+    if not strategy in SPLIT_STRATEGIES:
+        raise ValueError(f"Unknown split strategy '{strategy}'")
+    events = np.clip(table.event_counts, 0, None).astype(np.float64)
+    if strategy == "runtime":
+        if not rate:
+            raise ValueError("The runtime strategy requires a processing rate")
+        weights = events/rate + file_overhead
+        target = max_runtime*3600*safety_factor
+    else:
+        weights = events
+        target = events_per_job
+
+    groups = balanced_groups(weights, target)
+    units = files_per_job(weights, target, max_units=max_units)
+    job_weights = np.array([weights[x].sum() for x in groups])
+    plan = {
+        "strategy": strategy,
+        "unitsPerJob": units,
+        "n_files": len(table),
+        "n_events": table.total_events(),
+        "n_jobs_balanced": len(groups),
+        "n_jobs_file_based": int(np.ceil(len(table)/units)) if len(table) else 0,
+        "events_per_job": [
+            int(np.min([events[x].sum() for x in groups])) if groups else 0,
+            int(np.max([events[x].sum() for x in groups])) if groups else 0,
+        ],
+    }
+    if rate:
+        plan["events_per_second"] = rate
+        runtimes = np.array([
+            events[x].sum()/rate + file_overhead*len(x) for x in groups
+        ])
+        plan["runtime_h"] = [
+            round(float(np.median(runtimes))/3600, 2) if groups else 0,
+            round(float(np.max(runtimes))/3600, 2) if groups else 0,
+        ]
+    jobs = [[table.lfns[i] for i in x] for x in groups]
+    return plan, jobs
+
+
+def print_plan_table(plans: dict[str, dict[str, Any]]) -> None:
+    headerparts = ["{: ^16}".format(x)
+        for x in ["Sample", "#Files", "#Jobs (balanced)", "unitsPerJob",
+                    "#Jobs (FileBased)", "Events/job", "Runtime [h]"]
+    ]
+    lines = ["| {} |".format(" | ".join(headerparts))]
+    lines += ["| {} |".format(" | ".join(["---"]*len(headerparts)))]
+    for s, plan in plans.items():
+        runtime = plan.get("runtime_h")
+        lines.append("| {} |".format(" | ".join(
+            ["{: ^16}".format(x) for x in [
+                s, plan["n_files"], plan["n_jobs_balanced"], plan["unitsPerJob"],
+                plan["n_jobs_file_based"],
+                "{}-{}".format(*plan["events_per_job"]),
+                "{}/{}".format(*runtime) if runtime else "-",
+            ]]
+        )))
+    print("\n".join(lines))
+
+
+def main(
+    *args,
+    sample_config: str,
+    samples: list[str] or None=None,
+    rates: list[str] or None=None,
+    benchmark_map: list[str] or None=None,
+    strategy: str="events",
+    events_per_job: int=100000,
+    max_runtime: float=2.0,
+    safety_factor: float=0.75,
+    file_overhead: float=0.,
+    max_units_per_job: int=50,
+    output: str="splitting_plan.json",
+    dump_jobs: str or None=None,
+    use_dbs_cache: bool=True,
+    verbosity: int=0,
+    **kwargs,
+):
+    from wlcg_dbs_interface import WLCGInterface
+
+    interface = WLCGInterface(verbosity=verbosity)
+    if use_dbs_cache:
+        interface.setup_dbs_cache()
+    catalog = SampleCatalog.for_config(sample_config)
+    if not samples:
+        samples = sorted(catalog.files.get(os.path.abspath(sample_config), dict()))
+    benchmark_rates = load_benchmark_rates(rates or [])
+    # map the sample names to the names of the benchmark inputs
+    benchmark_map = dict(x.split(":", 1) for x in (benchmark_map or []))
+
+    plans = dict()
+    for sample_name in samples:
+        info = catalog.get(sample_name, config_file=sample_config)
+        if not info or not info["das_key"]:
+            print(f"WARNING: no DAS key for sample '{sample_name}', skipping")
+            continue
+        if not interface.has_file_list(info["das_key"]):
+            print(f"WARNING: could not load the file list of '{sample_name}', skipping")
+            continue
+        rate = rate_for_sample(
+            benchmark_rates,
+            sample_name,
+            sample_type=info["sampleType"],
+            era=info["era"],
+            benchmark_map=benchmark_map,
+        )
+        sample_strategy = strategy
+        if strategy == "runtime" and not rate:
+            print(f"WARNING: no benchmark rate for '{sample_name}', balancing events instead")
+            sample_strategy = "events"
+        table = interface.load_file_table(info["das_key"])
+        ignored_lfns = set(info["ignored_lfns"])
+        if ignored_lfns:
+            keep = [x not in ignored_lfns for x in table.lfns]
+            table = DBSFileTable(
+                lfns=[x for x, k in zip(table.lfns, keep) if k],
+                event_counts=table.event_counts[keep],
+                file_sizes=table.file_sizes[keep],
+                adler32=table.adler32[keep],
+            )
+        plan, jobs = plan_sample(
+            table,
+            strategy=sample_strategy,
+            events_per_job=events_per_job,
+            rate=rate,
+            max_runtime=max_runtime,
+            safety_factor=safety_factor,
+            file_overhead=file_overhead,
+            max_units=max_units_per_job,
+        )
+        plans[sample_name] = plan
+        if dump_jobs:
+            os.makedirs(dump_jobs, exist_ok=True)
+            # same format as the job_input_files.json of the crab directories
+            with open(os.path.join(dump_jobs, f"{sample_name}_jobs.json"), "w") as f:
+                json.dump({str(i+1): x for i, x in enumerate(jobs)}, f, indent=4)
+
+    print_plan_table(plans)
+    with open(output, "w") as f:
+        json.dump({"strategy": strategy, "samples": plans}, f, indent=4)
+    print(f"\nSplitting plan saved in '{output}', apply it with update_sample_config.py --splitting-json")
+
+
+def parse_arguments():
+    description = """
+    Plan the job splitting of the samples in a sample config. The number of
+    events per file is taken from DBS, and the jobs are either balanced in
+    the number of events or in the expected runtime, which is estimated
+    with the processing rates measured with the ProdBenchmark task.
+    The recommended unitsPerJob for the 'FileBased' splitting are saved in a
+    format that can be applied with update_sample_config.py --splitting-json.
+    """
+    parser = ArgumentParser(description=description,
+        formatter_class=RawDescriptionHelpFormatter)
+
+    parser.add_argument(
+        "-c", "--sample-config",
+        help=" ".join("""
+            path to the sample config (.yaml) with the samples to plan
+        """.split()),
+        metavar="PATH/TO/SAMPLE_CONFIG.yaml",
+        type=str,
+        required=True,
+        dest="sample_config",
+    )
+    parser.add_argument(
+        "-s", "--samples",
+        help=" ".join("""
+            names of the samples to plan. Defaults to all samples in the
+            sample config
+        """.split()),
+        nargs="+",
+        type=str,
+        default=None,
+        dest="samples",
+    )
+    parser.add_argument(
+        "-r", "--rates",
+        help=" ".join("""
+            rate files ('INPUT.rate.json') or output directories of the
+            ProdBenchmark task. The rates are matched by benchmark input
+            (see `--benchmark-map`) and era. Samples without a matching
+            benchmark use the median rate of their sample type in their
+            era, or in all eras if there is none
+        """.split()),
+        nargs="+",
+        type=str,
+        default=None,
+        dest="rates",
+    )
+    parser.add_argument(
+        "-m", "--benchmark-map",
+        help=" ".join("""
+            benchmark inputs of the samples in the format
+            SAMPLE:BENCHMARK_INPUT, e.g. DYJetsToLL_M-50:DY_NLO. By default,
+            the benchmark input is assumed to have the name of the sample
+        """.split()),
+        nargs="+",
+        type=str,
+        default=None,
+        dest="benchmark_map",
+    )
+    parser.add_argument(
+        "--strategy",
+        help=" ".join("""
+            balance the jobs in the number of events ('events') or in the
+            expected runtime ('runtime', requires `--rates`).
+            Defaults to 'events'
+        """.split()),
+        choices=SPLIT_STRATEGIES,
+        default="events",
+        dest="strategy",
+    )
+    parser.add_argument(
+        "--events-per-job",
+        help=" ".join("""
+            target number of events per job for the 'events' strategy.
+            Defaults to 100000
+        """.split()),
+        type=int,
+        default=100000,
+        dest="events_per_job",
+    )
+    parser.add_argument(
+        "--max-runtime",
+        help=" ".join("""
+            maximal runtime of a job in hours for the 'runtime' strategy.
+            Defaults to 2.0
+        """.split()),
+        type=float,
+        default=2.0,
+        dest="max_runtime",
+    )
+    parser.add_argument(
+        "--safety-factor",
+        help=" ".join("""
+            fraction of the `--max-runtime` that the jobs are planned for.
+            Defaults to 0.75
+        """.split()),
+        type=float,
+        default=0.75,
+        dest="safety_factor",
+    )
+    parser.add_argument(
+        "--file-overhead",
+        help=" ".join("""
+            additional runtime in seconds per input file, e.g. to open the
+            file remotely. Defaults to 0
+        """.split()),
+        type=float,
+        default=0.,
+        dest="file_overhead",
+    )
+    parser.add_argument(
+        "--max-units-per-job",
+        help=" ".join("""
+            upper limit for the recommended number of input files per job.
+            Defaults to 50
+        """.split()),
+        type=int,
+        default=50,
+        dest="max_units_per_job",
+    )
+    parser.add_argument(
+        "-o", "--output",
+        help=" ".join("""
+            path to the file for the splitting plan.
+            Defaults to splitting_plan.json
+        """.split()),
+        type=str,
+        default="splitting_plan.json",
+        dest="output",
+    )
+    parser.add_argument(
+        "--dump-jobs",
+        help=" ".join("""
+            directory to save the LFNs of the balanced jobs of every sample
+            in the format of job_input_files.json
+        """.split()),
+        metavar="PATH/TO/DIRECTORY",
+        type=str,
+        default=None,
+        dest="dump_jobs",
+    )
+    parser.add_argument(
+        "--no-dbs-cache",
+        help="do not use the cache for DBS/DAS information",
+        action="store_false",
+        default=True,
+        dest="use_dbs_cache",
+    )
+    parser.add_argument(
+        "-v", "--verbosity",
+        help="increase output verbosity",
+        action="count",
+        default=0,
+        dest="verbosity",
+    )
+
+    args = parser.parse_args()
+    if not os.path.exists(args.sample_config):
+        parser.error(f"file {args.sample_config} does not exist!")
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_arguments()
+    main(**vars(args))
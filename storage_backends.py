@@ -0,0 +1,416 @@
+import os
+import shutil
+
+from collections import namedtuple
+from typing import Any, Callable
+
+# the XRootD python bindings are optional, root:// paths are accessed with
+# gfal if they are not available
+try:
+    from XRootD import client as xrootd_client
+    from XRootD.client.flags import DirListFlags, MkDirFlags
+except ImportError:
+    xrootd_client = None
+    DirListFlags = None
+    MkDirFlags = None
+
+# minimal stat information that all backends provide
+StatResult = namedtuple("StatResult", ["st_size", "st_mtime"])
+
+
+class StorageBackend(object):
+    """Interface of the backends to access storage. All paths are given in
+    the format that the backend understands (see class::`StorageRouter`).
+    """
+    name = "base"
+
+    def listdir(self, path: str) -> list[str]:
+        """Return the names of the entries of directory *path*."""
+        raise NotImplementedError
+
+    def scandir(self, path: str) -> dict[str, int]:
+        """Return the names of the entries of directory *path* together with
+        their sizes in bytes. By default, every entry is stat'ed separately.
+        """
+        return {
+            name: self.stat(f"{path.rstrip('/')}/{name}").st_size
+            for name in self.listdir(path)
+        }
+
+    def stat(self, path: str) -> Any:
+        """Return an object with (at least) the attributes st_size and
+        st_mtime.
+        """
+        raise NotImplementedError
+
+    def copy(self, source: str, target: str, overwrite: bool=True) -> None:
+        """Copy the local file *source* to *target*."""
+        raise NotImplementedError
+
+    def download(self, source: str, target: str) -> None:
+        """Copy *source* to the local file *target*."""
+        raise NotImplementedError
+
+    def unlink(self, paths: list[str]) -> list[Exception or None]:
+        """Remove all *paths* and return the error for every path (None if
+        the path was removed successfully).
+        """
+        errors = list()
+        for path in paths:
+            try:
+                self.unlink_file(path)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def unlink_file(self, path: str) -> None:
+        raise NotImplementedError
+
+    def mkdir(self, path: str) -> None:
+        """Create directory *path* including all parent directories."""
+        raise NotImplementedError
+
+    def read(self, path: str, max_size: int=1024**2) -> bytes:
+        """Read at most *max_size* bytes from the beginning of *path*."""
+        raise NotImplementedError
+
+
+class PosixBackend(StorageBackend):
+    """Backend for local paths and storage that is mounted on the node,
+    e.g. /pnfs on the NAF. Directories are listed with os.scandir, which
+    only costs a few syscalls instead of a round trip to the storage door.
+    """
+    name = "posix"
+
+    @staticmethod
+    def local_path(path: str) -> str:
+        return path[len("file://"):] if path.startswith("file://") else path
+
+    def listdir(self, path: str) -> list[str]:
+        with os.scandir(self.local_path(path)) as entries:
+            return [x.name for x in entries]
+
+    def scandir(self, path: str) -> dict[str, int]:
+        with os.scandir(self.local_path(path)) as entries:
+            return {x.name: x.stat().st_size for x in entries}
+
+    def stat(self, path: str) -> os.stat_result:
+        return os.stat(self.local_path(path))
+
+    def copy(self, source: str, target: str, overwrite: bool=True) -> None:
+        source, target = self.local_path(source), self.local_path(target)
+        if not overwrite and os.path.exists(target):
+            raise FileExistsError(f"File '{target}' already exists")
+        # copy to a temporary file first, such that the target is either
+        # complete or does not exist
+        tmp_target = f"{target}.part"
+        shutil.copyfile(source, tmp_target)
+        os.replace(tmp_target, target)
+
+    def download(self, source: str, target: str) -> None:
+        self.copy(source, target)
+
+    def unlink_file(self, path: str) -> None:
+        os.remove(self.local_path(path))
+
+    def mkdir(self, path: str) -> None:
+        os.makedirs(self.local_path(path), exist_ok=True)
+
+    def read(self, path: str, max_size: int=1024**2) -> bytes:
+        with open(self.local_path(path), "rb") as f:
+            return f.read(max_size)
+
+
+class GfalBackend(StorageBackend):
+    """Backend for all protocols that gfal2 supports (srm, gsiftp, davs,
+    root, ...). The gfal2 contexts are borrowed with *borrow_context*, e.g.
+    meth::`WLCGInterface.borrow_context`, such that the backend can be used
+    from several threads.
+    """
+    name = "gfal"
+
+    def __init__(self, borrow_context: Callable):
+        self.borrow_context = borrow_context
+
+    def listdir(self, path: str) -> list[str]:
+        with self.borrow_context() as context:
+            return context.listdir(path)
+
+    def scandir(self, path: str) -> dict[str, int]:
+        """List the entries of *path* together with their sizes with a
+        single request (readpp), if the gfal2 bindings support it.
+        """
+        with self.borrow_context() as context:
+            try:
+                directory = context.opendir(path)
+                sizes = dict()
+                while True:
+                    entry, info = directory.readpp()
+                    if entry is None:
+                        break
+                    sizes[entry.d_name] = info.st_size
+                return sizes
+            except AttributeError:
+                pass
+        return super().scandir(path)
+
+    def stat(self, path: str) -> Any:
+        with self.borrow_context() as context:
+            return context.stat(path)
+
+    def copy(self, source: str, target: str, overwrite: bool=True) -> None:
+        if source.startswith("/"):
+            source = f"file://{source}"
+        with self.borrow_context() as context:
+            params = context.transfer_parameters()
+            params.overwrite = overwrite
+            context.filecopy(params, source, target)
+
+    def download(self, source: str, target: str) -> None:
+        with self.borrow_context() as context:
+            params = context.transfer_parameters()
+            params.overwrite = True
+            context.filecopy(params, source, f"file://{os.path.abspath(target)}")
+
+    def unlink(self, paths: list[str]) -> list[Exception or None]:
+        """Remove the *paths* with the bulk unlink of gfal2. If the bulk
+        unlink is not supported, the files are removed one by one.
+        """
+        with self.borrow_context() as context:
+            try:
+                return list(context.unlink(paths))
+            except Exception:
+                pass
+        return super().unlink(paths)
+
+    def unlink_file(self, path: str) -> None:
+        with self.borrow_context() as context:
+            context.unlink(path)
+
+    def mkdir(self, path: str) -> None:
+        with self.borrow_context() as context:
+            context.mkdir_rec(path, 0)
+
+    def read(self, path: str, max_size: int=1024**2) -> bytes:
+        with self.borrow_context() as context:
+            return context.open(path, "r").read(max_size)
+
+
+class XRootDBackend(StorageBackend):
+    """Backend for root:// paths with the XRootD python bindings. One
+    client is used per server, the bindings are thread-safe.
+    """
+    name = "xrootd"
+
+    def __init__(self, timeout: int=300):
+        self.timeout = timeout
+        self.filesystems = dict()
+
+    @staticmethod
+    def split_url(url: str) -> tuple[str, str]:
+        """Split *url* into the server (root://host:port) and the path on
+        the server.
+        """
+        server, _, path = url[len("root://"):].partition("/")
+        return f"root://{server}", f"/{path.lstrip('/')}"
+
+    def filesystem(self, server: str):
+        fs = self.filesystems.get(server)
+        if fs is None:
+            fs = self.filesystems.setdefault(server, xrootd_client.FileSystem(server))
+        return fs
+
+    def check(self, status, path: str) -> None:
+        if not status.ok:
+            raise IOError(f"XRootD error for '{path}': {status.message}")
+
+    def listdir(self, path: str) -> list[str]:
+        server, remote_path = self.split_url(path)
+        status, listing = self.filesystem(server).dirlist(remote_path, timeout=self.timeout)
+        self.check(status, path)
+        return [x.name for x in listing]
+
+    def scandir(self, path: str) -> dict[str, int]:
+        server, remote_path = self.split_url(path)
+        status, listing = self.filesystem(server).dirlist(
+            remote_path, DirListFlags.STAT, timeout=self.timeout
+        )
+        self.check(status, path)
+        return {x.name: x.statinfo.size for x in listing}
+
+    def stat(self, path: str) -> StatResult:
+        server, remote_path = self.split_url(path)
+        status, info = self.filesystem(server).stat(remote_path, timeout=self.timeout)
+        self.check(status, path)
+        return StatResult(st_size=info.size, st_mtime=info.modtime)
+
+    def copy(self, source: str, target: str, overwrite: bool=True) -> None:
+        process = xrootd_client.CopyProcess()
+        process.add_job(source, target, force=overwrite, makedir=True)
+        self.check(process.prepare(), target)
+        status, results = process.run()
+        self.check(status, target)
+        for result in results:
+            self.check(result["status"], target)
+
+    def download(self, source: str, target: str) -> None:
+        self.copy(source, os.path.abspath(target))
+
+    def unlink_file(self, path: str) -> None:
+        server, remote_path = self.split_url(path)
+        status, _ = self.filesystem(server).rm(remote_path, timeout=self.timeout)
+        self.check(status, path)
+
+    def mkdir(self, path: str) -> None:
+        server, remote_path = self.split_url(path)
+        status, _ = self.filesystem(server).mkdir(
+            remote_path, MkDirFlags.MAKEPATH, timeout=self.timeout
+        )
+        self.check(status, path)
+
+    def read(self, path: str, max_size: int=1024**2) -> bytes:
+        with xrootd_client.File() as f:
+            self.check(f.open(path, timeout=self.timeout)[0], path)
+            status, data = f.read(offset=0, size=max_size, timeout=self.timeout)
+            self.check(status, path)
+            return data
+
+
+class StorageRouter(object):
+    """Select the backend for a path from its prefix:
+    - local paths ('/...' or 'file://...') use the class::`PosixBackend`
+    - 'root://' paths use the class::`XRootDBackend` if the XRootD python
+      bindings are available and gfal otherwise
+    - all other paths use the class::`GfalBackend`
+    Additionally, remote prefixes can be mapped to a local mount point with
+    meth::`add_local_mount`, e.g. the SRM prefix of T2_DESY to the /pnfs
+    mount on the NAF. Paths with such a prefix are accessed with the POSIX
+    backend. Mounts are read-only by default, i.e. files are still copied
+    and removed with the remote backends, since the mounts often do not
+    allow writing.
+    The router provides the same methods as the backends and translates the
+    paths accordingly.
+
+    Args:
+        borrow_context (Callable or None):  function to borrow a gfal2
+                                            context, no gfal backend if None
+        timeout (int, optional):            timeout in seconds of the XRootD
+                                            requests. Defaults to 300.
+    """
+    def __init__(
+        self,
+        borrow_context: Callable or None=None,
+        timeout: int=300,
+        verbosity: int=0,
+    ):
+        self.posix = PosixBackend()
+        self.gfal = GfalBackend(borrow_context) if borrow_context else None
+        self.xrootd = XRootDBackend(timeout=timeout) if xrootd_client else None
+        self.verbosity = verbosity
+        self.local_mounts = list()
+
+    def add_local_mount(
+        self,
+        remote_prefix: str,
+        local_prefix: str="",
+        probe: str or None=None,
+        writable: bool=False,
+    ) -> bool:
+        """Access all paths starting with *remote_prefix* via the local
+        path, in which *remote_prefix* is replaced with *local_prefix*. If
+        *probe* is given, the mount is only used if the local path of
+        *probe* (a path relative to the prefixes) is a directory, i.e. if
+        the storage is actually mounted on this node. If *writable* is
+        True, the mount is also used to copy, create and remove files.
+
+        Returns:
+            bool: True if the mount is used
+        """
+        if not remote_prefix:
+            return False
+        if probe is not None and not os.path.isdir(f"{local_prefix}{probe}"):
+            if self.verbosity >= 1:
+                print(f"'{local_prefix}{probe}' is not mounted, using remote access")
+            return False
+        # the longest prefixes are checked first
+        self.local_mounts.append((remote_prefix, local_prefix, writable))
+        self.local_mounts.sort(key=lambda x: len(x[0]), reverse=True)
+        if self.verbosity >= 1:
+            print(f"Accessing '{remote_prefix}' via local mount '{local_prefix or '/'}'")
+        return True
+
+    def resolve(self, path: str, write: bool=False) -> tuple[StorageBackend, str]:
+        """Return the backend for *path* and the path in the format of the
+        backend. If *write* is True, only writable mounts are considered.
+
+        Raises:
+            NotImplementedError: if no backend is available for *path*
+        """
+        for remote_prefix, local_prefix, writable in self.local_mounts:
+            if path.startswith(remote_prefix) and (writable or not write):
+                return self.posix, local_prefix + path[len(remote_prefix):]
+        if path.startswith("/") or path.startswith("file://"):
+            return self.posix, path
+        if path.startswith("root://") and self.xrootd:
+            return self.xrootd, path
+        if self.gfal:
+            return self.gfal, path
+        raise NotImplementedError(f"No storage backend available for '{path}', is gfal2 installed?")
+
+    def is_available(self, path: str) -> bool:
+        try:
+            self.resolve(path)
+        except NotImplementedError:
+            return False
+        return True
+
+    def listdir(self, path: str) -> list[str]:
+        backend, backend_path = self.resolve(path)
+        return backend.listdir(backend_path)
+
+    def scandir(self, path: str) -> dict[str, int]:
+        backend, backend_path = self.resolve(path)
+        return backend.scandir(backend_path)
+
+    def stat(self, path: str) -> Any:
+        backend, backend_path = self.resolve(path)
+        return backend.stat(backend_path)
+
+    def copy(self, source: str, target: str, overwrite: bool=True) -> None:
+        """Copy the local file *source* to *target*."""
+        backend, backend_target = self.resolve(target, write=True)
+        backend.copy(os.path.abspath(self.posix.local_path(source)), backend_target, overwrite=overwrite)
+
+    def download(self, source: str, target: str) -> None:
+        """Copy *source* to the local file *target*."""
+        backend, backend_source = self.resolve(source)
+        backend.download(backend_source, target)
+
+    def mkdir(self, path: str) -> None:
+        backend, backend_path = self.resolve(path, write=True)
+        backend.mkdir(backend_path)
+
+    def read(self, path: str, max_size: int=1024**2) -> bytes:
+        backend, backend_path = self.resolve(path)
+        return backend.read(backend_path, max_size=max_size)
+
+    def unlink(self, paths: list[str]) -> list[Exception or None]:
+        """Remove all *paths*. The paths are grouped by their backend, such
+        that bulk operations can be used. Returns the error for every path
+        (None if the path was removed).
+        """
+        groups = dict()
+        errors = [None]*len(paths)
+        for i, path in enumerate(paths):
+            try:
+                backend, backend_path = self.resolve(path, write=True)
+            except NotImplementedError as e:
+                errors[i] = e
+                continue
+            groups.setdefault(backend, []).append((i, backend_path))
+        for backend, items in groups.items():
+            results = backend.unlink([x[1] for x in items])
+            for (i, _), error in zip(items, results):
+                errors[i] = error
+        return errors
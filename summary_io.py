@@ -0,0 +1,188 @@
+import os
+import json
+
+from typing import Any
+from collections.abc import Iterable
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+SUMMARY_FORMATS = ["json", "parquet"]
+
+# scalar columns of the summary and the entries in the sample dictionaries,
+# see check_crab_jobs.build_meta_info_table
+COUNT_COLUMNS = [
+    "das_total", "total", "sum_events", "done", "outputs from failed jobs",
+    "missing", "unchecked", "n_outputs", "median_output_size", "median_output_events",
+    "recommended_units_per_job",
+]
+LIST_COLUMNS = [
+    "time_stamps", "total_lfns", "done_lfns", "missing_lfns", "failed_outputs",
+]
+# the time stamps contain an empty list for every crab directory without new
+# outputs, which is stored as null in the 'parquet' format
+EMPTY_ENTRY_COLUMNS = [
+    "time_stamps",
+]
+# lists of numbers, e.g. the histogram of the output sizes
+# (see module::`output_profile`)
+NUMBER_LIST_COLUMNS = [
+    "output_size_histogram",
+]
+
+
+def summary_path(path: str, summary_format: str) -> str:
+    """Replace the extension of *path* with the one of *summary_format*."""
+    return f"{os.path.splitext(path)[0]}.{summary_format}"
+
+
+def require_pyarrow() -> None:
+    if not pa:
+        raise NotImplementedError(
+            "The parquet format for summaries requires pyarrow. Install it with "
+            "'python3 -m pip install --user pyarrow'"
+        )
+
+
+class SummaryWriter(object):
+    """Streaming writer for summaries of crab jobs, i.e. dictionaries of
+    format {sample_name: sample_dict}. The samples are added one by one with
+    meth::`write`.
+    For the 'parquet' format, every sample is written as its own row group
+    directly. Thus, the readers can load a single sample without parsing
+    the rest of the file, see class::`SummaryReader`. For the 'json' format,
+    the samples are collected and written when the writer is closed.
+    """
+    def __init__(self, path: str, summary_format: str="json"):
+        if summary_format not in SUMMARY_FORMATS:
+            raise ValueError(f"Unknown summary format '{summary_format}'")
+        if summary_format == "parquet":
+            require_pyarrow()
+        self.path = path
+        self.summary_format = summary_format
+        self.samples = dict()
+        self.writer = None
+
+    def __enter__(self) -> "SummaryWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def schema():
+        return pa.schema(
+            [pa.field("sample", pa.string())]
+            + [pa.field(x, pa.int64()) for x in COUNT_COLUMNS]
+            + [pa.field(x, pa.list_(pa.string())) for x in LIST_COLUMNS]
+            + [pa.field(x, pa.list_(pa.int64())) for x in NUMBER_LIST_COLUMNS]
+        )
+
+    def write(self, sample_name: str, sample_dict: dict[str, Any]) -> None:
+        if self.summary_format == "json":
+            self.samples[sample_name] = sample_dict
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, self.schema())
+        row = {"sample": [sample_name]}
+        row.update({x: [sample_dict.get(x)] for x in COUNT_COLUMNS})
+        row.update({x: [sample_dict.get(x)] for x in LIST_COLUMNS})
+        for x in EMPTY_ENTRY_COLUMNS:
+            if row[x][0] is not None:
+                row[x] = [[y if y != [] else None for y in row[x][0]]]
+        row.update({x: [sample_dict.get(x)] for x in NUMBER_LIST_COLUMNS})
+        self.writer.write_table(pa.Table.from_pydict(row, schema=self.schema()))
+
+    def close(self) -> None:
+        if self.summary_format == "json":
+            with open(self.path, "w") as f:
+                json.dump(self.samples, f, indent=4)
+        elif self.writer is None:
+            # make sure that there is a valid file even without samples
+            pq.write_table(self.schema().empty_table(), self.path)
+        else:
+            self.writer.close()
+            self.writer = None
+
+
+def write_summary(
+    summary: dict[str, dict[str, Any]],
+    path: str,
+    summary_format: str="json",
+) -> None:
+    with SummaryWriter(path, summary_format=summary_format) as writer:
+        for sample_name, sample_dict in summary.items():
+            writer.write(sample_name, sample_dict)
+
+
+class SummaryReader(object):
+    """Lazy reader for summaries in the 'parquet' format, see
+    class::`SummaryWriter`. Only the file footer is read when the reader is
+    created, which is enough to know which row group belongs to which
+    sample. The information for a sample is loaded when it is accessed, and
+    only the *columns* are read (all columns if None). The reader behaves
+    like the read-only dictionary {sample_name: sample_dict}.
+    """
+    def __init__(self, path: str, columns: Iterable[str] or None=None):
+        require_pyarrow()
+        self.path = path
+        self.file = pq.ParquetFile(path)
+        self.columns = list(columns) if columns else None
+        self.index = dict()
+        sample_column = self.file.schema_arrow.get_field_index("sample")
+        for i in range(self.file.metadata.num_row_groups):
+            if self.file.metadata.row_group(i).num_rows == 0:
+                continue
+            statistics = self.file.metadata.row_group(i).column(sample_column).statistics
+            if statistics is not None and statistics.has_min_max:
+                self.index[statistics.min] = i
+            else:
+                # no statistics, so read the sample column of this row group
+                samples = self.file.read_row_group(i, columns=["sample"])
+                self.index[samples.column("sample")[0].as_py()] = i
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __contains__(self, sample_name: str) -> bool:
+        return sample_name in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def __getitem__(self, sample_name: str) -> dict[str, Any]:
+        table = self.file.read_row_group(self.index[sample_name], columns=self.columns)
+        row = table.to_pylist()[0]
+        row.pop("sample", None)
+        for x in EMPTY_ENTRY_COLUMNS:
+            if row.get(x) is not None:
+                row[x] = [y if y is not None else [] for y in row[x]]
+        # entries that were not set for this sample are not part of the dict
+        return {key: value for key, value in row.items() if value is not None}
+
+    def get(self, sample_name: str, default: Any=None) -> dict[str, Any] or Any:
+        return self[sample_name] if sample_name in self else default
+
+    def items(self):
+        return ((x, self[x]) for x in self)
+
+
+def load_summary(
+    path: str,
+    columns: Iterable[str] or None=None,
+) -> dict[str, dict[str, Any]] or SummaryReader:
+    """Load the summary at *path*. The format is determined from the file
+    extension: '.parquet' files are read lazily (see class::`SummaryReader`),
+    all other files are read as .json.
+    """
+    if path.endswith(".parquet"):
+        return SummaryReader(path, columns=columns)
+    with open(path) as f:
+        return json.load(f)
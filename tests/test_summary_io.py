@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+
+import pytest
+
+thisdir = os.path.dirname(os.path.abspath(__file__))
+base_dir = os.path.dirname(thisdir)
+if base_dir not in sys.path:
+    sys.path.append(base_dir)
+
+pytest.importorskip("pyarrow")
+
+from summary_io import load_summary, write_summary
+
+SUMMARY = os.path.join(base_dir, "timestamps_2016_HIPM", "crab_job_summary_TTX.json")
+
+
+def test_json_parquet_round_trip(tmp_path):
+    with open(SUMMARY) as f:
+        summary = json.load(f)
+    # the summary contains crab directories without new outputs
+    assert any([] in x.get("time_stamps", []) for x in summary.values())
+
+    parquet_path = str(tmp_path / "summary.parquet")
+    write_summary(summary, parquet_path, summary_format="parquet")
+    loaded = load_summary(parquet_path)
+    assert {x: loaded[x] for x in loaded} == summary
+
+    json_path = str(tmp_path / "summary.json")
+    write_summary({x: loaded[x] for x in loaded}, json_path, summary_format="json")
+    assert load_summary(json_path) == summary
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+
+from functools import wraps
+from contextlib import contextmanager
+from typing import Any, Callable
+
+
+class Tracer(object):
+    """Opt-in instrumentation of the phases of the scripts. Every phase is
+    wrapped in a span (see meth::`span`), which is recorded as complete
+    event in the Chrome trace format, such that the trace can be inspected
+    with chrome://tracing or https://ui.perfetto.dev.
+    The tracer is disabled by default, in which case the spans do nothing.
+    Spans of worker processes can be collected with meth::`collect` and
+    merged into the tracer of the main process with meth::`merge`.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.events = list()
+        self.__lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name: str, category: str="", **attributes):
+        """Record the time spent in the context as span *name* of category
+        *category*. The *attributes* (e.g. the sample name) are added to the
+        arguments of the event.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start*1e6,
+                "dur": (end-start)*1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {key: str(value) for key, value in attributes.items()},
+            }
+            with self.__lock:
+                self.events.append(event)
+
+    def traced(self, name: str or None=None, category: str="") -> Callable:
+        """Decorator to record every call of a function as span."""
+        def decorator(function):
+            span_name = name if name else function.__name__
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, category=category):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def collect(self) -> list[dict[str, Any]]:
+        """Return the recorded events and clear them."""
+        with self.__lock:
+            events = self.events
+            self.events = list()
+        return events
+
+    def merge(self, events: list[dict[str, Any]]) -> None:
+        with self.__lock:
+            self.events += events
+
+    def write(self, path: str) -> None:
+        with self.__lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self) -> list[tuple[str, str, int, float, float]]:
+        """Summarize the wall time per span name. Nested spans are included
+        in the time of their parents.
+
+        Returns:
+            list[tuple]:    (name, category, calls, total time in s, maximum
+                            time in s), sorted by the total time
+        """
+        summary = dict()
+        with self.__lock:
+            for event in self.events:
+                key = (event["name"], event["cat"])
+                calls, total, maximum = summary.get(key, (0, 0., 0.))
+                duration = event["dur"]/1e6
+                summary[key] = (calls+1, total+duration, max(maximum, duration))
+        return sorted(
+            [key + values for key, values in summary.items()],
+            key=lambda x: x[3],
+            reverse=True,
+        )
+
+    def print_summary(self) -> None:
+        headerparts = ["{: ^24}".format(x) for x in
+            ["Phase", "Category", "Calls", "Total [s]", "Max [s]"]
+        ]
+        lines = ["| {} |".format(" | ".join(headerparts))]
+        lines += ["| {} |".format(" | ".join(["---"]*len(headerparts)))]
+        for name, category, calls, total, maximum in self.summary():
+            lines.append("| {} |".format(" | ".join(
+                ["{: ^24}".format(x) for x in
+                    [name, category, calls, f"{total:.3f}", f"{maximum:.3f}"]
+                ]
+            )))
+        print("\n".join(lines))
+
+
+# global tracer that is shared by all modules
+tracer = Tracer()
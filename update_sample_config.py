@@ -1,11 +1,18 @@
 import os
 import sys
-import yaml
 import json
+import yaml
 from tqdm import tqdm
 
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 
+thisdir = os.path.realpath(os.path.dirname(__file__))
+
+if not thisdir in sys.path:
+    sys.path.append(thisdir)
+
+from summary_io import load_summary
+
 
 def update_config(sample_dict, meta_info):
     pbar_samples = tqdm(meta_info)
@@ -19,15 +26,58 @@ def update_config(sample_dict, meta_info):
             print(e)
             print("skipping")
 
-def main(*args, configpath, new_configpath, meta_info_jsons, **kwargs):
+def update_splitting(sample_dict, recommendations, only_undersized=False):
+    """Set the recommended 'unitsPerJob' (see check_crab_jobs.py
+    --size-profile) for all samples in *sample_dict*. Samples with the
+    default of one input file per job do not need an explicit entry.
+    """
+    for sample, recommendation in recommendations.items():
+        if not sample in sample_dict:
+            continue
+        if only_undersized and not recommendation.get("undersized"):
+            continue
+        units = recommendation["unitsPerJob"]
+        print(f"Setting unitsPerJob for {sample} to {units}")
+        entry = sample_dict[sample]
+        if isinstance(entry, str):
+            # samples can be given by their DAS key only, so convert the
+            # entry to a dictionary to add the splitting
+            if units <= 1:
+                continue
+            entry = {"inputDataset": entry}
+            sample_dict[sample] = entry
+        if not isinstance(entry, dict):
+            print(f"Cannot set unitsPerJob for {sample}, skipping")
+            continue
+        if units > 1:
+            entry["unitsPerJob"] = units
+        else:
+            entry.pop("unitsPerJob", None)
+
+def main(
+    *args,
+    configpath,
+    new_configpath,
+    meta_info_jsons,
+    splitting_json=None,
+    only_undersized=False,
+    **kwargs,
+):
 
     # open sample config
     with open(configpath) as f:
         sample_dict = yaml.load(f, yaml.Loader)
     
+    if splitting_json:
+        with open(splitting_json) as f:
+            recommendations = json.load(f)["samples"]
+        update_splitting(
+            sample_dict, recommendations, only_undersized=only_undersized,
+        )
+
     for info in meta_info_jsons:
-        with open(info) as f:
-            this_meta_info = json.load(f)
+        # only the time stamps are needed for the update
+        this_meta_info = load_summary(info, columns=["time_stamps"])
         
         update_config(sample_dict, this_meta_info)
     
@@ -63,12 +113,39 @@ def parse_arguments():
     parser.add_argument("meta_info_jsons",
         help=" ".join(
             """
-            path to json files containing info about fully done jobs
+            path to summary files (.json or .parquet) containing info
+            about fully done jobs
             """.split()
         ),
         metavar="path/to/summary*.json",
-        nargs="+",
+        nargs="*",
+        type=str,
+    )
+
+    parser.add_argument("--splitting-json",
+        help=" ".join(
+            """
+            path to the recommended splitting created with
+            `check_crab_jobs.py --size-profile`. The recommended unitsPerJob
+            are written to the samples in the config
+            """.split()
+        ),
+        dest="splitting_json",
+        metavar="path/to/splitting_recommendations.json",
         type=str,
+        default=None,
+    )
+
+    parser.add_argument("--only-undersized",
+        help=" ".join(
+            """
+            only update the splitting of samples that were marked as
+            undersized. Only used with `--splitting-json`
+            """.split()
+        ),
+        action="store_true",
+        default=False,
+        dest="only_undersized",
     )
 
     args = parser.parse_args()
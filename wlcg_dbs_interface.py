@@ -1,7 +1,7 @@
 import os
+import re
 import sys
-import yaml
-import json
+import time
 import uproot as up
 import numpy as np
 
@@ -13,25 +13,368 @@ except ImportError as e:
     print("gfal will be disabled!")
     gfal2 = None
 
+# the XRootD python bindings allow reading files at an offset, which is used
+# to resume aborted downloads
+try:
+    from XRootD import client as xrootd_client
+except ImportError:
+    xrootd_client = None
+
 
 
-from subprocess import PIPE, Popen
 from itertools import chain
 from typing import Any
+from collections.abc import Iterable
+from queue import Queue, Empty
+from threading import Lock, local
+from contextlib import contextmanager
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, as_completed,
+)
 from tqdm import tqdm
 from RunKit.envToJson import get_cmsenv
 
+from dbs_cache import DBSCache, normalize_file_info
+from dbs_file_list import DBSFileTable
+from das_client import DASClient, DAS_FIELDS
+from sample_catalog import SampleCatalog
+from event_sidecar import sidecar_path, is_sidecar, parse_sidecar
+from lfn_index import lfn_set_like
+from storage_backends import StorageRouter
+from tracing import tracer
+
+
+def count_events_in_file(
+    remote_file: str,
+    treename: str="Events",
+    timeout: int=60,
+    retries: int=0,
+) -> tuple[int, str or None]:
+    """Open *remote_file* with uproot and return the number of entries in
+    tree *treename*. The file is opened at most 1 + *retries* times.
+    This is a module-level function such that it can also be used in a
+    process pool.
+
+    Args:
+        remote_file (str): path to the file, e.g. 'root://...'
+        treename (str, optional): name of the tree. Defaults to "Events".
+        timeout (int, optional): timeout in seconds for opening the file.
+                                    Defaults to 60.
+        retries (int, optional): number of additional attempts. Defaults to 0.
+
+    Returns:
+        tuple[int, str or None]:    number of entries and error message of
+                                    the last attempt (None if successful)
+    """
+    error = None
+    for _ in range(retries+1):
+        try:
+            with up.open(remote_file, timeout=timeout) as f:
+                return f[treename].num_entries, None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return 0, error
+
+
+class GfalContextPool(object):
+    """Small pool of gfal2 contexts that can be shared between threads.
+    gfal2 contexts should not be used by several threads at the same time,
+    so every thread borrows its own context from the pool and returns it
+    afterwards. Contexts are created lazily up to *size* and are configured
+    with a per-request timeout of *timeout* seconds.
+    """
+    def __init__(self, size: int=8, timeout: int=300):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.__contexts = Queue()
+        self.__n_created = 0
+        self.__lock = Lock()
+
+    def create_context(self):
+        context = gfal2.creat_context()
+        # not all plugins know all options, so try them one by one
+        for plugin, option in [
+            ("CORE", "NAMESPACE_TIMEOUT"),
+            ("CORE", "CHECKSUM_TIMEOUT"),
+            ("SRM PLUGIN", "OPERATION_TIMEOUT"),
+            ("XROOTD PLUGIN", "OPERATION_TIMEOUT"),
+        ]:
+            try:
+                context.set_opt_integer(plugin, option, int(self.timeout))
+            except Exception:
+                pass
+        return context
+
+    @contextmanager
+    def context(self):
+        """Borrow a gfal2 context from the pool. If all contexts are in use
+        and the pool is not full yet, a new context is created. Otherwise,
+        wait until a context is returned to the pool.
+        """
+        context = None
+        try:
+            context = self.__contexts.get_nowait()
+        except Empty:
+            with self.__lock:
+                if self.__n_created < self.size:
+                    context = self.create_context()
+                    self.__n_created += 1
+            if context is None:
+                context = self.__contexts.get()
+        try:
+            yield context
+        finally:
+            self.__contexts.put(context)
+
+
+class RemoteListingEngine(object):
+    """Engine to list remote WLCG directories with bounded concurrency.
+    Listings are submitted to a thread pool and cached by path, such that
+    directories can be queued early (e.g. for all blocks, suffices and samples)
+    and collected later when they are actually needed. The directories are
+    accessed with the backend that *storage* selects for the path (see
+    class::`StorageRouter`), so directories on a local mount are listed
+    directly. Every request is limited by the timeout of the backend (see
+    meth::`WLCGInterface.setup_listing_engine`), such that a single slow
+    storage door cannot stall the complete check. Waiting for the results
+    is not limited additionally, since listings can be queued for a long
+    time before they actually start.
+    If *record_sizes* is True, the sizes of the files are obtained together
+    with the listing and can be collected with meth::`collect_sizes`.
+    """
+    def __init__(
+        self,
+        storage: StorageRouter,
+        max_workers: int=8,
+        verbosity: int=0,
+        record_sizes: bool=False,
+    ):
+        self.storage = storage
+        self.verbosity = verbosity
+        self.record_sizes = record_sizes
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self.__futures = dict()
+        self.__sizes = dict()
+        self.__lock = Lock()
+
+    def list_directory(self, wlcg_path: str) -> list[str]:
+        if not self.record_sizes:
+            filelist = self.storage.listdir(wlcg_path)
+            return [os.path.join(wlcg_path, x) for x in filelist]
+        sizes = {
+            os.path.join(wlcg_path, x): size
+            for x, size in self.storage.scandir(wlcg_path).items()
+        }
+        with self.__lock:
+            self.__sizes[wlcg_path] = sizes
+        return list(sizes)
+
+    def submit(self, wlcg_path: str):
+        """Queue the listing of *wlcg_path* if it is not known yet and
+        return the corresponding future.
+        """
+        with self.__lock:
+            future = self.__futures.get(wlcg_path)
+            if future is None:
+                future = self.executor.submit(self.list_directory, wlcg_path)
+                self.__futures[wlcg_path] = future
+        return future
+
+    def submit_many(self, wlcg_paths: list[str]) -> None:
+        for path in wlcg_paths:
+            self.submit(path)
+
+    def collect(self, wlcg_paths: list[str]) -> dict[str, list[str]]:
+        """Collect the listings for all *wlcg_paths*. Paths that were not
+        submitted before are queued first, so that all listings run
+        concurrently. Listings that fail or time out are not part of the
+        result, since an empty list would mark all outputs as missing.
+
+        Args:
+            wlcg_paths (list[str]): list of remote directories to list
+
+        Returns:
+            dict[str, list[str]]:   Dictionary of format {wlcg_path: list_of_files}
+                                    for all paths that could be listed
+        """
+        futures = {path: self.submit(path) for path in wlcg_paths}
+        listings = dict()
+        for path, future in futures.items():
+            try:
+                listings[path] = future.result()
+            except Exception as e:
+                print(f"unable to load files from {path}, skipping")
+                if self.verbosity >= 1:
+                    print(e)
+                # don't keep the failed listing, such that it can be retried
+                self.forget([path])
+        return listings
+
+    def stat_directory(self, wlcg_path: str) -> float:
+        return self.storage.stat(wlcg_path).st_mtime
+
+    def collect_mtimes(self, wlcg_paths: list[str]) -> dict[str, float or None]:
+        """Obtain the modification times of all *wlcg_paths* concurrently.
+        Paths that cannot be accessed (e.g. due to a timeout) map to None.
+        """
+        futures = {
+            path: self.executor.submit(self.stat_directory, path)
+            for path in wlcg_paths
+        }
+        mtimes = dict()
+        for path, future in futures.items():
+            try:
+                mtimes[path] = future.result()
+            except Exception as e:
+                if self.verbosity >= 1:
+                    print(f"unable to stat {path}: {e}")
+                mtimes[path] = None
+        return mtimes
+
+    def collect_sizes(self, paths: Iterable[str]) -> dict[str, int]:
+        """Return the sizes of the files *paths*. Sizes that are not known
+        from the listings are obtained concurrently with a stat call, files
+        that cannot be accessed are skipped.
+        """
+        paths = set(paths)
+        sizes = dict()
+        with self.__lock:
+            for block_sizes in self.__sizes.values():
+                sizes.update((x, size) for x, size in block_sizes.items() if x in paths)
+        futures = {
+            path: self.executor.submit(self.storage.stat, path)
+            for path in paths.difference(sizes)
+        }
+        for path, future in futures.items():
+            try:
+                sizes[path] = future.result().st_size
+            except Exception as e:
+                if self.verbosity >= 1:
+                    print(f"unable to stat {path}: {e}")
+        return sizes
+
+    def shutdown(self) -> None:
+        """Stop the thread pool of the engine and drop all cached listings.
+        Listings that are already running are not waited for.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.__lock:
+            self.__futures.clear()
+            self.__sizes.clear()
+
+    def forget(self, wlcg_paths: list[str]) -> None:
+        """Remove cached listings for *wlcg_paths* to free memory."""
+        with self.__lock:
+            for path in wlcg_paths:
+                self.__futures.pop(path, None)
+                self.__sizes.pop(path, None)
+
+
+class RedirectorManager(object):
+    """Manager to rank XRootD redirectors by their success rate and latency.
+    The redirectors are probed concurrently with a stat call on a file and
+    the ranking is kept for the session. The probes are repeated every
+    *refresh_interval* seconds. Additionally, every transfer reports whether
+    it was successful, such that a redirector that fails moves down in the
+    ranking immediately.
+    """
+    def __init__(
+        self,
+        redirectors: list[str],
+        borrow_context=None,
+        refresh_interval: float=1800,
+        verbosity: int=0,
+    ):
+        # remove duplicates but keep the order as fallback for the ranking
+        self.redirectors = list(dict.fromkeys(redirectors))
+        self.borrow_context = borrow_context
+        self.refresh_interval = refresh_interval
+        self.verbosity = verbosity
+        self.stats = {
+            r: {"latency": None, "successes": 0, "failures": 0}
+            for r in self.redirectors
+        }
+        self.last_probe = None
+        self.__lock = Lock()
+        self.__probe_lock = Lock()
+
+    def record_success(self, redirector: str, latency: float or None=None) -> None:
+        with self.__lock:
+            stats = self.stats[redirector]
+            stats["successes"] += 1
+            if latency is not None:
+                # use a moving average such that the latency can adapt
+                stats["latency"] = (latency if stats["latency"] is None
+                                    else 0.7*stats["latency"] + 0.3*latency)
+
+    def record_failure(self, redirector: str) -> None:
+        with self.__lock:
+            self.stats[redirector]["failures"] += 1
+
+    def probe_redirector(self, redirector: str, lfn: str) -> None:
+        url = f"root://{redirector}//{lfn}"
+        start = time.time()
+        try:
+            with self.borrow_context() as context:
+                context.stat(url)
+            self.record_success(redirector, latency=time.time() - start)
+        except Exception as e:
+            if self.verbosity >= 1:
+                print(f"probe of redirector {redirector} failed: {e}")
+            self.record_failure(redirector)
+
+    def probe(self, lfn: str) -> None:
+        """Probe all redirectors concurrently with a stat call on *lfn*."""
+        with ThreadPoolExecutor(max_workers=len(self.redirectors)) as executor:
+            list(executor.map(
+                lambda r: self.probe_redirector(r, lfn), self.redirectors
+            ))
+
+    def ranked(self, lfn: str or None=None) -> list[str]:
+        """Return the redirectors ordered by failure rate and latency.
+        If the last probe is older than the refresh interval (or there was
+        no probe yet), the redirectors are probed with *lfn* first.
+        """
+        # only one thread probes the redirectors, the others use the
+        # current ranking in the meantime
+        with self.__probe_lock:
+            needs_probe = bool(lfn and self.borrow_context and (
+                self.last_probe is None
+                or time.time() - self.last_probe > self.refresh_interval
+            ))
+            if needs_probe:
+                self.last_probe = time.time()
+        if needs_probe:
+            self.probe(lfn)
+
+        def sort_key(redirector):
+            stats = self.stats[redirector]
+            n_tries = stats["successes"] + stats["failures"]
+            failure_rate = stats["failures"]/n_tries if n_tries > 0 else 0
+            latency = stats["latency"] if stats["latency"] is not None else float("inf")
+            return (failure_rate, latency, self.redirectors.index(redirector))
+
+        with self.__lock:
+            return sorted(self.redirectors, key=sort_key)
+
 
 class WLCGInterface(object):
     def __init__(self,
         # wlcg_path: str or None=None,
         # route_url: str or None=None,
         verbosity: int=0,
+        max_workers: int=8,
+        timeout: int=300,
     ):
         # self.wlcg_path = wlcg_path
         # self.route_url = route_url
         self.__verbosity = verbosity
         # setup gfal context
+        self.context_pool = None
+        # the listing engine is created on first use (or explicitly with
+        # setup_listing_engine), such that its pools are only built once
+        self.__listing_engine = None
+        self.__listing_settings = {"max_workers": max_workers, "timeout": timeout}
         try:
             # create gfal context
             if not gfal2:
@@ -41,15 +384,40 @@ class WLCGInterface(object):
         except NotImplementedError as e:
             print(e)
             self.gfal_context = None
+        # local paths and mounted storage are accessed directly, all other
+        # paths with gfal (see setup_local_mount)
+        self.storage = StorageRouter(
+            borrow_context=self.borrow_context if self.gfal_context else None,
+            timeout=timeout,
+            verbosity=verbosity,
+        )
+        # the blocks of a dataset are listed concurrently with one DbsApi
+        # per thread, see thread_dbs_api
+        self.dbs_workers = 8
+        self.dbs_api_factory = None
+        self.__dbs_local = local()
         self.dbs_api = self.setup_dbs_api()
+        self.dbs_cache = None
+        # summary information from DAS, which is used if DBS is not available
+        self.das_client = DASClient(verbosity=verbosity)
         self.xrtd_redirectors = [
             "cms-xrd-global.cern.ch",
             "xrootd-cms.infn.it",
             "cmsxrootd.fnal.gov",
-            "xrootd-cms.infn.it"
         ]
+        self.redirector_manager = RedirectorManager(
+            redirectors=self.xrtd_redirectors,
+            borrow_context=self.borrow_context if self.gfal_context else None,
+            verbosity=verbosity,
+        )
+        # timeout in seconds for the requests of a download with XRootD,
+        # see resume_xrootd_download
+        self.transfer_timeout = 600
         # cmssw environment information in case crab needs to be called
         self.cmsswEnv = None
+        # the environment is loaded on first use, possibly by several threads
+        self.__cmssw_env_lock = Lock()
+        self.setup_event_counting()
 
 
     @property
@@ -60,15 +428,59 @@ class WLCGInterface(object):
     @verbosity.setter
     def verbosity(self, val: int):
         self.__verbosity = val
+        if self.__listing_engine:
+            self.__listing_engine.verbosity = val
+        self.storage.verbosity = val
+        self.das_client.verbosity = val
+        self.redirector_manager.verbosity = val
 
-    
+    @property
+    def listing_engine(self):
+        """Engine to list remote directories, see meth::`setup_listing_engine`.
+        If it was not set up explicitly, it is created with the settings
+        given to the constructor.
+        """
+        if self.__listing_engine is None:
+            self.setup_listing_engine(**self.__listing_settings)
+        return self.__listing_engine
+
+    def setup_listing_engine(
+        self,
+        max_workers: int=8,
+        timeout: int=300,
+        record_sizes: bool=False,
+    ):
+        """Create the pool of gfal contexts and the engine to list remote
+        directories concurrently. The pool holds at most *max_workers*
+        contexts, each with a per-request timeout of *timeout* seconds, which
+        also applies to the requests with XRootD.
+        Without gfal2, the engine can only list local directories.
+        If *record_sizes* is True, the file sizes are obtained with the
+        listings, see meth::`get_output_sizes`.
+        An engine that was created before is shut down.
+        """
+        if self.__listing_engine is not None:
+            self.__listing_engine.shutdown()
+        self.__listing_settings = {"max_workers": max_workers, "timeout": timeout}
+        if gfal2:
+            self.context_pool = GfalContextPool(size=max_workers, timeout=timeout)
+        if self.storage.xrootd:
+            self.storage.xrootd.timeout = timeout
+        self.__listing_engine = RemoteListingEngine(
+            storage=self.storage,
+            max_workers=max_workers,
+            verbosity=self.verbosity,
+            record_sizes=record_sizes,
+        )
 
     def getCmsswEnv(self):
-        if self.cmsswEnv is None:
-            cmssw_path = os.environ['DEFAULT_CMSSW_BASE']
-            self.cmsswEnv = get_cmsenv(cmssw_path, crab_env=True)
-            self.cmsswEnv['X509_USER_PROXY'] = os.environ['X509_USER_PROXY']
-            self.cmsswEnv['HOME'] = os.environ['HOME'] if 'HOME' in os.environ else os.getcwd()
+        with self.__cmssw_env_lock:
+            if self.cmsswEnv is None:
+                cmssw_path = os.environ['DEFAULT_CMSSW_BASE']
+                cmssw_env = get_cmsenv(cmssw_path, crab_env=True)
+                cmssw_env['X509_USER_PROXY'] = os.environ['X509_USER_PROXY']
+                cmssw_env['HOME'] = os.environ['HOME'] if 'HOME' in os.environ else os.getcwd()
+                self.cmsswEnv = cmssw_env
         return self.cmsswEnv
 
 
@@ -82,6 +494,7 @@ class WLCGInterface(object):
         try:
             from dbs.apis.dbsClient import DbsApi
             
+            self.dbs_api_factory = lambda: DbsApi(url=cms_dbs_url)
             return DbsApi(url=cms_dbs_url)
         except:
             print("WARNING: Could not find dbs3 module. Did you install it with")
@@ -90,6 +503,107 @@ class WLCGInterface(object):
             print("Will use dasgoclient as fallback instead")
             return None
 
+    def setup_local_mount(
+        self,
+        remote_prefix: str,
+        local_prefix: str="",
+        probe: str or None=None,
+        writable: bool=False,
+    ) -> bool:
+        """Access all remote paths starting with *remote_prefix* via the
+        local mount *local_prefix*, e.g. the SRM prefix of T2_DESY via the
+        /pnfs mount of the NAF. If *probe* is given, the mount is only used
+        if this directory exists locally, see
+        meth::`StorageRouter.add_local_mount`.
+        """
+        return self.storage.add_local_mount(
+            remote_prefix=remote_prefix,
+            local_prefix=local_prefix,
+            probe=probe,
+            writable=writable,
+        )
+
+    @contextmanager
+    def borrow_context(self):
+        """Borrow a gfal2 context from the shared context pool, such that
+        the transfers can be used from several threads. Falls back to the
+        default context if there is no pool.
+        """
+        if self.context_pool:
+            with self.context_pool.context() as context:
+                yield context
+        else:
+            yield self.gfal_context
+
+    @tracer.traced("download", category="transfer")
+    def download_lfn(
+        self,
+        lfn: str,
+        target: str,
+        resume: bool=True,
+        chunk_size: int=64*1024**2,
+    ) -> None:
+        """Download the file *lfn* to the local path *target* using the
+        redirectors starting with the fastest working one. If *resume* is
+        True and the XRootD python bindings are available, an existing file
+        at *target* is treated as the beginning of the remote file and only
+        the remaining bytes are downloaded. Otherwise, the file is copied
+        with gfal and an existing file is overwritten.
+
+        Raises:
+            IOError: if the file could not be downloaded from any redirector
+        """
+        target = os.path.abspath(target)
+        for route_url in self.redirector_manager.ranked(lfn=lfn):
+            url = f"root://{route_url}//{lfn}"
+            try:
+                if resume and xrootd_client:
+                    self.resume_xrootd_download(url, target, chunk_size=chunk_size)
+                else:
+                    with self.borrow_context() as context:
+                        params = context.transfer_parameters()
+                        params.overwrite = True
+                        context.filecopy(params, url, f"file://{target}")
+                self.redirector_manager.record_success(route_url)
+                return
+            except Exception as e:
+                print(e)
+                self.redirector_manager.record_failure(route_url)
+        raise IOError(f"Unable to copy file '{lfn}' to '{target}'")
+
+    def resume_xrootd_download(
+        self,
+        url: str,
+        target: str,
+        chunk_size: int=64*1024**2,
+    ) -> None:
+        with xrootd_client.File() as remote_file:
+            status, _ = remote_file.open(url, timeout=self.transfer_timeout)
+            if not status.ok:
+                raise IOError(f"Could not open '{url}': {status.message}")
+            status, info = remote_file.stat(timeout=self.transfer_timeout)
+            if not status.ok:
+                raise IOError(f"Could not stat '{url}': {status.message}")
+            offset = os.path.getsize(target) if os.path.exists(target) else 0
+            if offset > info.size:
+                # this cannot be the beginning of the remote file
+                offset = 0
+            if self.verbosity >= 1 and offset > 0:
+                print(f"resuming download of '{url}' at byte {offset}")
+            with open(target, "r+b" if offset > 0 else "wb") as f:
+                f.seek(offset)
+                f.truncate()
+                while offset < info.size:
+                    status, data = remote_file.read(
+                        offset, chunk_size, timeout=self.transfer_timeout
+                    )
+                    if not status.ok:
+                        raise IOError(f"Could not read '{url}': {status.message}")
+                    if not data:
+                        raise IOError(f"Unexpected end of file '{url}'")
+                    f.write(data)
+                    offset += len(data)
+
     def get_remote_file(
         self,
         filepath:str ,
@@ -98,23 +612,19 @@ class WLCGInterface(object):
         enforce_success: bool=False,
     ):  
         target = os.path.abspath(target)
-        for route_url in self.xrtd_redirectors:
-            url=f"root://{route_url}//{filepath}"
-
-            # copy remote file
-            try:
-                self.gfal_context.filecopy(
-                    self.gfal_context.transfer_parameters(),
-                    url,
-                    f"file://{target}"
-                )
-                break
-            except Exception as e:
-                print(e)
+        # download to a temporary file first such that an aborted transfer
+        # never leaves a truncated file at *target*
+        partial_target = f"{target}.part"
+        try:
+            self.download_lfn(filepath, partial_target)
+            os.replace(partial_target, target)
+        except IOError as e:
+            print(e)
 
         if enforce_success and not os.path.exists(target):
-            raise ValueError(f"Unable to copy file '{url}' to '{target}'")
+            raise ValueError(f"Unable to copy file '{filepath}' to '{target}'")
 
+    @tracer.traced("upload", category="transfer")
     def move_file_to_remote(
         self,
         local_file: str,
@@ -122,7 +632,6 @@ class WLCGInterface(object):
         route_url: str="root://cms-xrd-global.cern.ch",
         cleanup: bool=False,
     ):
-        local_file_path = f"file://{os.path.abspath(local_file)}"
         target_dir = os.path.dirname(target_file)
 
         if route_url != None:
@@ -133,13 +642,8 @@ class WLCGInterface(object):
             remote_url = target_file
             wlcg_target_dir = target_dir
 
-        self.gfal_context.mkdir_rec(wlcg_target_dir, 0)
-
-        self.gfal_context.filecopy(
-            self.gfal_context.transfer_parameters(),
-            local_file_path,
-            remote_url
-        )
+        self.storage.mkdir(wlcg_target_dir)
+        self.storage.copy(local_file, remote_url)
 
         if cleanup:
             os.remove(local_file)
@@ -163,10 +667,9 @@ class WLCGInterface(object):
                         empty list.
         """
         try:
-            if self.gfal_context:
+            if self.listing_engine:
                 # load list of files
-                filelist = self.gfal_context.listdir(wlcg_path)
-                return [os.path.join(wlcg_path, x) for x in filelist]
+                return self.listing_engine.collect([wlcg_path]).get(wlcg_path, [])
             else:
                 if self.verbosity >= 1:
                     print(f"unable to load files from {wlcg_path}, skipping")
@@ -175,23 +678,266 @@ class WLCGInterface(object):
             print(f"unable to load files from {wlcg_path}, skipping")
         return []
 
+    @tracer.traced("list remote outputs", category="storage")
+    def load_remote_outputs(
+        self,
+        wlcg_paths: list[str],
+    ) -> dict[str, list[str]]:
+        """Function to load the file paths from several remote WLCG targets
+        *wlcg_paths* at once. The directories are listed concurrently with
+        the listing engine (see meth::`setup_listing_engine`). Directories
+        that cannot be listed are not part of the result.
+
+        Args:
+            wlcg_paths (list[str]): Paths to the WLCG remote targets
+
+        Returns:
+            dict[str, list[str]]:   Dictionary of format {wlcg_path: list_of_files}
+        """
+        if not self.listing_engine:
+            if self.verbosity >= 1:
+                print(f"unable to load files from {len(wlcg_paths)} remote directories, skipping")
+            return {path: [] for path in wlcg_paths}
+        return self.listing_engine.collect(wlcg_paths)
+
+    @tracer.traced("stat remote directories", category="storage")
+    def stat_remote_directories(
+        self,
+        wlcg_paths: list[str],
+    ) -> dict[str, float or None]:
+        """Function to load the modification times of the remote WLCG
+        directories *wlcg_paths* concurrently. If gfal is not available or a
+        directory cannot be accessed, the modification time is None.
+
+        Args:
+            wlcg_paths (list[str]): Paths to the WLCG remote targets
+
+        Returns:
+            dict[str, float or None]:   Dictionary of format {wlcg_path: mtime}
+        """
+        if not self.listing_engine:
+            return {path: None for path in wlcg_paths}
+        return self.listing_engine.collect_mtimes(wlcg_paths)
+
+    @tracer.traced("load output sizes", category="storage")
+    def get_output_sizes(self, paths: Iterable[str]) -> dict[str, int]:
+        """Return the sizes in bytes of the remote files *paths*. The sizes
+        are taken from the listings if possible (see
+        meth::`setup_listing_engine`), otherwise the files are stat'ed.
+        """
+        return self.listing_engine.collect_sizes(paths)
+
+    def prefetch_remote_outputs(self, wlcg_paths: list[str]) -> None:
+        """Queue the listing of *wlcg_paths* in the background, such that a
+        later call of meth::`load_remote_outputs` can use the results directly.
+        """
+        if self.listing_engine:
+            self.listing_engine.submit_many(wlcg_paths)
+
+    def setup_event_counting(
+        self,
+        max_workers: int=8,
+        timeout: int=60,
+        retries: int=2,
+        mode: str="thread",
+    ):
+        """Configure how the events in the job outputs are counted.
+
+        Args:
+            max_workers (int, optional):    number of files that are opened
+                                            concurrently. Defaults to 8.
+            timeout (int, optional):    timeout in seconds for opening a single
+                                        file. Defaults to 60.
+            retries (int, optional):    number of additional attempts for
+                                        files that could not be opened.
+                                        Defaults to 2.
+            mode (str, optional):   type of worker pool, either "thread" or
+                                    "process". Defaults to "thread".
+        """
+        allowed_modes = "thread process".split()
+        if not mode in allowed_modes:
+            raise ValueError(f"""Unknown mode '{mode}' for event counting,
+            must be one of {', '.join(allowed_modes)}
+            """)
+        self.event_workers = max(1, max_workers)
+        self.event_timeout = timeout
+        self.event_retries = max(0, retries)
+        self.event_pool_mode = mode
+
+    @tracer.traced("remove remote files", category="storage")
+    def remove_remote_files(
+        self,
+        remote_files: Iterable[str],
+        chunk_size: int=400,
+        dry_run: bool=False,
+    ) -> dict[str, str]:
+        """Remove the *remote_files* with the storage backends (see
+        class::`StorageRouter`), i.e. with the bulk unlink of gfal2 or
+        directly on a local mount. The files are split into batches of
+        *chunk_size* files, which are removed concurrently.
+
+        Args:
+            remote_files (Iterable[str]): paths to the files to remove
+            chunk_size (int, optional): number of files per batch.
+                                        Defaults to 400.
+            dry_run (bool, optional):   only report the files that would be
+                                        removed. Defaults to False.
+
+        Returns:
+            dict[str, str]: Dictionary of format {remote_file: result}, where
+                            *result* is 'removed', 'dry-run' or the error
+                            message
+        """
+        remote_files = sorted(set(remote_files))
+        if dry_run:
+            return {path: "dry-run" for path in remote_files}
+
+        def error_message(error):
+            return getattr(error, "message", str(error))
+
+        def remove_batch(batch):
+            results = dict()
+            errors = self.storage.unlink(batch)
+            for path, error in zip(batch, errors):
+                results[path] = error_message(error) if error else "removed"
+            return results
+
+        batches = [
+            remote_files[i:i + chunk_size]
+            for i in range(0, len(remote_files), chunk_size)
+        ]
+        results = dict()
+        for batch_results in self.listing_engine.executor.map(remove_batch, batches):
+            results.update(batch_results)
+        return results
+
     def load_events_from_file(self, remote_file: str, treename: str="Events"):
-        try:
-            f = up.open({remote_file: treename})
-            
-            return f.num_entries
-        except OSError as oserror:
-            print(oserror)
-            print("open IPython shell for debugging")
-            from IPython import embed; embed()
-        return 0
+        n_events, error = count_events_in_file(
+            remote_file=remote_file,
+            treename=treename,
+            timeout=self.event_timeout,
+            retries=self.event_retries,
+        )
+        if error:
+            print(error)
+        return n_events
+
+    @tracer.traced("count events", category="uproot")
+    def count_events(
+        self,
+        remote_files: Iterable[str],
+        treename: str="Events",
+    ) -> dict[str, tuple[int, str or None]]:
+        """Count the events in tree *treename* for all *remote_files*
+        concurrently. The files are opened in a thread or process pool as
+        configured with meth::`setup_event_counting`.
+
+        Args:
+            remote_files (Iterable[str]): paths to the files to open with uproot
+            treename (str, optional): name of the tree. Defaults to "Events".
+
+        Returns:
+            dict[str, tuple[int, str or None]]: Dictionary of format
+                {remote_file: (number_of_events, error_message)}, where
+                *error_message* is None if the file could be read
+        """
+        remote_files = sorted(set(remote_files))
+        if len(remote_files) == 0:
+            return dict()
+        Executor = (ProcessPoolExecutor if self.event_pool_mode == "process"
+                    else ThreadPoolExecutor)
+        results = dict()
+        with Executor(max_workers=self.event_workers) as executor:
+            futures = {
+                executor.submit(
+                    count_events_in_file,
+                    remote_file=path,
+                    treename=treename,
+                    timeout=self.event_timeout,
+                    retries=self.event_retries,
+                ): path for path in remote_files
+            }
+            pbar = tqdm(as_completed(futures), total=len(futures))
+            pbar.set_description("Counting events in job outputs")
+            for future in pbar:
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    results[path] = (0, f"{type(e).__name__}: {e}")
+        return results
+
+    def read_small_remote_file(self, remote_file: str, max_size: int=1024**2) -> bytes:
+        return self.storage.read(remote_file, max_size=max_size)
+
+    @tracer.traced("load sidecars", category="storage")
+    def load_sidecars(
+        self,
+        sidecars: dict[str, str],
+    ) -> dict[str, dict[str, Any]]:
+        """Load the event-count sidecar records (see module::`event_sidecar`)
+        concurrently.
+
+        Args:
+            sidecars (dict[str, str]):  Dictionary of format
+                                        {output_path: sidecar_path}
+
+        Returns:
+            dict[str, dict[str, Any]]:  Dictionary of format
+                                        {output_path: record} for all
+                                        sidecars that could be read
+        """
+        if len(sidecars) == 0:
+            return dict()
+
+        def load(item):
+            output_path, path = item
+            try:
+                return output_path, parse_sidecar(self.read_small_remote_file(path))
+            except Exception as e:
+                if self.verbosity >= 1:
+                    print(f"WARNING: could not read sidecar '{path}': {e}")
+                return output_path, None
+
+        with ThreadPoolExecutor(max_workers=self.event_workers) as executor:
+            records = executor.map(load, sidecars.items())
+            return {path: record for path, record in records if record}
 
     def load_events(self, remote_files: set[str], treename: str="Events"):
         return np.sum([
-            self.load_events_from_file(remote_file=path, treename=treename) 
-            for path in remote_files
+            n_events for n_events, _ in self.count_events(
+                remote_files=remote_files, treename=treename
+            ).values()
         ])
 
+    def build_output_index(
+        self,
+        job_outputs: Iterable[str],
+        name_template: str="output_{id}.tar",
+    ) -> dict[str, set[str]]:
+        """Build an index of the job outputs of format {job_id: set_of_paths}.
+        The job id is parsed from the file name of every path in *job_outputs*
+        according to *name_template*, which must contain the placeholder '{id}'.
+        Paths that do not match the template are not part of the index.
+
+        Args:
+            job_outputs (Iterable[str]): paths to the job outputs
+            name_template (str, optional):  template for the file names of the
+                                            job outputs.
+                                            Defaults to "output_{id}.tar".
+
+        Returns:
+            dict[str, set[str]]: Dictionary of format {job_id: set_of_paths}
+        """
+        prefix, suffix = name_template.split("{id}")
+        pattern = re.compile(re.escape(prefix) + r"(\d+)" + re.escape(suffix) + "$")
+        output_index = dict()
+        for path in job_outputs:
+            match = pattern.search(path)
+            if match:
+                output_index.setdefault(str(int(match.group(1))), set()).add(path)
+        return output_index
+
     def compare_events(
         self,
         relevant_ids,
@@ -199,30 +945,68 @@ class WLCGInterface(object):
         input_map,
         event_lookup,
         name_template="output_{id}.tar",
+        output_index=None,
+        sidecars=None,
+        treename="Events",
     ):
+        """Compare the number of events in the outputs of the jobs with ids
+        *relevant_ids* to the number of events in the corresponding LFNs.
+        The number of events is taken from the sidecar records given as
+        *sidecars* ({output_path: sidecar_path}, see meth::`load_sidecars`)
+        if possible, all other outputs are opened concurrently. Jobs whose
+        outputs could not be read are also added to the comparison, together
+        with the error messages in the entry 'failed_outputs'.
+        If no *output_index* (see meth::`build_output_index`) is given, it is
+        built from *job_outputs*.
+        """
         event_comparison = list()
-        pbar_ids = tqdm(relevant_ids)
-        
-        for id in pbar_ids:
-            pbar_ids.set_description(f"Comparing events for job {id}")
-            relevant_job_outputs = set()
-            relevant_job_outputs = set(filter(
-                    lambda x: x.endswith(name_template.format(id=id)), 
-                    job_outputs
-                ))
+        if output_index is None:
+            output_index = self.build_output_index(
+                job_outputs=job_outputs, name_template=name_template
+            )
+        relevant_job_outputs = {
+            id: output_index.get(id, set()) for id in relevant_ids
+        }
+        relevant_paths = set(chain.from_iterable(relevant_job_outputs.values()))
+        records = self.load_sidecars({
+            path: sidecar for path, sidecar in (sidecars or dict()).items()
+            if path in relevant_paths
+        })
+        event_counts = dict()
+        for path, record in records.items():
+            if treename in record["counts"]:
+                event_counts[path] = (record["counts"][treename], None)
+        if self.verbosity >= 1:
+            print(f"loaded event counts of {len(event_counts)} outputs from sidecars")
+        # fall back to opening the files that have no (valid) record
+        event_counts.update(self.count_events(
+            remote_files=relevant_paths.difference(event_counts),
+            treename=treename,
+        ))
+
+        for id in sorted(relevant_ids, key=int):
             all_events = sum([event_lookup.get(x, 0) for x in input_map[id]])
 
-            job_events = self.load_events(remote_files=relevant_job_outputs)
+            job_events = 0
+            failed_outputs = dict()
+            for path in relevant_job_outputs[id]:
+                n_events, error = event_counts[path]
+                job_events += n_events
+                if error:
+                    failed_outputs[path] = error
 
-            if all_events != job_events:
+            if all_events != job_events or len(failed_outputs) > 0:
                 rel_diff = (all_events-job_events)/all_events if not all_events == 0 else 0
 
-                event_comparison.append({
+                comparison = {
                     "lfns": input_map[id],
                     "all_events": all_events,
                     "saved_events": job_events,
                     "rel_diff": rel_diff,
-                })
+                }
+                if len(failed_outputs) > 0:
+                    comparison["failed_outputs"] = failed_outputs
+                event_comparison.append(comparison)
         return event_comparison
 
 
@@ -239,6 +1023,8 @@ class WLCGInterface(object):
         event_comparison_container: list or None=None,
         verbosity: int=0,
         name_template: str="output_{id}.tar",
+        output_index: dict[str, set[str]] or None=None,
+        sidecar_collector: set[str] or None=None,
     ) -> None:
         """Function to collect information about jobs in *job_details*.
         First, all job ids with state *state* are retrieved from *job_details*.
@@ -268,6 +1054,16 @@ class WLCGInterface(object):
             job_outputs (set, optional):    if a set of output files is given,
                                             only job ids with output files are
                                             considered as relevant. Defaults to None
+            output_index (dict, optional):  index of the *job_outputs* of format
+                                            {job_id: set_of_paths}, see
+                                            meth::`build_output_index`. Is built
+                                            from *job_outputs* if not given.
+                                            Defaults to None
+            sidecar_collector (set, optional):  for state 'failed', set to be
+                                                filled with the sidecar records
+                                                of the failed outputs, which
+                                                are not counted as outputs
+                                                themselves. Defaults to None
 
         Raises:
             ValueError: If a lfn is already marked as done but is associated with
@@ -279,24 +1075,40 @@ class WLCGInterface(object):
             job_details
         ))
 
+        if output_index is None:
+            output_index = self.build_output_index(
+                job_outputs=job_outputs if job_outputs else [],
+                name_template=name_template,
+            )
+
         # if there are paths to the job outputs available, only select ids that
         # actually have an output
         if isinstance(job_outputs, set) and not len(job_outputs) == 0:
             relevant_ids = set(filter(
-                lambda x: any(path.endswith(name_template.format(id=x)) for path in job_outputs), 
+                lambda x: x in output_index, 
                 relevant_ids
             ))
+        # sidecar records that exist next to the outputs
+        available_sidecars = set(filter(is_sidecar, job_outputs or []))
         # for state "failed", collect output files that should not be there
         if state == "failed":
-            collector_set.update(filter(
-                lambda x: any(x.endswith(name_template.format(id=id)) for id in relevant_ids), 
-                job_outputs
+            failed_outputs = set(chain.from_iterable(
+                output_index.get(id, set()) for id in relevant_ids
             ))
+            collector_set.update(failed_outputs)
+            # the sidecars of these outputs are removed with them, but are
+            # no outputs themselves
+            if sidecar_collector is not None:
+                sidecar_collector.update(available_sidecars.intersection(
+                    sidecar_path(x) for x in failed_outputs
+                ))
         # if state is finished, safe the done lfns (if the output of the job is also 
         # available)
         elif state == "finished":
             
-            lfns = set(chain.from_iterable([input_map[x] for x in relevant_ids]))
+            lfns = lfn_set_like(
+                collector_set, chain.from_iterable([input_map[x] for x in relevant_ids])
+            )
             
             # first check if a lfn is already marked as done - this should not happen
             
@@ -305,9 +1117,18 @@ class WLCGInterface(object):
                 # so update prefix accordingly
                 event_comparison_container += self.compare_events(
                     relevant_ids=relevant_ids,
-                    job_outputs=set([x.replace(wlcg_prefix, xrd_prefix) for x in job_outputs]),
+                    job_outputs=job_outputs,
                     input_map=input_map,
-                    event_lookup=event_lookup
+                    event_lookup=event_lookup,
+                    output_index={
+                        id: set([x.replace(wlcg_prefix, xrd_prefix) for x in output_index.get(id, set())])
+                        for id in relevant_ids
+                    },
+                    sidecars={
+                        x.replace(wlcg_prefix, xrd_prefix): sidecar_path(x).replace(wlcg_prefix, xrd_prefix)
+                        for id in relevant_ids for x in output_index.get(id, set())
+                        if sidecar_path(x) in available_sidecars
+                    },
                 )
                 
             overlap = collector_set.intersection(lfns)
@@ -337,10 +1158,13 @@ class WLCGInterface(object):
         verbosity: int=0
     ) -> str or None:
         """Small function to extract the DAS key for sample *sample_name* 
-        from the *sample_config*. First, the *sample_config*
-        is opened (has to be in yaml format!). Afterwards, the entry *sample_name*
-        is extracted. This entry should be a dictionary itself, which should contain
-        the key 'miniAOD' with the DAS key for this sample.
+        from the *sample_config*. The information is loaded from the catalog
+        of the configs in the directory of *sample_config* (has to be in yaml
+        format!), see class::`SampleCatalog`. If the sample is defined in
+        several loaded configs, the entry in *sample_config* is preferred. This entry
+        should either be a dictionary itself, which should contain the key
+        'miniAOD' (or 'inputDataset') with the DAS key for this sample, or the
+        DAS key itself.
 
         Args:
             sample_name (str): Name of the sample as provided in the sample config
@@ -351,18 +1175,16 @@ class WLCGInterface(object):
             str or None: If successfull, this function returns the DAS key, else None
         """    
         das_key = None
-        # open the sample config
-        with open(sample_config) as f:
-            sample_dict = yaml.load(f, yaml.Loader)
-
         # look up information for sample_name
-        sample_info = sample_dict.get(sample_name, dict())
+        sample_info = SampleCatalog.for_config(sample_config).get(
+            sample_name, config_file=sample_config
+        )
         # if there is no sample information, exit here
-        if len(sample_info) == 0:
+        if not sample_info:
             if verbosity >= 1:
                 print(f"WARNING: Unable to load information for sample '{sample_name}'")
             return das_key
-        return sample_info.get("miniAOD", None)
+        return sample_info["das_key"]
 
     def get_campaign_name(self, das_key: str=None, verbosity: int=0) -> str:
         """small function to translate the sample name attributed by the 
@@ -393,38 +1215,169 @@ class WLCGInterface(object):
         
         return sample_campaign
 
-    def load_valid_file_list(self, das_key: str) -> dict[str: Any]:
+    def setup_dbs_cache(
+        self,
+        path: str or None=None,
+        ttl: float or None=7*24*3600,
+        refresh: bool=False,
+    ):
+        """Set up the persistent cache for information from DBS and DAS,
+        see class::`DBSCache` for more information. If *path* is None,
+        the default location is used.
+        """
+        self.dbs_cache = DBSCache(path=path, ttl=ttl, refresh=refresh)
+        self.das_client.cache = self.dbs_cache
+
+    def setup_das_client(self, max_workers: int=4) -> None:
+        """Set up the client for DAS, which runs up to *max_workers*
+        dasgoclient queries in parallel, see class::`DASClient`.
+        """
+        self.das_client.shutdown()
+        self.das_client = DASClient(
+            max_workers=max_workers,
+            cache=self.dbs_cache,
+            verbosity=self.verbosity,
+        )
+
+    def has_file_list(self, das_key: str) -> bool:
+        """Check whether the file list for *das_key* can be loaded, i.e.
+        whether the DBS api is available or the list is already cached.
+        """
+        return bool(self.dbs_api) or bool(
+            self.dbs_cache and self.dbs_cache.has_file_list(das_key)
+        )
+
+    def thread_dbs_api(self):
+        """Return the DbsApi of the current thread. The DbsApi is not
+        thread-safe, so every thread creates its own instance. If no
+        factory for the DbsApi is known, the shared instance is returned.
+        """
+        if not self.dbs_api_factory:
+            return self.dbs_api
+        api = getattr(self.__dbs_local, "api", None)
+        if api is None:
+            api = self.dbs_api_factory()
+            self.__dbs_local.api = api
+        return api
+
+    def list_block_files(self, block_name: str) -> DBSFileTable:
+        """Load the valid files of the block *block_name* from DBS. Only the
+        valid files are requested from the server, and the detail listing is
+        converted to a compact class::`DBSFileTable` right away, such that
+        only the detail dictionaries of a single block are kept in memory
+        at a time.
+        """
+        file_list = self.thread_dbs_api().listFiles(
+            block_name=block_name, detail=1, validFileOnly=1,
+        )
+        return DBSFileTable.from_file_infos(file_list)
+
+    @tracer.traced("list DBS blocks", category="dbs")
+    def list_dataset_files(self, das_key: str) -> DBSFileTable:
+        """Load the valid files of dataset *das_key* from DBS. The blocks of
+        the dataset are listed first and the files of the blocks are loaded
+        concurrently with *dbs_workers* threads (see meth::`list_block_files`).
+
+        Raises:
+            Exception: if any of the DBS queries fails
+        """
+        blocks = [x["block_name"] for x in self.dbs_api.listBlocks(dataset=das_key)]
+        if len(blocks) == 0:
+            return DBSFileTable()
+        n_workers = max(1, min(self.dbs_workers, len(blocks)))
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            tables = list(executor.map(self.list_block_files, blocks))
+        if self.verbosity >= 1:
+            print(f"Loaded {sum(len(x) for x in tables)} files in {len(blocks)} blocks of '{das_key}'")
+        return DBSFileTable.concatenate(tables)
+
+    @tracer.traced("load file list", category="dbs")
+    def load_file_table(self, das_key: str) -> DBSFileTable:
+        """Load the valid files of dataset *das_key* as class::`DBSFileTable`.
+        The file list is taken from the cache if possible, then from DBS
+        (see meth::`list_dataset_files`) and finally from dasgoclient.
+        """
+        # first, try to load the file list from the cache
+        if self.dbs_cache:
+            columns = self.dbs_cache.load_file_columns(das_key)
+            if columns is not None:
+                return DBSFileTable.from_columns(*columns)
         # load the file list for this dataset
         try:
-            file_list = self.dbs_api.listFiles(dataset=das_key, detail=1)
+            table = self.list_dataset_files(das_key)
+            # DBS only returns the valid files
+            all_files, is_valid = table, None
         except Exception as e:
             print("Encounter exception:")
             print(e)
             print("Will try dasgoclient next")
-            from subprocess import Popen, PIPE
-            import json
-            das_go_output = Popen(f"dasgoclient -query='file dataset={das_key}' -json", shell=True, stdout=PIPE)
-            das_go_json = json.loads(das_go_output.communicate()[0])
-            file_list = list()
-            for info in das_go_json:
-                file_list += info["file"]
-        # by default, this list contains _all_ files (also LFNs that are not
-        # reachable) so filter out broken files
-        file_list = list(filter(
-            lambda x: x["is_file_valid"] == True,
-            file_list
-        ))
-        return file_list
-    
+            file_list = self.das_client.query_files(f"file dataset={das_key}")
+            file_list = [normalize_file_info(x) for x in file_list]
+            # by default, this list contains _all_ files (also LFNs that are
+            # not reachable), which are filtered out in the table
+            table = DBSFileTable.from_file_infos(file_list)
+            all_files = DBSFileTable.from_file_infos(file_list, valid_only=False)
+            is_valid = [x["is_file_valid"] for x in file_list]
+        # store the list (including the validity flags) in the cache
+        if self.dbs_cache and len(all_files) > 0:
+            self.dbs_cache.store_file_columns(
+                das_key, *all_files.to_columns(), is_valid=is_valid
+            )
+        return table
+
+    def load_valid_file_list(self, das_key: str) -> list[dict[str, Any]]:
+        """Load the valid files of dataset *das_key* in the format of the
+        DBS detail listing, see meth::`load_file_table`.
+        """
+        return self.load_file_table(das_key).to_file_infos()
+
+    @tracer.traced("load file information", category="dbs")
+    def get_file_info(self, lfn: str) -> dict[str, Any] or None:
+        """Load the DBS information for a single file *lfn* (e.g. the file
+        size and the adler32 checksum), see meth::`normalize_file_info`.
+        The information is taken from the cache if possible. Returns None
+        if the file is unknown.
+        """
+        if self.dbs_cache:
+            info = self.dbs_cache.load_file_info(lfn)
+            if info is not None:
+                return info
+        try:
+            if self.dbs_api:
+                file_list = self.dbs_api.listFiles(logical_file_name=lfn, detail=1)
+            else:
+                file_list = self.das_client.query_files(f"file={lfn}")
+        except Exception as e:
+            print(f"WARNING: could not load file information for '{lfn}': {e}")
+            return None
+        file_list = [normalize_file_info(x) for x in file_list]
+        return file_list[0] if len(file_list) > 0 else None
+
+    def get_file_infos(
+        self,
+        das_key: str,
+        lfns: Iterable[str],
+    ) -> dict[str, dict[str, Any]]:
+        """Load the DBS information for the files *lfns* of dataset
+        *das_key* at once from the file table of the dataset (see
+        meth::`load_file_table`), instead of querying every file separately
+        with meth::`get_file_info`.
+
+        Returns:
+            dict[str, dict]: Dictionary of format {lfn: file_info} for all
+                             *lfns* that are valid files of the dataset
+        """
+        table = self.load_file_table(das_key)
+        return {
+            x["logical_file_name"]: x for x in table.to_file_infos(lfns=lfns)
+        }
+
     def create_event_lookup(
         self,
         das_key: str
     ) -> dict[str, int]:
-        if self.dbs_api:
-            dbs_file_list = self.load_valid_file_list(das_key=das_key)
-            return {
-                x["logical_file_name"]: x["event_count"] for x in dbs_file_list
-            }
+        if self.has_file_list(das_key):
+            return self.load_file_table(das_key=das_key).event_lookup()
         return dict()
 
     def get_dbs_lfns(self, das_key: str) -> set[str]:
@@ -441,57 +1394,32 @@ class WLCGInterface(object):
         # initialize output set as empty
         output_set = set()
 
-        # if the api for the dbs interface was initialized sucessfully, we can
-        # load the files
-        if self.dbs_api:
-            file_list = self.load_valid_file_list(das_key=das_key)
-            output_set = set([x["logical_file_name"] for x in file_list])
+        # if the api for the dbs interface was initialized sucessfully or the
+        # file list is cached, we can load the files
+        if self.has_file_list(das_key):
+            output_set = self.load_file_table(das_key=das_key).lfn_set()
         return output_set 
 
+    def prefetch_das_information(self, das_keys: Iterable[str]) -> None:
+        """Queue the DAS queries for all *das_keys* in the background, such
+        that meth::`get_das_information` can use the results directly.
+        """
+        self.das_client.prefetch(das_keys)
+
+    @tracer.traced("load DAS information", category="das")
     def get_das_information(
         self,
         das_key: str,
         relevant_info: str="num_file",
         default: int=-1,
     ) -> int:
-        allowed_modes="file_size num_event num_file".split()
-        if not relevant_info in allowed_modes:
+        """Load the summary information *relevant_info* for dataset
+        *das_key* from DAS. All fields of a dataset are obtained with a
+        single query, which is cached (see class::`DASClient`).
+        Returns *default* if the information could not be obtained.
+        """
+        if not relevant_info in DAS_FIELDS:
             raise ValueError(f"""Could not load information '{relevant_info}'
-            because it's not part of the allowed modes: file_size, num_event, num_file
+            because it's not part of the allowed modes: {', '.join(DAS_FIELDS)}
             """)
-        output_value = default
-
-        # execute DAS query for sample with *das_key*
-        process = Popen(
-            [f"dasgoclient --query '{das_key}' -json"], 
-            shell=True, stdin=PIPE, stdout=PIPE
-        )
-        # load output of query
-        output, stderr = process.communicate()
-        # from IPython import embed; embed()
-        # output is a string of form list(dict()) and can be parsed with
-        # the json module
-        try:
-            das_infos = json.loads(output)
-        except Exception as e:
-            # something went wrong in the parsing, so just return the default
-            return output_value
-        # not all dicts have the same (relevant) information, so go look for the
-        # correct entry in list. Relevant information for us is the total
-        # number of LFNs 'nfiles'
-        relevant_values = list(set(
-            y.get(relevant_info) 
-            # only consider entries in DAS info list with dataset information
-            for x in das_infos if "dataset" in x.keys() 
-            # only consider those elements in dataset info that also have 
-            # the relevant information
-            for y in x["dataset"] if relevant_info in y.keys()
-        ))
-        # if this set is has more than 1 or zero entries, something went wrong
-        # when obtaining the relevant information, so return the default value
-
-        # if the set has exactly one entry, we were able to extract the relevant
-        # information, so return it accordingly
-        if len(relevant_values) == 1:
-            output_value = relevant_values[0]
-        return output_value
+        return self.das_client.get(das_key, relevant_info, default=default)